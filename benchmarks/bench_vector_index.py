@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark vector storage types for the FAISS index.
+
+Builds float32, float16 and int8 indexes over the same vectors and reports
+memory per index, search time and recall@k relative to float32, so the
+quality cost of quantization can be weighed against the memory saved.
+
+Vectors come from a PDF processed with the real embeddings model when
+``--pdf`` is given, otherwise from synthetic clustered data shaped like
+all-MiniLM-L6-v2 output.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.jurisai.models.vector_index import (  # noqa: E402
+    VECTOR_DTYPES,
+    create_faiss_index,
+    index_memory_bytes,
+    measure_recall,
+)
+
+
+def synthetic_vectors(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Generate normalized, clustered vectors resembling sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 50), dimension))
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.3 * rng.normal(size=(count, dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def pdf_vectors(path: str) -> np.ndarray:
+    """Embed the chunks of a PDF with the default embeddings model."""
+    from src.jurisai.models.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    with open(path, "rb") as f:
+        docs = processor.load_pdf(f.read(), os.path.basename(path))
+    chunks = processor.split_documents(docs)
+    processor.cleanup()
+    texts = [chunk.page_content for chunk in chunks]
+    return np.asarray(processor.embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def main() -> int:
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="PDF to embed instead of synthetic vectors")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.pdf:
+        vectors = pdf_vectors(args.pdf)
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.integers(0, len(vectors), args.queries)]
+        queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim)
+        queries = synthetic_vectors(args.queries, args.dim, seed=1)
+
+    indexes = {}
+    print(f"{len(vectors)} vectors, dimension {vectors.shape[1]}, k={args.k}")
+    print(f"{'dtype':<8} {'memory':>12} {'bytes/vec':>10} {'search ms/q':>12} {'recall@k':>9}")
+
+    for dtype in VECTOR_DTYPES:
+        index = create_faiss_index(vectors.shape[1], dtype, vectors)
+        index.add(vectors)
+        indexes[dtype] = index
+
+        start = time.perf_counter()
+        index.search(queries, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        recall = measure_recall(indexes["float32"], index, queries, args.k)
+        memory = index_memory_bytes(index)
+        print(
+            f"{dtype:<8} {memory / 1e6:>10.2f}MB {memory / len(vectors):>10.0f} "
+            f"{elapsed_ms:>12.3f} {recall:>9.3f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
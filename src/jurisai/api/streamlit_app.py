@@ -6,11 +6,33 @@ using Streamlit.
 Author: a13xh (a13x.h.cc@gmail.com)
 """
 
+import functools
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-from langchain_community.vectorstores import FAISS
+from langchain_community.embeddings import HuggingFaceEmbeddings
 
+from src.jurisai.core.jobs import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JobExecutor,
+    ingest_document,
+)
+from src.jurisai.core.memory import (
+    MemoryManager,
+    estimate_ingest_bytes,
+    estimate_model_bytes,
+)
+from src.jurisai.models.context_cache import ConversationContextCache
+from src.jurisai.models.corpus import DocumentCorpus
 from src.jurisai.models.document_processor import DocumentProcessor
+from src.jurisai.models.llm_scheduler import LLMScheduler
 from src.jurisai.models.rag_chain import RAGChain
+from src.jurisai.models.router import ModelRouter
+from src.jurisai.models.summary_index import SummaryBuilder, SummaryIndex
 from src.jurisai.utils.log_config import get_logger, configure_logging
 
 # Configure logging
@@ -18,25 +40,89 @@ configure_logging(level="INFO")
 logger = get_logger(__name__)
 
 
-def initialize_session_state():
+@st.cache_resource
+def get_llm_scheduler() -> LLMScheduler:
+    """Return the LLM scheduler shared by all sessions."""
+    return LLMScheduler(max_in_flight=1)
+
+
+# Models the "Auto" option routes between, from smallest to largest
+ROUTED_MODELS = ["deepseek-r1:1.5b", "mistral:7b"]
+AUTO_MODEL = "Auto (route by question)"
+
+
+@st.cache_resource
+def get_model_router() -> ModelRouter:
+    """Return the model router shared by all sessions."""
+    return ModelRouter(ROUTED_MODELS, scheduler=get_llm_scheduler())
+
+
+@st.cache_resource
+def get_memory_manager() -> MemoryManager:
+    """Return the memory manager shared by all sessions."""
+    return MemoryManager()
+
+
+@st.cache_resource
+def get_context_cache() -> ConversationContextCache:
+    """Return the conversation context cache shared by all sessions."""
+    return ConversationContextCache()
+
+
+@st.cache_resource
+def get_job_executor() -> JobExecutor:
+    """Return the ingest job executor shared by all sessions."""
+    return JobExecutor(max_workers=2, memory_manager=get_memory_manager())
+
+
+@st.cache_resource
+def get_search_pool() -> ThreadPoolExecutor:
+    """Return the pool searching the documents of every session's corpus."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="corpus-search")
+
+
+@st.cache_resource
+def get_embeddings(model_name: str = "all-MiniLM-L6-v2") -> HuggingFaceEmbeddings:
+    """Return the embeddings model shared by all sessions."""
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    get_memory_manager().register_model(model_name, estimate_model_bytes(embeddings))
+    return embeddings
+
+
+def initialize_session_state() -> None:
     """Initialize session state variables."""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
     if "processor" not in st.session_state:
-        st.session_state.processor = DocumentProcessor()
+        st.session_state.processor = DocumentProcessor(embeddings=get_embeddings())
     
     if "rag_chain" not in st.session_state:
-        st.session_state.rag_chain = RAGChain()
+        st.session_state.rag_chain = RAGChain(
+            scheduler=get_llm_scheduler(),
+            session_id=st.session_state.session_id,
+            context_cache=get_context_cache(),
+        )
     
-    if "vector_store" not in st.session_state:
-        st.session_state.vector_store = None
+    # Documents of the session, answered together
+    if "corpus" not in st.session_state:
+        st.session_state.corpus = DocumentCorpus(
+            get_embeddings(), executor=get_search_pool()
+        )
+    
+    # Ingest job of each uploaded document, keyed by file name
+    if "ingest_jobs" not in st.session_state:
+        st.session_state.ingest_jobs = {}
     
-    if "qa_chain" not in st.session_state:
-        st.session_state.qa_chain = None
+    if "summary_index" not in st.session_state:
+        st.session_state.summary_index = None
     
-    if "uploaded_file_name" not in st.session_state:
-        st.session_state.uploaded_file_name = None
+    # Last answer, kept across the reruns that refresh ingest progress
+    if "last_answer" not in st.session_state:
+        st.session_state.last_answer = None
 
 
-def main():
+def main() -> None:
     """Run the Streamlit application."""
     st.set_page_config(
         page_title="JurisAI - Legal Document Assistant",
@@ -46,11 +132,18 @@ def main():
     
     # Initialize session state
     initialize_session_state()
+    memory_manager = get_memory_manager()
+    job_executor = get_job_executor()
+    ingest_jobs = st.session_state.ingest_jobs
+    
+    # Document indexes are reloaded from disk when they were evicted while idle
+    corpus = st.session_state.corpus
     
     # Header
     st.title("JurisAI - Legal Document Assistant")
     st.markdown(
-        "Upload a legal document and ask questions to receive concise answers based on the content."
+        "Upload legal documents and ask questions to receive concise answers "
+        "based on their content, with the document and page of each fact."
     )
     
     # Sidebar
@@ -60,21 +153,41 @@ def main():
         # Model selection
         model_name = st.selectbox(
             "Select LLM Model",
-            ["deepseek-r1:1.5b", "llama2:7b", "orca-mini:7b", "mistral:7b", "gemma:7b"],
+            [
+                "deepseek-r1:1.5b",
+                "llama2:7b",
+                "orca-mini:7b",
+                "mistral:7b",
+                "gemma:7b",
+                AUTO_MODEL,
+            ],
             index=0,
+            help="Auto sends factual lookups to the smallest model and analytical "
+            "questions to larger ones while keeping latency under the SLO",
         )
         
         # Update RAG chain if model changed
         if "current_model" not in st.session_state or st.session_state.current_model != model_name:
-            st.session_state.rag_chain = RAGChain(model_name=model_name)
+            auto = model_name == AUTO_MODEL
+            st.session_state.rag_chain = RAGChain(
+                model_name=ROUTED_MODELS[0] if auto else model_name,
+                scheduler=get_llm_scheduler(),
+                session_id=st.session_state.session_id,
+                router=get_model_router() if auto else None,
+                context_cache=get_context_cache(),
+            )
             st.session_state.current_model = model_name
-            if st.session_state.vector_store is not None:
-                st.session_state.qa_chain = st.session_state.rag_chain.create_chain(
-                    st.session_state.vector_store
-                )
         
-        # Temperature for generation
-        temperature = st.slider(
+        # Vector storage type for new documents, passed to each ingest job
+        vector_dtype = st.selectbox(
+            "Vector storage",
+            ["float32", "float16", "int8"],
+            index=0,
+            help="float16 halves and int8 quarters index memory at a small recall cost",
+        )
+        
+        # Temperature for generation, applied to the current models in place
+        st.session_state.rag_chain.temperature = st.slider(
             "Temperature", min_value=0.0, max_value=1.0, value=0.1, step=0.1
         )
         
@@ -83,6 +196,87 @@ def main():
             "Number of chunks to retrieve", min_value=1, max_value=10, value=3, step=1
         )
         
+        # Diversity of results across documents
+        corpus.per_document_cap = st.slider(
+            "Max chunks per document",
+            min_value=1,
+            max_value=10,
+            value=2,
+            step=1,
+            help="Chunks taken from one document before other documents are "
+            "preferred when several documents are loaded",
+        )
+        
+        # Answer strategy for questions with evidence spread over many chunks
+        answer_mode = st.selectbox(
+            "Answer mode",
+            ["Standard", "Map-reduce"],
+            index=0,
+            help="Map-reduce answers groups of chunks in parallel and combines "
+            "the partial answers",
+        )
+        if answer_mode == "Map-reduce":
+            map_reduce_k = st.slider(
+                "Chunks for map-reduce", min_value=6, max_value=30, value=12, step=3
+            )
+        
+        # Optional summary tree for whole-document questions
+        build_summaries = st.checkbox(
+            "Build summary index",
+            value=False,
+            help="Summarize each document at ingest so questions like "
+            "'summarize this agreement' are answered from precomputed summaries",
+        )
+        
+        # LLM queue statistics shared across sessions
+        with st.expander("LLM Queue"):
+            for queue_model, stats in get_llm_scheduler().stats().items():
+                st.markdown(
+                    f"**{queue_model}**: {stats['queue_depth']} queued, "
+                    f"{stats['in_flight']}/{stats['max_in_flight']} running, "
+                    f"p95 wait {stats['wait_p95_s']:.2f}s"
+                )
+            if model_name == AUTO_MODEL:
+                routing = get_model_router().stats()
+                st.markdown(
+                    f"**Routing**: p95 {routing['p95_s']:.2f}s "
+                    f"(SLO {routing['slo_s']:.0f}s), "
+                    f"{routing['fallbacks']} SLO fallbacks"
+                )
+                for routed_model, stats in routing["models"].items():
+                    st.markdown(
+                        f"- {routed_model}: {stats['routed']} routed, "
+                        f"p95 generation {stats['service_p95_s']:.2f}s"
+                    )
+            contexts = get_context_cache().stats()
+            st.markdown(
+                f"**Follow-ups**: {contexts['hits']} reused a conversation "
+                f"({contexts['reused_tokens']} prompt tokens not re-evaluated), "
+                f"{contexts['misses']} sent in full"
+            )
+        
+        # Memory shared by all sessions
+        with st.expander("Memory"):
+            memory_manager.enforce()
+            usage = memory_manager.usage()
+            st.progress(
+                min(usage["rss_bytes"] / usage["budget_bytes"], 1.0),
+                text=f"{usage['rss_bytes'] / 1e6:.0f} of "
+                f"{usage['budget_bytes'] / 1e6:.0f} MB",
+            )
+            st.markdown(
+                f"Models: {usage['model_bytes'] / 1e6:.0f} MB · "
+                f"Indexes: {usage['index_bytes'] / 1e6:.1f} MB "
+                f"({usage['indexes_resident']} loaded, "
+                f"{usage['indexes_evicted']} on disk)"
+            )
+            jobs = job_executor.stats()
+            st.markdown(
+                f"Ingest: {usage['ingests_running']} running, "
+                f"{usage['ingests_queued']} queued for memory, "
+                f"{jobs['queued']} waiting for a worker"
+            )
+        
         st.markdown("---")
         st.markdown("### About")
         st.markdown(
@@ -96,41 +290,87 @@ def main():
         st.header("Document Upload")
         
         # PDF file uploader
-        uploaded_file = st.file_uploader("Upload a legal document", type="pdf")
+        uploaded_files = st.file_uploader(
+            "Upload legal documents", type="pdf", accept_multiple_files=True
+        )
         
-        if uploaded_file is not None:
-            if (st.session_state.uploaded_file_name != uploaded_file.name or 
-                st.session_state.vector_store is None):
-                # Process new document
-                with st.spinner("Processing document..."):
-                    try:
-                        # Process the PDF and create vector store
-                        st.session_state.vector_store = st.session_state.processor.process_pdf(
-                            uploaded_file.getvalue(),
-                            filename=uploaded_file.name
-                        )
-                        
-                        # Create QA chain
-                        st.session_state.qa_chain = st.session_state.rag_chain.create_chain(
-                            st.session_state.vector_store,
-                            k=k_value
-                        )
-                        
-                        # Update session state
-                        st.session_state.uploaded_file_name = uploaded_file.name
-                        
-                        st.success(f"Document '{uploaded_file.name}' processed successfully!")
-                    except Exception as e:
-                        st.error(f"Error processing document: {str(e)}")
-                        logger.error(
-                            "Error processing document",
-                            error=str(e),
-                            filename=uploaded_file.name
-                        )
+        # Documents removed from the uploader leave the session
+        uploaded_names = {uploaded_file.name for uploaded_file in uploaded_files}
+        for name in set(corpus.names()) | set(ingest_jobs):
+            if name not in uploaded_names:
+                job_executor.cancel(st.session_state.session_id, name)
+                ingest_jobs.pop(name, None)
+                corpus.remove_document(name)
+                memory_manager.release(st.session_state.session_id, name)
+                if st.session_state.summary_index is not None:
+                    st.session_state.summary_index.documents.pop(name, None)
+        
+        # New documents are indexed in the background; their partial indexes
+        # are searched as they grow
+        for uploaded_file in uploaded_files:
+            if uploaded_file.name in ingest_jobs:
+                continue
+            summary_builder = None
+            if build_summaries:
+                summary_builder = SummaryBuilder(
+                    st.session_state.rag_chain.summary_llm()
+                )
+                if st.session_state.summary_index is None:
+                    st.session_state.summary_index = SummaryIndex()
+            ingest_jobs[uploaded_file.name] = job_executor.submit(
+                st.session_state.session_id,
+                uploaded_file.name,
+                functools.partial(
+                    ingest_document,
+                    pdf_content=uploaded_file.getvalue(),
+                    processor=st.session_state.processor,
+                    corpus=corpus,
+                    memory_manager=memory_manager,
+                    summary_builder=summary_builder,
+                    summary_index=st.session_state.summary_index,
+                    vector_dtype=vector_dtype,
+                ),
+                estimate_bytes=estimate_ingest_bytes(uploaded_file.size),
+            )
+        
+        # Ingest progress
+        for name, job in ingest_jobs.items():
+            snapshot = job.snapshot()
+            if job.state == JOB_DONE:
+                st.caption(f"✓ {name} indexed in {snapshot['elapsed_s']:.1f}s")
+            elif job.state == JOB_FAILED:
+                st.error(f"Error processing {name}: {job.error}")
+            elif job.state == JOB_CANCELLED:
+                st.warning(f"Processing of {name} was cancelled.")
+            else:
+                st.markdown(f"**{name}**: {job.state}")
+                for stage, progress in snapshot["stages"].items():
+                    st.progress(
+                        progress["done"] / max(progress["total"], 1),
+                        text=f"{stage}: {progress['done']}/{progress['total']}",
+                    )
+                if st.button("Cancel", key=f"cancel-{job.id}"):
+                    job.cancel()
         
         # Document status
-        if st.session_state.vector_store is not None:
-            st.info(f"Active document: {st.session_state.uploaded_file_name}")
+        if len(corpus):
+            handles = [
+                job.result for job in ingest_jobs.values() if job.state == JOB_DONE
+            ]
+            indexing = [
+                name
+                for name in corpus.names()
+                if name in ingest_jobs and not ingest_jobs[name].done
+            ]
+            st.info(f"Active documents: {', '.join(corpus.names())}")
+            st.caption(
+                f"Indexes: {sum(h.estimated_bytes for h in handles) / 1e6:.1f} MB · "
+                f"{corpus.probe_count()} of {len(corpus)} documents searched "
+                "per question"
+                + (f" · still indexing {', '.join(indexing)}" if indexing else "")
+            )
+        elif ingest_jobs:
+            st.info("Documents are being processed...")
         else:
             st.warning("Please upload a document to begin.")
     
@@ -138,22 +378,75 @@ def main():
         st.header("Ask Questions")
         
         # Question input
-        user_question = st.text_input("What would you like to know about the document?")
+        user_question = st.text_input("What would you like to know about the documents?")
+        
+        # Metadata filters applied inside the vector search
+        search_filter = {}
+        if len(corpus):
+            with st.expander("Filters"):
+                documents = st.multiselect("Documents", corpus.names())
+                if documents:
+                    search_filter["source"] = documents
+                pages = st.text_input("Pages (e.g. 3-7)", value="").strip()
+                if pages:
+                    first, _, last = pages.partition("-")
+                    try:
+                        # Pages are shown 1-based but stored 0-based
+                        search_filter["page"] = (
+                            int(first) - 1,
+                            int(last or first) - 1,
+                        )
+                    except ValueError:
+                        st.error("Enter a page or a page range such as 3-7.")
+                sections = st.multiselect("Sections", corpus.metadata_values("section"))
+                if sections:
+                    search_filter["section"] = sections
+                document_types = st.multiselect(
+                    "Document types", corpus.metadata_values("document_type")
+                )
+                if document_types:
+                    search_filter["document_type"] = document_types
         
         # Submit button
         if st.button("Ask"):
-            if user_question and st.session_state.qa_chain is not None:
+            if user_question and len(corpus):
                 with st.spinner("Generating answer..."):
                     try:
-                        # Get answer from RAG chain
-                        answer = st.session_state.rag_chain.answer_question(
-                            st.session_state.qa_chain, 
-                            user_question
-                        )
+                        timing = None
+                        if answer_mode == "Map-reduce":
+                            # Answer chunk groups in parallel and combine them
+                            answerer = st.session_state.rag_chain.create_map_reduce(
+                                corpus,
+                                k=map_reduce_k,
+                                filter=search_filter or None,
+                            )
+                            result = answerer.answer(user_question)
+                            answer = result.answer
+                            timing = (
+                                f"{result.groups_answered}/{result.groups_total} "
+                                "chunk groups answered"
+                                f"{' (stopped early)' if result.early_stopped else ''}"
+                                f" · retrieve {result.timings['retrieve_s']:.2f}s"
+                                f" · map {result.timings['map_s']:.2f}s"
+                                f" · reduce {result.timings['reduce_s']:.2f}s"
+                            )
+                        else:
+                            # Chains are cheap to build and are not kept, so
+                            # an idle index can be evicted
+                            qa_chain = st.session_state.rag_chain.create_chain(
+                                corpus,
+                                k=k_value,
+                                filter=search_filter or None,
+                            )
+                            
+                            # Get answer from RAG chain
+                            answer = st.session_state.rag_chain.answer_question(
+                                qa_chain, 
+                                user_question,
+                                summary_index=st.session_state.summary_index,
+                            )
                         
-                        # Display answer
-                        st.markdown("### Answer")
-                        st.markdown(answer)
+                        st.session_state.last_answer = (answer, timing)
                     except Exception as e:
                         st.error(f"Error generating answer: {str(e)}")
                         logger.error(
@@ -166,6 +459,14 @@ def main():
             else:
                 st.error("Please enter a question.")
         
+        # Display answer
+        if st.session_state.last_answer is not None:
+            answer, timing = st.session_state.last_answer
+            st.markdown("### Answer")
+            st.markdown(answer)
+            if timing:
+                st.caption(timing)
+        
         # Example questions
         with st.expander("Example Questions"):
             st.markdown("""
@@ -175,6 +476,11 @@ def main():
             - What are the termination conditions?
             - What liabilities are mentioned in the document?
             """)
+    
+    # Refresh ingest progress while documents are being processed
+    if any(not job.done for job in ingest_jobs.values()):
+        time.sleep(1.0)
+        st.rerun()
 
 
 if __name__ == "__main__":
@@ -11,8 +11,16 @@ from typing import List, Optional
 
 from src.jurisai import __version__
 from src.jurisai.core.app import run_application
+from src.jurisai.utils.constants import (
+    DEFAULT_INDEX_DIR,
+    DEFAULT_ROW_GROUP_SIZE,
+    VECTOR_DTYPE_NAMES,
+)
 from src.jurisai.utils.log_config import configure_logging, get_logger
 
+# Response of the stubbed LLM used by "profile ask --stub-llm"
+STUB_LLM_ANSWER = "This is a stubbed answer."
+
 
 def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     """Parse command line arguments.
@@ -32,6 +40,20 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="Enable verbose logging"
     )
+    parser.add_argument(
+        "--watch",
+        action="append",
+        metavar="DIR",
+        help="Directory to ingest PDFs from (repeatable, interactive mode)",
+    )
+    parser.add_argument(
+        "--index-dir",
+        default=DEFAULT_INDEX_DIR,
+        help="Persistent vector index directory",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2, help="Documents ingested concurrently"
+    )
     
     # Add subcommands
     subparsers = parser.add_subparsers(dest="command", help="Commands")
@@ -50,9 +72,129 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     search_parser = subparsers.add_parser("search", help="Search legal database")
     search_parser.add_argument("query", help="Search query")
     
+    # Export command
+    export_parser = subparsers.add_parser(
+        "export", help="Export the index's chunks and embeddings to Parquet"
+    )
+    export_parser.add_argument("path", help="Parquet file to write")
+    export_parser.add_argument(
+        "--index-dir", default=argparse.SUPPRESS, help="Index directory to export"
+    )
+    export_parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+        help="Chunks per Parquet row group",
+    )
+    
+    # Import command
+    import_parser = subparsers.add_parser(
+        "import", help="Rebuild an index from a Parquet export without re-embedding"
+    )
+    import_parser.add_argument("path", help="Parquet file to read")
+    import_parser.add_argument(
+        "--index-dir", default=argparse.SUPPRESS, help="Index directory to create"
+    )
+    import_parser.add_argument(
+        "--dtype",
+        choices=sorted(VECTOR_DTYPE_NAMES),
+        help="Vector storage type of the new index (default: as exported)",
+    )
+    
+    # Profile command
+    profile_parser = subparsers.add_parser(
+        "profile", help="Profile the ingest or question answering path"
+    )
+    profile_parser.add_argument(
+        "--output-dir",
+        default="profiles",
+        help="Directory for the collapsed-stack and pstats files",
+    )
+    profile_parser.add_argument(
+        "--top", type=int, default=20, help="Hotspots and allocation sites to show"
+    )
+    profile_subparsers = profile_parser.add_subparsers(
+        dest="profile_command", required=True
+    )
+    profile_ingest_parser = profile_subparsers.add_parser(
+        "ingest", help="Profile loading, chunking and embedding a PDF"
+    )
+    profile_ingest_parser.add_argument("file", help="PDF file to ingest")
+    profile_ask_parser = profile_subparsers.add_parser(
+        "ask", help="Profile answering a question about a PDF"
+    )
+    profile_ask_parser.add_argument("file", help="PDF file to ask about")
+    profile_ask_parser.add_argument("question", help="Question to answer")
+    profile_ask_parser.add_argument(
+        "--model", default="deepseek-r1:1.5b", help="Ollama model to answer with"
+    )
+    profile_ask_parser.add_argument(
+        "-k", type=int, default=3, help="Number of chunks to retrieve"
+    )
+    profile_ask_parser.add_argument(
+        "--stub-llm",
+        action="store_true",
+        help="Answer with a canned response instead of calling Ollama",
+    )
+    
     return parser.parse_args(args)
 
 
+def run_profile(parsed_args: argparse.Namespace) -> int:
+    """Run the ingest or question answering path under the profilers.
+
+    Loading the embeddings model, and for "ask" ingesting the PDF, happen
+    before profiling starts.
+
+    Args:
+        parsed_args: Parsed arguments of the profile command
+
+    Returns:
+        Exit code.
+    """
+    import os
+    
+    from langchain_community.llms import FakeListLLM
+    
+    from src.jurisai.models.document_processor import DocumentProcessor
+    from src.jurisai.models.rag_chain import RAGChain
+    from src.jurisai.utils.profiling import format_report, profile_call
+    
+    with open(parsed_args.file, "rb") as f:
+        content = f.read()
+    filename = os.path.basename(parsed_args.file)
+    processor = DocumentProcessor()
+    
+    try:
+        if parsed_args.profile_command == "ingest":
+            _, report = profile_call(
+                "ingest",
+                lambda: processor.process_pdf(content, filename=filename),
+                parsed_args.output_dir,
+                top_n=parsed_args.top,
+            )
+        else:
+            vector_store = processor.process_pdf(content, filename=filename)
+            rag_chain = RAGChain(model_name=parsed_args.model)
+            if parsed_args.stub_llm:
+                rag_chain.llm = FakeListLLM(responses=[STUB_LLM_ANSWER])
+            answer, report = profile_call(
+                "ask",
+                lambda: rag_chain.answer_question(
+                    rag_chain.create_chain(vector_store, k=parsed_args.k),
+                    parsed_args.question,
+                ),
+                parsed_args.output_dir,
+                top_n=parsed_args.top,
+            )
+            print(f"Answer: {answer}\n")
+    finally:
+        processor.cleanup()
+    
+    print(format_report(report))
+    return 0
+
+
 def main(args: Optional[List[str]] = None) -> int:
     """Run the main application.
 
@@ -107,9 +249,33 @@ def main(args: Optional[List[str]] = None) -> int:
             logger.info("Searching database", query=parsed_args.query)
             # Call the appropriate function
             # search_database(parsed_args.query)
+        elif parsed_args.command == "profile":
+            return run_profile(parsed_args)
+        elif parsed_args.command == "export":
+            from src.jurisai.models.columnar import export_index
+
+            chunks = export_index(
+                parsed_args.index_dir,
+                parsed_args.path,
+                row_group_size=parsed_args.row_group_size,
+            )
+            logger.info("Index exported", path=parsed_args.path, chunks=chunks)
+        elif parsed_args.command == "import":
+            from src.jurisai.models.columnar import import_index
+
+            chunks = import_index(
+                parsed_args.path, parsed_args.index_dir, dtype=parsed_args.dtype
+            )
+            logger.info(
+                "Index imported", index_dir=parsed_args.index_dir, chunks=chunks
+            )
         else:
-            # Default behavior: run the interactive application
-            return run_application()
+            # Default behavior: run the ingestion daemon
+            return run_application(
+                watch_dirs=parsed_args.watch,
+                index_dir=parsed_args.index_dir,
+                workers=parsed_args.workers,
+            )
             
         return 0
     except Exception as e:
@@ -1,21 +1,31 @@
 """Core application module for JurisAI.
 
-This module contains the main application logic and signal handling.
+This module contains the main application logic and signal handling. The
+interactive mode runs the watch-folder ingestion daemon until a signal asks
+it to stop.
 
 Author: a13xh (a13x.h.cc@gmail.com)
 """
 
 import signal
-import time
-from typing import Any, Dict, Optional
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 import structlog
 
+from src.jurisai.utils.constants import DEFAULT_INDEX_DIR
 from src.jurisai.utils.log_config import get_logger
 
+if TYPE_CHECKING:
+    from src.jurisai.core.ingest_daemon import IngestDaemon
 
-# Global flag for graceful shutdown
+
+# Global flag and event for graceful shutdown
 _shutdown_requested = False
+_shutdown_event = threading.Event()
+
+# Ingestion daemon of the running application, drained on cleanup
+_daemon: Optional["IngestDaemon"] = None
 
 
 def setup_signal_handlers(logger: structlog.stdlib.BoundLogger) -> None:
@@ -37,6 +47,7 @@ def setup_signal_handlers(logger: structlog.stdlib.BoundLogger) -> None:
         signame = signal.Signals(sig).name
         logger.info("Received signal, initiating shutdown", signal=signame, signal_number=sig)
         _shutdown_requested = True
+        _shutdown_event.set()
 
     # Register signal handlers
     signal.signal(signal.SIGINT, signal_handler)   # Keyboard interrupt (Ctrl+C)
@@ -53,38 +64,57 @@ def cleanup_resources(logger: structlog.stdlib.BoundLogger) -> None:
     Args:
         logger: Structured logger instance for messages.
     """
+    global _daemon
+
     logger.info("Cleanup started", phase="pre_shutdown")
-    # Close any open files, database connections, etc.
-    # Release any resources, save state, etc.
+    if _daemon is not None:
+        # Drain in-flight ingestion and flush the index
+        _daemon.stop()
+        _daemon = None
     logger.info("Cleanup completed", phase="post_shutdown", status="success")
 
 
-def run_application() -> int:
-    """Run the main application loop.
+def run_application(
+    watch_dirs: Optional[List[str]] = None,
+    index_dir: str = DEFAULT_INDEX_DIR,
+    workers: int = 2,
+) -> int:
+    """Run the ingestion daemon until shutdown is requested.
+
+    Args:
+        watch_dirs: Directories to ingest PDFs from (or None to only wait for
+            a shutdown signal).
+        index_dir: Directory of the persistent vector index.
+        workers: Maximum number of documents ingested at once.
 
     Returns:
         Exit code.
     """
-    global _shutdown_requested
+    global _daemon, _shutdown_requested
     
     logger = get_logger(__name__)
     
+    # Forget the shutdown of a previous run in this process
+    _shutdown_requested = False
+    _shutdown_event.clear()
+    
     # Set up signal handlers
     setup_signal_handlers(logger)
     
     try:
+        if watch_dirs:
+            # Imported here so the CLI starts without loading the ML stack
+            from src.jurisai.core.ingest_daemon import IngestDaemon
+
+            _daemon = IngestDaemon(watch_dirs, index_dir=index_dir, max_workers=workers)
+            _daemon.start()
+
         logger.info("Application initialized", status="success", component="main")
 
-        # Main application loop
-        while not _shutdown_requested:
-            # Your application logic here
-            # For example purposes, we'll just sleep
-            time.sleep(0.1)
-            
-            # Check for shutdown condition
-            if _shutdown_requested:
-                logger.info("Shutdown requested, exiting main loop", reason="signal_received")
-                break
+        # Block until a signal handler requests shutdown
+        if not _shutdown_requested:
+            _shutdown_event.wait()
+        logger.info("Shutdown requested, exiting main loop", reason="signal_received")
                 
         return 0
     except Exception as e:
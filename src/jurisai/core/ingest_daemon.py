@@ -0,0 +1,427 @@
+"""Watch-folder ingestion daemon.
+
+This module watches directories for PDF files and ingests new or changed
+documents into a persistent vector index. File events come from inotify (via
+watchdog) where available, are debounced per path so a file that is still
+being written is ingested once, and are processed by a bounded worker pool.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_community.vectorstores import FAISS
+
+from src.jurisai.utils.constants import DEFAULT_INDEX_DIR, REVISIONS_FILE
+from src.jurisai.models.docstore import (
+    INDEX_FILE,
+    load_vector_store,
+    save_vector_store,
+)
+from src.jurisai.models.document_processor import DocumentProcessor
+from src.jurisai.utils.log_config import get_logger
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional dependency, see the "watch" extra
+    FileSystemEventHandler = object  # type: ignore[misc, assignment]
+    Observer = None  # type: ignore[assignment, misc]
+
+logger = get_logger(__name__)
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forward file system events for PDF files to the daemon."""
+
+    def __init__(self, daemon: "IngestDaemon"):
+        super().__init__()
+        self.daemon = daemon
+
+    def on_any_event(self, event: Any) -> None:
+        # Opening or reading a file (as ingestion itself does) is not a change
+        if event.is_directory or event.event_type in ("opened", "closed_no_write"):
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path:
+                self.daemon.notify(os.fsdecode(path))
+
+
+class IngestDaemon:
+    """Ingest PDFs from watched directories into a persistent vector index."""
+
+    def __init__(
+        self,
+        watch_dirs: Iterable[str],
+        index_dir: str = DEFAULT_INDEX_DIR,
+        processor: Optional[DocumentProcessor] = None,
+        max_workers: int = 2,
+        debounce_s: float = 1.0,
+        poll_interval_s: float = 2.0,
+        use_inotify: bool = True,
+    ):
+        """Initialize the daemon.
+
+        Args:
+            watch_dirs: Directories to watch (recursively) for PDF files
+            index_dir: Directory of the persistent vector index
+            processor: Document processor to ingest with (or None to create one
+                that records revisions next to the index)
+            max_workers: Maximum number of documents ingested at once
+            debounce_s: Quiet period after the last event before a file is
+                ingested
+            poll_interval_s: Scan interval when inotify is unavailable
+            use_inotify: Use watchdog file events if installed
+        """
+        self.watch_dirs = [os.path.abspath(d) for d in watch_dirs]
+        self.index_dir = index_dir
+        self.max_workers = max_workers
+        self.debounce_s = debounce_s
+        self.poll_interval_s = poll_interval_s
+        self.use_inotify = use_inotify and Observer is not None
+
+        os.makedirs(index_dir, exist_ok=True)
+        self.processor = processor or DocumentProcessor(
+            revisions_path=os.path.join(index_dir, REVISIONS_FILE)
+        )
+
+        self.vector_store: Optional[FAISS] = None
+        self._loaded_from_disk = False
+        self._store_lock = threading.Lock()
+        self._bootstrap_lock = threading.Lock()
+        self._dirty = False
+
+        self._cond = threading.Condition()
+        self._pending: Dict[str, float] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._stop = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._threads: List[threading.Thread] = []
+        self._observer: Optional[Any] = None
+        self._counts = {"ingested": 0, "unchanged": 0, "removed": 0, "failed": 0}
+
+    def start(self) -> None:
+        """Load the index, start watching and queue every existing PDF."""
+        if os.path.exists(os.path.join(self.index_dir, INDEX_FILE)):
+            self.vector_store = load_vector_store(
+                self.index_dir, self.processor.embeddings
+            )
+            self._loaded_from_disk = True
+        self._reconcile()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="jurisai-ingest"
+        )
+        self._spawn(self._dispatch_loop, "jurisai-ingest-dispatch")
+
+        if self.use_inotify:
+            observer = Observer()
+            handler = _EventHandler(self)
+            for directory in self.watch_dirs:
+                os.makedirs(directory, exist_ok=True)
+                observer.schedule(handler, directory, recursive=True)
+            observer.start()
+            self._observer = observer
+        else:
+            self._spawn(self._poll_loop, "jurisai-ingest-poll")
+
+        # Files added, changed or deleted while the daemon was down;
+        # unchanged ones are skipped by the revision check
+        present = self._scan()
+        for path in present:
+            self.notify(path)
+        for document_id in self.processor.revisions.document_ids():
+            if document_id not in present and self._watched(document_id):
+                self.notify(document_id)
+
+        logger.info(
+            "Ingestion daemon started",
+            watch_dirs=self.watch_dirs,
+            index_dir=self.index_dir,
+            workers=self.max_workers,
+            backend="inotify" if self.use_inotify else "polling",
+        )
+
+    def _reconcile(self) -> None:
+        """Forget revisions whose chunks did not reach the saved index.
+
+        Revisions are recorded as soon as a document is ingested but the index
+        is only written on flush, so after a crash the two can disagree. Such
+        documents are dropped from the index and ingested again.
+        """
+        stored: Set[str] = set()
+        if self.vector_store is not None:
+            stored = set(self.vector_store.index_to_docstore_id.values())
+
+        for document_id in self.processor.revisions.document_ids():
+            revision = self.processor.revisions.get(document_id)
+            if revision is None or stored.issuperset(revision.chunk_ids()):
+                continue
+            self.processor.revisions.remove(document_id)
+            orphans = [i for i in stored if i.startswith(f"{document_id}:")]
+            if orphans and self.vector_store is not None:
+                self.vector_store.delete(orphans)
+                self._dirty = True
+            logger.warning("Revision out of sync with index", document_id=document_id)
+
+    def _spawn(self, target: Any, name: str) -> None:
+        """Start a daemon thread."""
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Return the modification time and size of every watched PDF."""
+        found = {}
+        for directory in self.watch_dirs:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if not self._wanted(path):
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    found[path] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def _watched(self, path: str) -> bool:
+        """Check whether a path lies in one of the watched directories."""
+        return any(
+            os.path.commonpath([path, directory]) == directory
+            for directory in self.watch_dirs
+        )
+
+    @staticmethod
+    def _wanted(path: str) -> bool:
+        """Check whether a path is a PDF that should be ingested."""
+        name = os.path.basename(path)
+        return name.lower().endswith(".pdf") and not name.startswith(".")
+
+    def notify(self, path: str) -> None:
+        """Record a change to a file; it is ingested once events settle.
+
+        Args:
+            path: Path of the created, modified or deleted file
+        """
+        if not self._wanted(path):
+            return
+        with self._cond:
+            self._pending[os.path.abspath(path)] = time.monotonic() + self.debounce_s
+            self._cond.notify_all()
+
+    def _poll_loop(self) -> None:
+        """Detect changes by rescanning when inotify is unavailable."""
+        known = self._scan()
+        while not self._stop.wait(self.poll_interval_s):
+            current = self._scan()
+            for path in set(known) | set(current):
+                if known.get(path) != current.get(path):
+                    self.notify(path)
+            known = current
+
+    def _dispatch_loop(self) -> None:
+        """Submit debounced paths to the worker pool, one job per path."""
+        executor = self._executor
+        if executor is None:
+            return
+        while True:
+            with self._cond:
+                if self._stop.is_set():
+                    return
+                now = time.monotonic()
+                due = [
+                    path
+                    for path, deadline in self._pending.items()
+                    if deadline <= now and path not in self._in_flight
+                ]
+                slots = self.max_workers - len(self._in_flight)
+                due.sort(key=lambda path: self._pending[path])
+                for path in due[: max(slots, 0)]:
+                    del self._pending[path]
+                    future = executor.submit(self._ingest, path)
+                    self._in_flight[path] = future
+                    future.add_done_callback(functools.partial(self._finished, path))
+
+                # Persist once the queue drains, so a crash loses little
+                flush_due = not self._pending and not self._in_flight and self._dirty
+                if not flush_due:
+                    waiting = [
+                        deadline
+                        for path, deadline in self._pending.items()
+                        if path not in self._in_flight
+                    ]
+                    if waiting and len(self._in_flight) < self.max_workers:
+                        self._cond.wait(max(min(waiting) - now, 0.01))
+                    else:
+                        self._cond.wait()
+                    continue
+
+            # Saving can take a while; events and finishing jobs must not wait
+            # for it, so it runs without the condition held
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Index flush failed", error=str(e))
+                with self._cond:
+                    if not self._stop.is_set():
+                        self._cond.wait(self.poll_interval_s)
+
+    def _finished(self, path: str, future: Future) -> None:
+        """Release the slot of a finished job."""
+        with self._cond:
+            self._in_flight.pop(path, None)
+            self._cond.notify_all()
+
+    def _ingest(self, path: str) -> None:
+        """Ingest, re-index or remove one document.
+
+        Args:
+            path: Absolute path of the PDF
+        """
+        try:
+            if not os.path.exists(path):
+                self._remove(path)
+                return
+
+            with open(path, "rb") as f:
+                content = f.read()
+
+            # Chunks are recorded under the full path: files with the same
+            # name in different watched folders are different documents
+            diff = None
+            with self._bootstrap_lock:
+                if self.vector_store is None:
+                    # The first document creates the store; later ones patch it
+                    self.vector_store, diff = self.processor.process_revision(
+                        content, path, None, path
+                    )
+
+            if diff is None:
+                _, diff = self.processor.process_revision(
+                    content, path, self.vector_store, path, lock=self._store_lock
+                )
+
+            changed = bool(diff.added_chunks or diff.removed_chunks)
+            with self._cond:
+                self._counts["ingested" if changed else "unchanged"] += 1
+                self._dirty = self._dirty or changed
+            logger.info(
+                "Document ingested",
+                path=path,
+                version=diff.version,
+                added_chunks=diff.added_chunks,
+                removed_chunks=diff.removed_chunks,
+                embedded_chunks=diff.embedded_chunks,
+            )
+        except Exception as e:
+            with self._cond:
+                self._counts["failed"] += 1
+            logger.error("Document ingestion failed", path=path, error=str(e))
+
+    def _remove(self, path: str) -> None:
+        """Drop the chunks of a deleted document from the index.
+
+        Args:
+            path: Absolute path of the deleted PDF
+        """
+        revision = self.processor.revisions.remove(path)
+        if revision is None or self.vector_store is None:
+            return
+        with self._store_lock:
+            chunk_ids = revision.chunk_ids()
+            if chunk_ids:
+                self.vector_store.delete(chunk_ids)
+        with self._cond:
+            self._counts["removed"] += 1
+            self._dirty = True
+        logger.info("Document removed", path=path, removed_chunks=len(chunk_ids))
+
+    def flush(self) -> None:
+        """Write the index to disk if documents changed since the last flush.
+
+        Called automatically whenever the ingestion queue drains and on stop.
+        """
+        # Changes made while saving mark the index dirty again
+        with self._cond:
+            dirty, self._dirty = self._dirty, False
+        if not dirty:
+            return
+        try:
+            with self._store_lock:
+                if self.vector_store is None:
+                    return
+                save_vector_store(self.vector_store, self.index_dir)
+                if not self._loaded_from_disk:
+                    # Continue on the saved copy so later flushes update it
+                    # in place
+                    self.vector_store = load_vector_store(
+                        self.index_dir, self.processor.embeddings
+                    )
+                    self._loaded_from_disk = True
+        except BaseException:
+            with self._cond:
+                self._dirty = True
+            raise
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop watching, drain in-flight ingestion and flush the index.
+
+        Pending events that were not dispatched yet are dropped; the files are
+        picked up by the startup scan next time.
+
+        Args:
+            timeout: Maximum seconds to wait for each background thread
+        """
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout)
+
+        with self._cond:
+            self._stop.set()
+            dropped = len(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+        self.flush()
+        self.processor.cleanup()
+
+        logger.info("Ingestion daemon stopped", dropped_events=dropped, **self.stats())
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no file events are pending or being ingested.
+
+        Args:
+            timeout: Maximum seconds to wait (or None to wait indefinitely)
+
+        Returns:
+            True if the daemon became idle before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(0.05 if remaining is None else min(remaining, 0.05))
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Return ingestion counters and queue sizes."""
+        with self._cond:
+            return dict(
+                self._counts,
+                pending=len(self._pending),
+                in_flight=len(self._in_flight),
+            )
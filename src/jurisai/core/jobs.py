@@ -0,0 +1,402 @@
+"""Background ingest jobs module.
+
+This module runs document ingests off the request path. Jobs of every session
+share one bounded worker pool and are admitted against the memory budget. Each
+job reports its progress per stage, can be cancelled between batches, and
+publishes its partial index to the session's corpus after every embedded
+batch, so a document can be queried while it is still being indexed.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import contextlib
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.jurisai.core.memory import MemoryManager
+from src.jurisai.models.corpus import DocumentCorpus
+from src.jurisai.models.document_processor import DocumentProcessor
+from src.jurisai.models.summary_index import (
+    SummaryBuilder,
+    SummaryIndex,
+    stored_documents,
+)
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_WAITING = "waiting for memory"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it was cancelled."""
+
+
+class IngestJob:
+    """A document ingest running on the shared worker pool."""
+
+    def __init__(self, session_id: str, name: str):
+        """Initialize the job.
+
+        Args:
+            session_id: Session that submitted the job
+            name: Name of the ingested document
+        """
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.name = name
+        self.state = JOB_QUEUED
+        self.stage: Optional[str] = None
+        self.stages: Dict[str, Tuple[int, int]] = {}
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation was requested."""
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, successfully or not."""
+        return self.state in FINISHED_STATES
+
+    def cancel(self) -> None:
+        """Request cancellation.
+
+        A queued job is cancelled right away; a running job stops at its next
+        check().
+        """
+        self._cancel.set()
+        future = self._future
+        if future is not None and future.cancel():
+            self._finish(JOB_CANCELLED)
+
+    def check(self) -> None:
+        """Stop the job if it was cancelled.
+
+        Raises:
+            JobCancelled: If cancellation was requested
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(f"Ingest of {self.name} was cancelled")
+
+    def report(self, stage: str, done: int, total: int) -> None:
+        """Record the progress of a stage.
+
+        Args:
+            stage: Stage name
+            done: Units of work done in the stage
+            total: Units of work of the stage known so far
+        """
+        with self._lock:
+            self.stage = stage
+            self.stages[stage] = (done, total)
+
+    def _set_state(self, state: str) -> None:
+        """Move the job to a new state."""
+        with self._lock:
+            self.state = state
+            if state == JOB_RUNNING and self.started is None:
+                self.started = time.monotonic()
+
+    def _finish(
+        self, state: str, result: Any = None, error: Optional[str] = None
+    ) -> None:
+        """Record the outcome of the job."""
+        with self._lock:
+            self.state = state
+            self.result = result
+            self.error = error
+            self.finished = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the state of the job.
+
+        Returns:
+            Identifiers, state, current stage, per-stage progress, error and
+            elapsed seconds
+        """
+        with self._lock:
+            end = self.finished if self.finished is not None else time.monotonic()
+            return {
+                "id": self.id,
+                "session_id": self.session_id,
+                "name": self.name,
+                "state": self.state,
+                "stage": self.stage,
+                "stages": {
+                    stage: {"done": done, "total": total}
+                    for stage, (done, total) in self.stages.items()
+                },
+                "error": self.error,
+                "elapsed_s": end - (self.started or self.submitted),
+            }
+
+
+class JobExecutor:
+    """Run the ingest jobs of every session on a shared pool of workers."""
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        memory_manager: Optional[MemoryManager] = None,
+        admit_timeout: Optional[float] = 600.0,
+        keep_finished: int = 100,
+    ):
+        """Initialize the executor.
+
+        Args:
+            max_workers: Maximum number of jobs running at once
+            memory_manager: Memory manager admitting jobs against the budget
+                (or None to run jobs without admission control)
+            admit_timeout: Maximum seconds a job waits for memory
+            keep_finished: Number of finished jobs kept for display
+        """
+        self.max_workers = max_workers
+        self.memory_manager = memory_manager
+        self.admit_timeout = admit_timeout
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="jurisai-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, IngestJob] = {}
+
+    def submit(
+        self,
+        session_id: str,
+        name: str,
+        work: Callable[[IngestJob], Any],
+        estimate_bytes: int = 0,
+    ) -> IngestJob:
+        """Queue a job.
+
+        Args:
+            session_id: Session submitting the job
+            name: Name of the ingested document
+            work: Function doing the work; it receives the job to report
+                progress to and should call job.check() between steps
+            estimate_bytes: Estimated peak memory of the job
+
+        Returns:
+            The queued job
+        """
+        job = IngestJob(session_id, name)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job._future = self._pool.submit(self._run, job, work, estimate_bytes)
+        logger.info(
+            "Ingest job queued", job_id=job.id, session_id=session_id, name=name
+        )
+        return job
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond keep_finished.
+
+        Must be called with the lock held.
+        """
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[: max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job.id]
+
+    def _run(
+        self, job: IngestJob, work: Callable[[IngestJob], Any], estimate_bytes: int
+    ) -> None:
+        """Run a job on a worker and record its outcome."""
+        try:
+            job.check()
+            admission: Any = contextlib.nullcontext()
+            if self.memory_manager is not None and estimate_bytes:
+                job._set_state(JOB_WAITING)
+                admission = self.memory_manager.admit(
+                    estimate_bytes,
+                    session_id=job.session_id,
+                    timeout=self.admit_timeout,
+                )
+            with admission:
+                job.check()
+                job._set_state(JOB_RUNNING)
+                result = work(job)
+            job._finish(JOB_DONE, result=result)
+        except JobCancelled:
+            job._finish(JOB_CANCELLED)
+        except Exception as e:
+            job._finish(JOB_FAILED, error=str(e))
+            logger.error(
+                "Ingest job failed", job_id=job.id, name=job.name, error=str(e)
+            )
+        snapshot = job.snapshot()
+        logger.info(
+            "Ingest job finished",
+            job_id=job.id,
+            name=job.name,
+            state=job.state,
+            elapsed_s=round(snapshot["elapsed_s"], 2),
+        )
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Return a job by id, if it is still known."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, session_id: Optional[str] = None) -> List[IngestJob]:
+        """Return the known jobs in submission order.
+
+        Args:
+            session_id: Session whose jobs to return (or None for all)
+
+        Returns:
+            List of jobs
+        """
+        with self._lock:
+            return [
+                job
+                for job in self._jobs.values()
+                if session_id is None or job.session_id == session_id
+            ]
+
+    def cancel(self, session_id: str, name: Optional[str] = None) -> int:
+        """Cancel the unfinished jobs of a session.
+
+        Args:
+            session_id: Session whose jobs to cancel
+            name: Document whose jobs to cancel (or None for all of them)
+
+        Returns:
+            Number of jobs cancelled
+        """
+        cancelled = 0
+        for job in self.jobs(session_id):
+            if not job.done and name in (None, job.name):
+                job.cancel()
+                cancelled += 1
+        return cancelled
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of known jobs in each state."""
+        counts = {state: 0 for state in (JOB_QUEUED, JOB_WAITING, JOB_RUNNING)}
+        counts.update({state: 0 for state in FINISHED_STATES})
+        for job in self.jobs():
+            counts[job.state] += 1
+        return counts
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel every unfinished job and stop the workers.
+
+        Args:
+            wait: Whether to wait for running jobs to stop
+        """
+        for job in self.jobs():
+            if not job.done:
+                job.cancel()
+        self._pool.shutdown(wait=wait)
+
+
+def ingest_document(
+    job: IngestJob,
+    pdf_content: bytes,
+    processor: DocumentProcessor,
+    corpus: DocumentCorpus,
+    memory_manager: Optional[MemoryManager] = None,
+    summary_builder: Optional[SummaryBuilder] = None,
+    summary_index: Optional[SummaryIndex] = None,
+    pages_per_batch: int = 8,
+    vector_dtype: Optional[str] = None,
+) -> Any:
+    """Index an uploaded PDF into a session's corpus as a job.
+
+    The partial index joins the corpus after every embedded batch. Once the
+    document is complete it is optionally summarized and registered with the
+    memory manager, so it can be evicted while idle. A cancelled or failed
+    ingest takes its partial index out of the corpus again.
+
+    A document re-uploaded under the name of one already in the corpus is not
+    published in part: the previous version keeps answering until the new
+    one is complete, and stays in place if the ingest fails or is cancelled.
+
+    Args:
+        job: Job running the ingest (its name is the document name)
+        pdf_content: Binary content of the PDF file
+        processor: Document processor to ingest with
+        corpus: Corpus of the session
+        memory_manager: Memory manager accounting for the session's indexes
+        summary_builder: Builder summarizing the document (or None to skip)
+        summary_index: Summary index of the session receiving the summaries
+        pages_per_batch: Number of pages indexed before the partial index is
+            published
+        vector_dtype: Vector storage type of the document (or None for the
+            processor's)
+
+    Returns:
+        The IndexHandle of the document, or its vector store without a memory
+        manager
+    """
+    lock = threading.RLock()
+    vector_store = None
+    replacing = job.name in corpus.names()
+    published = False
+    registered = False
+    try:
+        for progress in processor.iter_process_pdf(
+            pdf_content,
+            filename=job.name,
+            pages_per_batch=pages_per_batch,
+            lock=lock,
+            vector_dtype=vector_dtype,
+        ):
+            job.check()
+            if progress.stage == "embed":
+                job.report("embed", progress.chunks_indexed, progress.chunks_split)
+                if progress.vector_store is not None:
+                    vector_store = progress.vector_store
+                    if not replacing:
+                        corpus.add_document(job.name, vector_store, lock=lock)
+                        published = True
+            else:
+                job.report(progress.stage, progress.pages_done, progress.pages_total)
+        job.check()
+        if vector_store is None:
+            raise ValueError(f"No document chunks to index in {job.name}")
+
+        summaries = None
+        if summary_builder is not None and summary_index is not None:
+            job.report("summarize", 0, 1)
+            summaries = summary_builder.build(stored_documents(vector_store))
+            job.check()
+            job.report("summarize", 1, 1)
+
+        # Registering discards the handle of the previous version, which can
+        # no longer be restored from here on
+        result: Any = vector_store
+        if memory_manager is not None:
+            result = memory_manager.register_index(
+                job.session_id, vector_store, processor.embeddings, name=job.name
+            )
+            registered = True
+        corpus.add_document(job.name, result)
+        if summaries is not None and summary_index is not None:
+            summary_index.documents.update(summaries.documents)
+        return result
+    except BaseException:
+        if published or registered:
+            corpus.remove_document(job.name)
+        if registered and memory_manager is not None:
+            memory_manager.release(job.session_id, job.name)
+        raise
@@ -0,0 +1,408 @@
+"""Memory accounting and admission control module.
+
+This module keeps the server within a memory budget. It tracks the process
+RSS together with the estimated size of every loaded model and session
+index, admits ingest jobs only when their estimated peak fits the budget
+(queueing them otherwise), and evicts idle session indexes to disk under
+pressure. Evicted indexes are reloaded memory-mapped on their next use.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import contextlib
+import gc
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psutil
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from src.jurisai.models.docstore import load_vector_store, save_vector_store
+from src.jurisai.models.vector_index import index_footprint
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Share of system memory used as the default budget
+DEFAULT_BUDGET_FRACTION = 0.75
+BUDGET_ENV_VAR = "JURISAI_MEMORY_BUDGET_MB"
+
+# Peak ingest memory as a multiple of the PDF size (raw bytes, temp copy,
+# parsed pages, chunk texts and embedding batches)
+INGEST_BYTES_PER_PDF_BYTE = 6
+INGEST_BASE_BYTES = 64 * 1024 * 1024
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """Raised when an ingest job cannot be admitted in time."""
+
+
+def default_budget_bytes() -> int:
+    """Return the memory budget from the environment or system memory.
+
+    Returns:
+        Budget in bytes
+    """
+    configured = os.environ.get(BUDGET_ENV_VAR)
+    if configured:
+        return int(float(configured) * 1024 * 1024)
+    return int(psutil.virtual_memory().total * DEFAULT_BUDGET_FRACTION)
+
+
+def estimate_ingest_bytes(pdf_bytes: int) -> int:
+    """Estimate the peak memory needed to ingest a PDF.
+
+    Args:
+        pdf_bytes: Size of the PDF file
+
+    Returns:
+        Estimated peak bytes
+    """
+    return INGEST_BASE_BYTES + INGEST_BYTES_PER_PDF_BYTE * pdf_bytes
+
+
+def estimate_model_bytes(embeddings: Embeddings) -> int:
+    """Estimate the memory held by an embeddings model.
+
+    Counts the parameters of the underlying torch model when there is one.
+
+    Args:
+        embeddings: Embeddings model
+
+    Returns:
+        Estimated bytes (0 if unknown)
+    """
+    model = getattr(embeddings, "client", None)
+    parameters = getattr(model, "parameters", None)
+    if parameters is None:
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return 0
+
+
+def _index_bytes(vector_store: FAISS) -> int:
+    """Return the estimated resident size of a vector store."""
+    try:
+        return int(index_footprint(vector_store)["total_bytes"])
+    except Exception:
+        return 0
+
+
+class IndexHandle:
+    """A session's vector store that may be evicted to disk and reloaded."""
+
+    def __init__(
+        self,
+        manager: "MemoryManager",
+        session_id: str,
+        vector_store: FAISS,
+        embeddings: Embeddings,
+        name: str = "default",
+    ):
+        """Initialize the handle.
+
+        Args:
+            manager: Memory manager accounting for the index
+            session_id: Session owning the index
+            vector_store: Vector store of the session
+            embeddings: Embeddings model used to reload the store
+            name: Name of the index within the session
+        """
+        self.manager = manager
+        self.session_id = session_id
+        self.name = name
+        self.embeddings = embeddings
+        self.spill_path = os.path.join(
+            manager.spill_dir,
+            session_id,
+            hashlib.sha256(name.encode("utf-8")).hexdigest()[:16],
+        )
+        self.estimated_bytes = _index_bytes(vector_store)
+        self.last_used = time.monotonic()
+        self._vector_store: Optional[FAISS] = vector_store
+        self._lock = threading.RLock()
+
+    @property
+    def resident(self) -> bool:
+        """Whether the index is currently loaded."""
+        return self._vector_store is not None
+
+    def get(self) -> FAISS:
+        """Return the vector store, reloading it if it was evicted.
+
+        Callers should not keep the returned store beyond the current request,
+        so eviction can release it.
+
+        Returns:
+            The session's vector store
+        """
+        with self._lock:
+            self.last_used = time.monotonic()
+            if self._vector_store is None:
+                self._vector_store = load_vector_store(self.spill_path, self.embeddings)
+                self.estimated_bytes = _index_bytes(self._vector_store)
+                logger.info("Index reloaded", session_id=self.session_id)
+            return self._vector_store
+
+    def evict(self) -> int:
+        """Write the index to disk and drop it from memory.
+
+        Returns:
+            Estimated bytes released
+        """
+        with self._lock:
+            if self._vector_store is None:
+                return 0
+            save_vector_store(self._vector_store, self.spill_path)
+            self._vector_store = None
+            released = self.estimated_bytes
+            logger.info(
+                "Index evicted", session_id=self.session_id, released_bytes=released
+            )
+            return released
+
+    def discard(self) -> None:
+        """Drop the index and its spill files."""
+        with self._lock:
+            self._vector_store = None
+            shutil.rmtree(self.spill_path, ignore_errors=True)
+
+
+class MemoryManager:
+    """Track memory use and admit ingest jobs against a budget."""
+
+    def __init__(
+        self,
+        budget_bytes: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        idle_seconds: float = 300.0,
+        rss: Optional[Any] = None,
+    ):
+        """Initialize the memory manager.
+
+        Args:
+            budget_bytes: Memory budget (defaults to $JURISAI_MEMORY_BUDGET_MB
+                or a share of system memory)
+            spill_dir: Directory evicted indexes are written to
+            idle_seconds: Minimum idle time before an index may be evicted
+            rss: Callable returning the process RSS (defaults to psutil)
+        """
+        self.budget_bytes = budget_bytes or default_budget_bytes()
+        self.spill_dir = spill_dir or os.path.join(
+            tempfile.gettempdir(), f"jurisai-spill-{os.getpid()}"
+        )
+        self.idle_seconds = idle_seconds
+        self._rss = rss or (lambda: psutil.Process().memory_info().rss)
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._models: Dict[str, int] = {}
+        self._indexes: Dict[Tuple[str, str], IndexHandle] = {}
+        self._reservations: Dict[int, int] = {}
+        self._next_ticket = 0
+        self._queued = 0
+        self._evictions = 0
+
+    def rss(self) -> int:
+        """Return the current process RSS in bytes."""
+        return int(self._rss())
+
+    def register_model(self, name: str, size_bytes: int) -> None:
+        """Account for a loaded model shared by all sessions.
+
+        Args:
+            name: Model name
+            size_bytes: Estimated memory held by the model
+        """
+        with self._cond:
+            self._models[name] = size_bytes
+
+    def register_index(
+        self,
+        session_id: str,
+        vector_store: FAISS,
+        embeddings: Embeddings,
+        name: str = "default",
+    ) -> IndexHandle:
+        """Account for a session's index, replacing any index of the same name.
+
+        Args:
+            session_id: Session owning the index
+            vector_store: Vector store of the session
+            embeddings: Embeddings model used to reload the store
+            name: Name of the index within the session (e.g. a document name)
+
+        Returns:
+            Handle through which the session accesses its index
+        """
+        handle = IndexHandle(self, session_id, vector_store, embeddings, name)
+        with self._cond:
+            previous = self._indexes.pop((session_id, name), None)
+            self._indexes[(session_id, name)] = handle
+        if previous is not None:
+            previous.discard()
+        return handle
+
+    def release(self, session_id: str, name: Optional[str] = None) -> None:
+        """Forget a session's indexes and delete their spill files.
+
+        Args:
+            session_id: Session owning the indexes
+            name: Name of the index to release (or None for all of them)
+        """
+        with self._cond:
+            keys = [
+                key
+                for key in self._indexes
+                if key[0] == session_id and name in (None, key[1])
+            ]
+            handles = [self._indexes.pop(key) for key in keys]
+            self._cond.notify_all()
+        for handle in handles:
+            handle.discard()
+
+    def _projected(self, released: int = 0) -> int:
+        """Return RSS plus reserved bytes, minus bytes released by evictions
+        that the RSS may not reflect yet."""
+        with self._cond:
+            reserved = sum(self._reservations.values())
+        return self.rss() + reserved - released
+
+    def evict_idle(self, needed_bytes: int = 0, exclude: Optional[str] = None) -> int:
+        """Evict least recently used idle indexes until needed_bytes fit.
+
+        Args:
+            needed_bytes: Bytes that should fit in the budget afterwards
+            exclude: Session whose index must stay loaded
+
+        Returns:
+            Estimated bytes released
+        """
+        now = time.monotonic()
+        with self._cond:
+            candidates = sorted(
+                (
+                    handle
+                    for handle in self._indexes.values()
+                    if handle.session_id != exclude
+                    and handle.resident
+                    and now - handle.last_used >= self.idle_seconds
+                ),
+                key=lambda handle: handle.last_used,
+            )
+
+        released = 0
+        for handle in candidates:
+            if self._projected(released) + needed_bytes <= self.budget_bytes:
+                break
+            released += handle.evict()
+            with self._cond:
+                self._evictions += 1
+
+        if released:
+            gc.collect()
+        return released
+
+    @contextlib.contextmanager
+    def admit(
+        self,
+        estimate_bytes: int,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[None]:
+        """Run an ingest job once its estimated memory fits the budget.
+
+        Idle indexes of other sessions are evicted first. If the job still
+        does not fit, it waits until other jobs finish; a job is always
+        admitted when no other job is running, so a single oversized upload
+        cannot block forever.
+
+        Args:
+            estimate_bytes: Estimated peak memory of the job
+            session_id: Session submitting the job (its index is not evicted)
+            timeout: Maximum seconds to wait (or None to wait indefinitely)
+
+        Raises:
+            MemoryBudgetExceeded: If the job was not admitted in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.evict_idle(estimate_bytes, exclude=session_id)
+
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            queued = False
+            while (
+                self._reservations
+                and self._projected() + estimate_bytes > self.budget_bytes
+            ):
+                if not queued:
+                    queued = True
+                    self._queued += 1
+                    logger.info(
+                        "Ingest queued for memory",
+                        session_id=session_id,
+                        estimate_bytes=estimate_bytes,
+                        **self.usage(),
+                    )
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._queued -= 1
+                    raise MemoryBudgetExceeded(
+                        f"Not enough memory to ingest ({estimate_bytes} bytes "
+                        f"needed, budget {self.budget_bytes} bytes)"
+                    )
+                self._cond.wait(1.0 if remaining is None else min(remaining, 1.0))
+            if queued:
+                self._queued -= 1
+            self._reservations[ticket] = estimate_bytes
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                del self._reservations[ticket]
+                self._cond.notify_all()
+
+    def enforce(self) -> int:
+        """Evict idle indexes while usage is above the budget.
+
+        Returns:
+            Estimated bytes released
+        """
+        return self.evict_idle()
+
+    def usage(self) -> Dict[str, Any]:
+        """Return current memory usage.
+
+        Returns:
+            RSS, budget, model and index estimates, reservations and counters
+        """
+        with self._cond:
+            handles: List[IndexHandle] = list(self._indexes.values())
+            return {
+                "rss_bytes": self.rss(),
+                "budget_bytes": self.budget_bytes,
+                "model_bytes": sum(self._models.values()),
+                "index_bytes": sum(h.estimated_bytes for h in handles if h.resident),
+                "indexes_resident": sum(h.resident for h in handles),
+                "indexes_evicted": sum(not h.resident for h in handles),
+                "reserved_bytes": sum(self._reservations.values()),
+                "ingests_running": len(self._reservations),
+                "ingests_queued": self._queued,
+                "evictions": self._evictions,
+            }
+
+    def close(self) -> None:
+        """Delete every spill file."""
+        with self._cond:
+            self._indexes.clear()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -0,0 +1,388 @@
+"""Columnar export module.
+
+This module moves vector stores in and out of Parquet. Chunks, their metadata
+and their embedding vectors are written one row group at a time, and read
+back memory-mapped, so an index can be copied between nodes and its FAISS
+index rebuilt from the stored vectors without re-embedding. The files can
+also be loaded into pandas for offline analysis of the corpus. Exports of a
+persistent index carry its revision records, so incremental re-indexing
+continues where it left off after an import.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from src.jurisai.models.docstore import (
+    DOCSTORE_DIR,
+    CompactDocstore,
+    INDEX_FILE,
+    load_vector_store,
+    new_compact_store,
+    save_vector_store,
+)
+from src.jurisai.models.metadata_index import FilteredFAISS
+from src.jurisai.models.vector_index import (
+    VECTOR_DTYPES,
+    create_faiss_index,
+    index_dtype,
+)
+from src.jurisai.utils.constants import DEFAULT_ROW_GROUP_SIZE, REVISIONS_FILE
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+FORMAT_VERSION = 1
+SCHEMA_METADATA_KEY = b"jurisai"
+REVISIONS_METADATA_KEY = b"jurisai.revisions"
+
+# Columns without the embedding vectors, for analytics
+CHUNK_COLUMNS = ["id", "source", "page", "section", "text", "metadata"]
+
+
+class _StoredVectorsOnly(Embeddings):
+    """Placeholder embeddings for stores that are only exported or imported."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise RuntimeError("No embeddings model was given for this vector store")
+
+    def embed_query(self, text: str) -> List[float]:
+        raise RuntimeError("No embeddings model was given for this vector store")
+
+
+def export_schema(dimension: int) -> pa.Schema:
+    """Return the Parquet schema of an export.
+
+    Args:
+        dimension: Dimension of the embedding vectors
+
+    Returns:
+        Arrow schema with one row per chunk
+    """
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("source", pa.string()),
+            ("page", pa.int32()),
+            ("section", pa.string()),
+            ("text", pa.string()),
+            ("metadata", pa.string()),
+            ("embedding", pa.list_(pa.float32(), dimension)),
+        ]
+    )
+
+
+def _embedding_model(vector_store: FAISS) -> Optional[str]:
+    """Return the name of the embeddings model of a vector store, if known."""
+    embeddings = vector_store.embedding_function
+    return getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None)
+
+
+def export_parquet(
+    vector_store: FAISS,
+    path: str,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    revisions: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Write the chunks and vectors of a vector store to a Parquet file.
+
+    Vectors are read back from the FAISS index, so quantized indexes export
+    their decoded vectors.
+
+    Args:
+        vector_store: FAISS vector store to export
+        path: Target Parquet file
+        row_group_size: Number of chunks per row group
+        revisions: Revision records of the stored documents, as saved by
+            RevisionTracker (or None if there are none)
+
+    Returns:
+        Number of chunks written
+    """
+    index = vector_store.index
+    dimension = int(index.d)
+    total = int(index.ntotal)
+    ids = list(vector_store.index_to_docstore_id.values())
+
+    metadata = {
+        SCHEMA_METADATA_KEY: json.dumps(
+            {
+                "format_version": FORMAT_VERSION,
+                "dimension": dimension,
+                "dtype": index_dtype(index),
+                "embedding_model": _embedding_model(vector_store),
+                "chunks": total,
+            }
+        )
+    }
+    if revisions is not None:
+        metadata[REVISIONS_METADATA_KEY] = json.dumps(revisions)
+    schema = export_schema(dimension).with_metadata(metadata)
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, total, row_group_size):
+            count = min(row_group_size, total - start)
+            vectors = index.reconstruct_n(start, count).astype(np.float32, copy=False)
+            documents: List[Document] = []
+            for doc_id in ids[start : start + count]:
+                doc = vector_store.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Chunk {doc_id} is missing from the docstore")
+                documents.append(doc)
+            pages = [doc.metadata.get("page") for doc in documents]
+            batch = pa.RecordBatch.from_arrays(
+                [
+                    pa.array(ids[start : start + count], pa.string()),
+                    pa.array(
+                        [doc.metadata.get("source") for doc in documents], pa.string()
+                    ),
+                    pa.array(
+                        [p if isinstance(p, int) else None for p in pages], pa.int32()
+                    ),
+                    pa.array(
+                        [doc.metadata.get("section") for doc in documents], pa.string()
+                    ),
+                    pa.array([doc.page_content for doc in documents], pa.string()),
+                    pa.array(
+                        [json.dumps(doc.metadata, default=str) for doc in documents]
+                    ),
+                    pa.FixedSizeListArray.from_arrays(vectors.reshape(-1), dimension),
+                ],
+                schema=schema,
+            )
+            writer.write_batch(batch, row_group_size=row_group_size)
+
+    logger.info("Vector store exported", path=path, chunks=total, dimension=dimension)
+    return total
+
+
+def read_export_info(path: str) -> Dict[str, Any]:
+    """Return the metadata recorded in an export.
+
+    Args:
+        path: Parquet file written by export_parquet
+
+    Returns:
+        Format version, dimension, vector dtype, embeddings model and size
+    """
+    schema = pq.read_schema(path, memory_map=True)
+    raw = (schema.metadata or {}).get(SCHEMA_METADATA_KEY)
+    if raw is None:
+        raise ValueError(f"{path} is not a JurisAI export")
+    info: Dict[str, Any] = json.loads(raw)
+    if info.get("format_version", 0) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format version {info['format_version']}")
+    return info
+
+
+def read_export_revisions(path: str) -> Optional[Dict[str, Any]]:
+    """Return the revision records carried by an export.
+
+    Args:
+        path: Parquet file written by export_parquet
+
+    Returns:
+        Revision records as saved by RevisionTracker, or None if the export
+        has none
+    """
+    schema = pq.read_schema(path, memory_map=True)
+    raw = (schema.metadata or {}).get(REVISIONS_METADATA_KEY)
+    if raw is None:
+        return None
+    revisions: Dict[str, Any] = json.loads(raw)
+    return revisions
+
+
+def iter_export(
+    path: str,
+    batch_size: int = DEFAULT_ROW_GROUP_SIZE,
+    columns: Optional[List[str]] = None,
+) -> Iterator[pa.RecordBatch]:
+    """Stream the record batches of an export from a memory-mapped file.
+
+    Args:
+        path: Parquet file written by export_parquet
+        batch_size: Maximum number of chunks per batch
+        columns: Columns to read (all by default)
+
+    Yields:
+        Arrow record batches
+    """
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+
+
+def read_chunks(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load an export into a DataFrame for analysis.
+
+    Args:
+        path: Parquet file written by export_parquet
+        columns: Columns to read (every column except the embeddings by
+            default)
+
+    Returns:
+        DataFrame with one row per chunk
+    """
+    table = pq.read_table(path, columns=columns or CHUNK_COLUMNS, memory_map=True)
+    return table.to_pandas()
+
+
+def _batch_vectors(batch: pa.RecordBatch, dimension: int) -> np.ndarray:
+    """Return the embedding column of a batch as a (rows, dimension) array."""
+    values = batch.column("embedding").flatten()
+    vectors: np.ndarray = values.to_numpy(zero_copy_only=False).reshape(-1, dimension)
+    return vectors
+
+
+def import_parquet(
+    path: str,
+    embeddings: Optional[Embeddings] = None,
+    dtype: Optional[str] = None,
+    docstore_dir: Optional[str] = None,
+    batch_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> FAISS:
+    """Rebuild a vector store from an export without re-embedding.
+
+    Args:
+        path: Parquet file written by export_parquet
+        embeddings: Embeddings model for queries (should match the model
+            recorded in the export)
+        dtype: Vector storage type of the new index (defaults to the
+            exported one)
+        docstore_dir: Directory for a compact docstore (or None to keep the
+            chunks in an in-memory docstore)
+        batch_size: Number of chunks added at a time
+
+    Returns:
+        FAISS vector store holding the exported chunks
+    """
+    info = read_export_info(path)
+    dimension = int(info["dimension"])
+    if dtype is None:
+        dtype = info["dtype"] if info["dtype"] in VECTOR_DTYPES else "float32"
+    embeddings = embeddings or _StoredVectorsOnly()
+
+    batches = iter_export(path, batch_size=batch_size)
+    first = next(batches, None)
+    # An empty int8 export gives an untrained index, trained on the first
+    # vectors added to it
+    training = None if first is None else _batch_vectors(first, dimension)
+    index = create_faiss_index(dimension, dtype, training)
+
+    if docstore_dir is not None:
+        vector_store = new_compact_store(docstore_dir, embeddings, index)
+    else:
+        vector_store = FilteredFAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+
+    count = 0
+    batch = first
+    while batch is not None:
+        vectors = _batch_vectors(batch, dimension)
+        vector_store.add_embeddings(
+            zip(batch.column("text").to_pylist(), vectors),
+            metadatas=[json.loads(m) for m in batch.column("metadata").to_pylist()],
+            ids=batch.column("id").to_pylist(),
+        )
+        count += len(vectors)
+        batch = next(batches, None)
+
+    logger.info(
+        "Vector store imported",
+        path=path,
+        chunks=count,
+        dtype=dtype,
+        embedding_model=info.get("embedding_model"),
+    )
+    return vector_store
+
+
+def export_index(
+    index_dir: str, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE
+) -> int:
+    """Export a persistent index directory to a Parquet file.
+
+    The revision records of the ingestion daemon stored next to the index
+    are exported with it.
+
+    Args:
+        index_dir: Directory written by save_vector_store
+        path: Target Parquet file
+        row_group_size: Number of chunks per row group
+
+    Returns:
+        Number of chunks written
+    """
+    if not os.path.exists(os.path.join(index_dir, INDEX_FILE)):
+        raise FileNotFoundError(f"No index found in {index_dir}")
+    revisions = None
+    revisions_path = os.path.join(index_dir, REVISIONS_FILE)
+    if os.path.exists(revisions_path):
+        with open(revisions_path, "r", encoding="utf-8") as f:
+            revisions = json.load(f)
+
+    vector_store = load_vector_store(index_dir, _StoredVectorsOnly())
+    try:
+        return export_parquet(
+            vector_store, path, row_group_size=row_group_size, revisions=revisions
+        )
+    finally:
+        _close_docstore(vector_store)
+
+
+def _close_docstore(vector_store: FAISS) -> None:
+    """Close the docstore files of a vector store, if it has any."""
+    if isinstance(vector_store.docstore, CompactDocstore):
+        vector_store.docstore.close()
+
+
+def import_index(path: str, index_dir: str, dtype: Optional[str] = None) -> int:
+    """Import a Parquet export into a new persistent index directory.
+
+    Revision records carried by the export are written next to the index,
+    so the ingestion daemon keeps versioning the imported documents (and
+    their chunk ids) instead of starting over at version 1.
+
+    Args:
+        path: Parquet file written by export_parquet
+        index_dir: Directory to save the index to (must not hold an index)
+        dtype: Vector storage type of the new index (defaults to the
+            exported one)
+
+    Returns:
+        Number of chunks imported
+    """
+    if os.path.exists(os.path.join(index_dir, INDEX_FILE)):
+        raise FileExistsError(f"{index_dir} already holds an index")
+    # Leftovers of an interrupted import would be appended to
+    docstore_dir = os.path.join(index_dir, DOCSTORE_DIR)
+    shutil.rmtree(docstore_dir, ignore_errors=True)
+    vector_store = import_parquet(path, dtype=dtype, docstore_dir=docstore_dir)
+    try:
+        save_vector_store(vector_store, index_dir)
+    finally:
+        _close_docstore(vector_store)
+
+    revisions = read_export_revisions(path)
+    if revisions is not None:
+        revisions_path = os.path.join(index_dir, REVISIONS_FILE)
+        with open(f"{revisions_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(revisions, f)
+        os.replace(f"{revisions_path}.tmp", revisions_path)
+    return int(vector_store.index.ntotal)
@@ -0,0 +1,244 @@
+"""Conversation context cache module.
+
+This module lets follow-up questions reuse the work Ollama already did for a
+conversation. RAG prompts are laid out as a stable prefix (instructions and
+retrieved context) followed by the question. Ollama returns the token context
+of every generation; it is cached per session, model and prompt prefix, and
+when a later prompt of the session has the same prefix only its question is
+sent along with the cached context, so the prefix is not evaluated again.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import ollama
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+QUESTION_MARKER = "Question:"
+
+# Contexts longer than this are dropped rather than sent again, since Ollama
+# would truncate them to the model's context window anyway
+DEFAULT_MAX_CONTEXT_TOKENS = 4096
+
+
+def split_prompt(prompt: str) -> Tuple[str, str]:
+    """Split a prompt into its stable prefix and its question.
+
+    Args:
+        prompt: Full prompt
+
+    Returns:
+        Tuple of (prefix, rest of the prompt from the last "Question:"
+        marker); the prefix is empty when there is no marker
+    """
+    position = prompt.rfind(QUESTION_MARKER)
+    if position <= 0:
+        return "", prompt
+    return prompt[:position], prompt[position:]
+
+
+@dataclass
+class _Conversation:
+    """Token context of a conversation over one prompt prefix."""
+
+    context: List[int]
+    turns: int
+    last_used: float
+
+
+class ConversationContextCache:
+    """Ollama token contexts keyed by session, model and prompt prefix."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+        idle_seconds: float = 1800.0,
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of conversations kept over all sessions
+            max_context_tokens: Longest context kept; a conversation growing
+                beyond it starts over from the full prompt
+            idle_seconds: Time after which an unused conversation is dropped
+        """
+        self.max_entries = max_entries
+        self.max_context_tokens = max_context_tokens
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str], _Conversation]" = (
+            OrderedDict()
+        )
+        self._stats = {"hits": 0, "misses": 0, "overflows": 0, "reused_tokens": 0}
+
+    @staticmethod
+    def _key(session_id: str, model: str, prefix: str) -> Tuple[str, str, str]:
+        """Return the cache key of a conversation."""
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        return (session_id, model, digest)
+
+    def _expire(self, now: float) -> None:
+        """Drop idle conversations.
+
+        Must be called with the lock held.
+        """
+        while self._entries:
+            key, conversation = next(iter(self._entries.items()))
+            if now - conversation.last_used < self.idle_seconds:
+                break
+            del self._entries[key]
+
+    def get(self, session_id: str, model: str, prefix: str) -> Optional[List[int]]:
+        """Return the context of a conversation over a prompt prefix.
+
+        Args:
+            session_id: Session asking
+            model: Model generating
+            prefix: Stable prefix of the prompt
+
+        Returns:
+            Token context of the conversation, or None if there is none
+        """
+        now = time.monotonic()
+        key = self._key(session_id, model, prefix)
+        with self._lock:
+            self._expire(now)
+            conversation = self._entries.get(key)
+            if conversation is None:
+                self._stats["misses"] += 1
+                return None
+            conversation.last_used = now
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            self._stats["reused_tokens"] += len(conversation.context)
+            return conversation.context
+
+    def put(self, session_id: str, model: str, prefix: str, context: List[int]) -> None:
+        """Store the context returned by a generation.
+
+        Args:
+            session_id: Session that asked
+            model: Model that generated
+            prefix: Stable prefix of the prompt
+            context: Token context returned by Ollama
+        """
+        key = self._key(session_id, model, prefix)
+        with self._lock:
+            if len(context) > self.max_context_tokens:
+                self._entries.pop(key, None)
+                self._stats["overflows"] += 1
+                return
+            conversation = self._entries.pop(key, None)
+            turns = conversation.turns + 1 if conversation is not None else 1
+            self._entries[key] = _Conversation(list(context), turns, time.monotonic())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def drop_session(self, session_id: str) -> int:
+        """Forget every conversation of a session.
+
+        Args:
+            session_id: Session to forget
+
+        Returns:
+            Number of conversations dropped
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == session_id]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache statistics.
+
+        Returns:
+            Counts of hits, misses, overflows, reused context tokens and
+            cached conversations
+        """
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+
+class ContextOllama(LLM):
+    """Ollama LLM continuing cached conversations over a stable prompt prefix."""
+
+    model: str
+    context_cache: ConversationContextCache
+    temperature: float = 0.1
+    base_url: Optional[str] = None
+    session_id: str = "default"
+    client: Any = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        """Return the type of this LLM."""
+        return "ollama-context"
+
+    def _client(self) -> Any:
+        """Return the Ollama client, creating it on first use."""
+        if self.client is None:
+            # Without a base URL the client follows $OLLAMA_HOST
+            self.client = ollama.Client(host=self.base_url)
+        return self.client
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Generate text, sending only the question when the prefix is cached.
+
+        Args:
+            prompt: Prompt to generate from
+            stop: Optional stop words
+            run_manager: Callback manager for the run
+            **kwargs: Extra model options
+
+        Returns:
+            Generated text
+        """
+        prefix, question = split_prompt(prompt)
+        context = None
+        if prefix:
+            context = self.context_cache.get(self.session_id, self.model, prefix)
+
+        options: Dict[str, Any] = {"temperature": self.temperature, **kwargs}
+        if stop:
+            options["stop"] = stop
+        response = self._client().generate(
+            model=self.model,
+            prompt=question if context else prompt,
+            context=context,
+            options=options,
+        )
+
+        returned = response.get("context")
+        if prefix and returned:
+            self.context_cache.put(self.session_id, self.model, prefix, returned)
+
+        logger.info(
+            "Ollama generation",
+            model=self.model,
+            session_id=self.session_id,
+            reused_context_tokens=len(context or []),
+            prompt_tokens=response.get("prompt_eval_count"),
+            prompt_eval_s=round((response.get("prompt_eval_duration") or 0) / 1e9, 3),
+        )
+        return str(response["response"])
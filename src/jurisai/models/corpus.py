@@ -0,0 +1,502 @@
+"""Document corpus module.
+
+This module answers questions across every document loaded in a session.
+Each document keeps its own index; a small index of per-document centroids
+routes a query to the documents most likely to hold the answer, so only
+about sqrt(N) of N documents are searched. The routed documents are searched
+in parallel and their results merged under a per-document diversity cap, and
+every returned chunk carries a "document p.N" citation.
+
+While a document is still being indexed its centroids are updated with the
+vectors of each new batch only; they are clustered again over the whole
+document once it is complete.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import contextlib
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, ContextManager, Dict, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain.schema import Document
+
+from src.jurisai.models.map_reduce import source_label
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def document_centroids(vectors: np.ndarray, count: int) -> np.ndarray:
+    """Summarize a document's chunk vectors with a few centroids.
+
+    Args:
+        vectors: Chunk vectors of the document
+        count: Maximum number of centroids
+
+    Returns:
+        Array of at most count centroids
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if len(vectors) <= count:
+        return vectors
+    kmeans = faiss.Kmeans(vectors.shape[1], count, niter=10, seed=1234)
+    kmeans.train(vectors)
+    return np.asarray(kmeans.centroids, dtype=np.float32)
+
+
+def fold_centroids(
+    centroids: np.ndarray, weights: np.ndarray, vectors: np.ndarray, count: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Update a document's centroids with newly indexed chunk vectors.
+
+    New vectors become centroids of their own until there are count of them;
+    after that each vector is assigned to its nearest centroid, which moves to
+    the mean of every vector assigned to it so far.
+
+    Args:
+        centroids: Current centroids of the document
+        weights: Number of vectors summarized by each centroid
+        vectors: Chunk vectors added since the centroids were computed
+        count: Maximum number of centroids
+
+    Returns:
+        Tuple of (centroids, weights)
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    free = max(count - len(centroids), 0)
+    if free:
+        centroids = np.concatenate([centroids, vectors[:free]])
+        weights = np.concatenate([weights, np.ones(len(vectors[:free]))])
+        vectors = vectors[free:]
+    if not len(vectors):
+        return centroids, weights
+
+    distances = ((vectors[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+    nearest = distances.argmin(axis=1)
+    sums = centroids * weights[:, None]
+    np.add.at(sums, nearest, vectors)
+    weights = weights + np.bincount(nearest, minlength=len(centroids))
+    return (sums / weights[:, None]).astype(np.float32), weights
+
+
+class DocumentCorpus(VectorStore):
+    """Vector store searching several per-document indexes at once."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        per_document_cap: int = 2,
+        centroids_per_document: int = 4,
+        min_probe: int = 4,
+        max_workers: int = 4,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        """Initialize an empty corpus.
+
+        Args:
+            embeddings: Embeddings model for queries
+            per_document_cap: Results taken from one document before results
+                of other documents are preferred (0 disables the cap)
+            centroids_per_document: Centroids summarizing each document
+            min_probe: Number of documents always searched; beyond that, the
+                closest ceil(sqrt(N)) documents are searched
+            max_workers: Number of documents searched concurrently
+            executor: Pool running the per-document searches, shared with
+                other corpora (or None for a pool of max_workers owned by the
+                corpus and shut down by close())
+        """
+        self._embeddings = embeddings
+        self.per_document_cap = per_document_cap
+        self.centroids_per_document = centroids_per_document
+        self.min_probe = min_probe
+        self.max_workers = max_workers
+        self._lock = threading.RLock()
+        self._sources: Dict[str, Any] = {}
+        self._document_locks: Dict[str, ContextManager] = {}
+        self._centroids: Dict[str, np.ndarray] = {}
+        self._centroid_weights: Dict[str, np.ndarray] = {}
+        self._summarized: Dict[str, int] = {}
+        self._centroid_index: Optional[faiss.Index] = None
+        self._centroid_owners: List[str] = []
+        self._field_values: Dict[str, Dict[str, List[Any]]] = {}
+        self._pool = executor
+        self._owns_pool = executor is None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Return the embeddings model."""
+        return self._embeddings
+
+    def __len__(self) -> int:
+        """Return the number of documents."""
+        return len(self._sources)
+
+    def names(self) -> List[str]:
+        """Return the names of the documents in the corpus."""
+        with self._lock:
+            return list(self._sources)
+
+    @staticmethod
+    def _resolve(source: Any) -> VectorStore:
+        """Return the vector store of a document.
+
+        Sources with a get() method (such as an IndexHandle whose index may
+        have been evicted) are resolved on every use.
+        """
+        if not isinstance(source, VectorStore) and hasattr(source, "get"):
+            source = source.get()
+        store: VectorStore = source
+        return store
+
+    def store(self, name: str) -> FAISS:
+        """Return the vector store of a document.
+
+        Args:
+            name: Document name
+
+        Returns:
+            The document's vector store
+        """
+        with self._lock:
+            source = self._sources[name]
+        store = self._resolve(source)
+        if not isinstance(store, FAISS):
+            raise TypeError(f"Document {name} is not a FAISS vector store")
+        return store
+
+    def _guard(self, name: str) -> ContextManager:
+        """Return the lock guarding a document's store (or a no-op)."""
+        with self._lock:
+            lock = self._document_locks.get(name)
+        return lock if lock is not None else contextlib.nullcontext()
+
+    def _rebuild_centroid_index(self) -> None:
+        """Rebuild the routing index from the document centroids.
+
+        Must be called with the lock held.
+        """
+        self._centroid_owners = [
+            name for name, centroids in self._centroids.items() for _ in centroids
+        ]
+        if not self._centroid_owners:
+            self._centroid_index = None
+            return
+        vectors = np.concatenate(list(self._centroids.values()))
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        self._centroid_index = index
+
+    def add_document(
+        self, name: str, source: Any, lock: Optional[ContextManager] = None
+    ) -> None:
+        """Add a document, replacing any document with the same name.
+
+        A document that is still being indexed is added again after each
+        batch, so its routing centroids follow its growing index. Only the
+        vectors added since the previous batch are read for those updates;
+        the centroids are clustered over all vectors once the complete store
+        is added.
+
+        Args:
+            name: Document name, usually its source file name
+            source: FAISS vector store of the document, or an object whose
+                get() returns it
+            lock: Lock held by the writer while the store is being extended
+                (or None for a complete store)
+        """
+        with self._lock:
+            growing = lock is not None and self._document_locks.get(name) is lock
+            start = self._summarized.get(name, 0) if growing else 0
+        guard = lock if lock is not None else contextlib.nullcontext()
+        with guard:
+            store = self._resolve(source)
+            if not isinstance(store, FAISS):
+                raise TypeError(f"Document {name} is not a FAISS vector store")
+            total = store.index.ntotal
+            vectors = store.index.reconstruct_n(start, total - start)
+
+        with self._lock:
+            self._sources[name] = source
+            if lock is None:
+                self._document_locks.pop(name, None)
+            else:
+                self._document_locks[name] = lock
+            self._field_values.pop(name, None)
+            if start:
+                centroids, weights = fold_centroids(
+                    self._centroids[name],
+                    self._centroid_weights[name],
+                    vectors,
+                    self.centroids_per_document,
+                )
+            elif lock is not None:
+                centroids, weights = fold_centroids(
+                    np.empty((0, vectors.shape[1]), dtype=np.float32),
+                    np.empty(0),
+                    vectors,
+                    self.centroids_per_document,
+                )
+            else:
+                centroids = document_centroids(vectors, self.centroids_per_document)
+                weights = np.ones(len(centroids))
+            if len(centroids):
+                self._centroids[name] = centroids
+                self._centroid_weights[name] = weights
+            else:
+                self._centroids.pop(name, None)
+                self._centroid_weights.pop(name, None)
+            self._summarized[name] = total
+            self._rebuild_centroid_index()
+
+        logger.info("Document added to corpus", name=name, documents=len(self))
+
+    def remove_document(self, name: str) -> None:
+        """Remove a document from the corpus.
+
+        Args:
+            name: Document name
+        """
+        with self._lock:
+            self._sources.pop(name, None)
+            self._document_locks.pop(name, None)
+            self._centroids.pop(name, None)
+            self._centroid_weights.pop(name, None)
+            self._summarized.pop(name, None)
+            self._field_values.pop(name, None)
+            self._rebuild_centroid_index()
+
+    def probe_count(self) -> int:
+        """Return the number of documents searched per query."""
+        documents = len(self._centroids)
+        return min(documents, max(self.min_probe, math.ceil(math.sqrt(documents))))
+
+    def route(self, embedding: List[float], filter: Optional[Any] = None) -> List[str]:
+        """Pick the documents to search for a query.
+
+        Args:
+            embedding: Query vector
+            filter: Metadata filter; a "source" condition selects documents
+                directly
+
+        Returns:
+            Names of the documents to search, closest first
+        """
+        with self._lock:
+            wanted = filter.get("source") if isinstance(filter, dict) else None
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            if wanted is not None:
+                return [name for name in self._sources if name in wanted]
+
+            probe = self.probe_count()
+            if self._centroid_index is None or probe >= len(self._centroids):
+                return [name for name in self._sources if name in self._centroids]
+
+            query = np.asarray([embedding], dtype=np.float32)
+            nearest = min(
+                probe * self.centroids_per_document, len(self._centroid_owners)
+            )
+            _, positions = self._centroid_index.search(query, nearest)
+            routed: List[str] = []
+            for position in positions[0]:
+                if position < 0:
+                    continue
+                name = self._centroid_owners[position]
+                if name not in routed:
+                    routed.append(name)
+                    if len(routed) == probe:
+                        break
+            return routed
+
+    def _executor(self) -> ThreadPoolExecutor:
+        """Return the pool running per-document searches."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="corpus-search"
+                )
+            return self._pool
+
+    def _search_document(
+        self, name: str, embedding: List[float], k: int, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Search one document and cite each result."""
+        with self._guard(name):
+            results = self.store(name).similarity_search_with_score_by_vector(
+                embedding, k, **kwargs
+            )
+        return [
+            (
+                Document(
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, "citation": source_label(doc)},
+                ),
+                score,
+            )
+            for doc, score in results
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Any] = None,
+        per_document_cap: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Search the routed documents in parallel and merge the results.
+
+        The closest results are taken at most per_document_cap per document;
+        if that leaves fewer than k, the remaining slots are filled with the
+        closest results that were held back.
+
+        Args:
+            embedding: Query vector
+            k: Number of documents to return
+            filter: Metadata filter passed to each document search
+            per_document_cap: Override of the corpus diversity cap
+            **kwargs: Extra arguments passed to each document search
+
+        Returns:
+            The k closest chunks over the routed documents with their L2
+            distances
+        """
+        cap = self.per_document_cap if per_document_cap is None else per_document_cap
+        names = self.route(embedding, filter)
+        if filter is not None:
+            kwargs["filter"] = filter
+
+        pool = self._executor()
+        futures = [
+            pool.submit(self._search_document, name, embedding, k, **kwargs)
+            for name in names
+        ]
+        candidates = sorted(
+            (pair for future in futures for pair in future.result()),
+            key=lambda pair: pair[1],
+        )
+
+        selected: List[Tuple[Document, float]] = []
+        held_back: List[Tuple[Document, float]] = []
+        taken: Dict[str, int] = {}
+        for doc, score in candidates:
+            source = str(doc.metadata.get("source"))
+            if cap and taken.get(source, 0) >= cap:
+                held_back.append((doc, score))
+                continue
+            taken[source] = taken.get(source, 0) + 1
+            selected.append((doc, score))
+        selected = selected[:k]
+        selected += held_back[: k - len(selected)]
+        selected.sort(key=lambda pair: pair[1])
+
+        logger.debug(
+            "Corpus searched",
+            documents=len(self),
+            searched=len(names),
+            results=len(selected),
+        )
+        return selected
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        """Return the chunks closest to a query vector.
+
+        Args:
+            embedding: Query vector
+            k: Number of documents to return
+            **kwargs: Extra search arguments
+
+        Returns:
+            The k closest chunks over the routed documents
+        """
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score_by_vector(
+                embedding, k, **kwargs
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        """Return the chunks closest to a query.
+
+        Args:
+            query: Query text
+            k: Number of documents to return
+            **kwargs: Extra search arguments
+
+        Returns:
+            The k closest chunks over the routed documents
+        """
+        return self.similarity_search_by_vector(
+            self._embeddings.embed_query(query), k, **kwargs
+        )
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the chunks closest to a query with their distances."""
+        return self.similarity_search_with_score_by_vector(
+            self._embeddings.embed_query(query), k, **kwargs
+        )
+
+    def metadata_values(self, field: str) -> List[Any]:
+        """Return the distinct values of a metadata field over all documents.
+
+        Values are cached per document, so evicted indexes are not reloaded
+        to list them again.
+
+        Args:
+            field: Metadata field indexed by the documents' metadata indexes
+
+        Returns:
+            Sorted distinct values
+        """
+        values: Set[Any] = set()
+        for name in self.names():
+            with self._lock:
+                cached = self._field_values.setdefault(name, {}).get(field)
+            if cached is None:
+                with self._guard(name):
+                    metadata_index = getattr(self.store(name), "metadata_index", None)
+                    cached = (
+                        [] if metadata_index is None else metadata_index.values(field)
+                    )
+                with self._lock:
+                    self._field_values.setdefault(name, {})[field] = cached
+            values.update(cached)
+        return sorted(values, key=str)
+
+    def add_texts(self, texts: Any, metadatas: Any = None, **kwargs: Any) -> List[str]:
+        """Not supported: documents are added whole with add_document."""
+        raise NotImplementedError("Add documents to a corpus with add_document")
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any,
+    ) -> "DocumentCorpus":
+        """Not supported: documents are added whole with add_document."""
+        raise NotImplementedError("Build a corpus with add_document")
+
+    def close(self) -> None:
+        """Shut down the search workers, unless the pool is shared."""
+        if not self._owns_pool:
+            return
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
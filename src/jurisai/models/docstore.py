@@ -0,0 +1,537 @@
+"""Compact docstore module.
+
+This module provides a docstore that keeps chunk texts off the Python heap.
+Texts live in one memory-mapped, length-prefixed blob, byte offsets in NumPy
+arrays and ids plus metadata in SQLite, so large corpora load nearly instantly
+and lookups slice the mapped file without copying.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, MutableMapping, Optional, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain.schema import Document
+
+from src.jurisai.models.metadata_index import FilteredFAISS, MetadataIndex
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+_LENGTH_PREFIX = struct.Struct("<I")
+
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+LENGTHS_FILE = "lengths.npy"
+METADATA_FILE = "metadata.db"
+INDEX_FILE = "index.faiss"
+ROWS_FILE = "rows.npy"
+DOCSTORE_DIR = "docstore"
+
+# Share of the text blob taken by deleted texts that triggers a compaction
+COMPACT_DEAD_FRACTION = 0.5
+
+
+class CompactDocstore(Docstore, AddableMixin):
+    """Docstore holding chunk texts in a memory-mapped blob."""
+
+    def __init__(self, path: str):
+        """Open or create a compact docstore.
+
+        Args:
+            path: Directory holding the docstore files
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+
+        self._blob_path = os.path.join(path, TEXTS_FILE)
+        self._blob = open(self._blob_path, "ab")
+        self._map: Optional[mmap.mmap] = None
+
+        offsets_path = os.path.join(path, OFFSETS_FILE)
+        if os.path.exists(offsets_path):
+            self._offsets = np.load(offsets_path, mmap_mode="r")
+            self._lengths = np.load(os.path.join(path, LENGTHS_FILE), mmap_mode="r")
+        else:
+            self._offsets = np.zeros(0, dtype=np.int64)
+            self._lengths = np.zeros(0, dtype=np.uint32)
+        self._size = len(self._offsets)
+
+        self._db = sqlite3.connect(
+            os.path.join(path, METADATA_FILE), check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL, "
+            "metadata TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        live = [
+            row
+            for (row,) in self._db.execute("SELECT row FROM chunks WHERE deleted = 0")
+        ]
+        live_bytes = int(self._lengths[live].sum()) + _LENGTH_PREFIX.size * len(live)
+        self._dead_bytes = self._blob.tell() - live_bytes
+
+    def __len__(self) -> int:
+        """Return the number of live documents."""
+        with self._lock:
+            count: int = self._db.execute(
+                "SELECT COUNT(*) FROM chunks WHERE deleted = 0"
+            ).fetchone()[0]
+        return count
+
+    def _grow(self, extra: int) -> None:
+        """Make room for more rows in the offset arrays.
+
+        Args:
+            extra: Number of rows about to be appended
+        """
+        needed = self._size + extra
+        if needed <= len(self._offsets) and self._offsets.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self._offsets), 1024)
+        offsets = np.zeros(capacity, dtype=np.int64)
+        lengths = np.zeros(capacity, dtype=np.uint32)
+        offsets[: self._size] = self._offsets[: self._size]
+        lengths[: self._size] = self._lengths[: self._size]
+        self._offsets, self._lengths = offsets, lengths
+
+    def _mapped(self) -> mmap.mmap:
+        """Return a memory map covering every stored text."""
+        self._blob.flush()
+        blob_size = os.path.getsize(self._blob_path)
+        if self._map is None or len(self._map) < blob_size:
+            # The old map is left to the garbage collector because text views
+            # handed out earlier may still reference it
+            with open(self._blob_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add documents to the docstore.
+
+        Args:
+            texts: Mapping of document id to document
+        """
+        with self._lock:
+            overlapping = [doc_id for doc_id in texts if self.row_of(doc_id) is not None]
+            if overlapping:
+                raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+
+            # Ids of deleted documents may be reused
+            self._db.executemany(
+                "DELETE FROM chunks WHERE doc_id = ? AND deleted = 1",
+                [(doc_id,) for doc_id in texts],
+            )
+
+            self._grow(len(texts))
+            offset = self._blob.tell()
+            records = []
+            for doc_id, doc in texts.items():
+                data = doc.page_content.encode("utf-8")
+                self._blob.write(_LENGTH_PREFIX.pack(len(data)))
+                self._blob.write(data)
+
+                row = self._size
+                self._offsets[row] = offset + _LENGTH_PREFIX.size
+                self._lengths[row] = len(data)
+                offset += _LENGTH_PREFIX.size + len(data)
+                self._size += 1
+                records.append((row, doc_id, json.dumps(doc.metadata, default=str)))
+
+            self._db.executemany(
+                "INSERT INTO chunks (row, doc_id, metadata) VALUES (?, ?, ?)", records
+            )
+
+    def delete(self, ids: List) -> None:
+        """Delete documents from the docstore.
+
+        Documents are only marked as deleted: their row keeps its id until the
+        id is reused, and their text bytes stay in the blob until more than
+        COMPACT_DEAD_FRACTION of it is dead and it is compacted.
+
+        Args:
+            ids: Ids of the documents to delete
+        """
+        with self._lock:
+            rows = [row for row in map(self.row_of, ids) if row is not None]
+            self._db.executemany(
+                "UPDATE chunks SET deleted = 1 WHERE row = ?",
+                [(row,) for row in rows],
+            )
+            self._dead_bytes += int(self._lengths[rows].sum())
+            self._dead_bytes += _LENGTH_PREFIX.size * len(rows)
+            if self._dead_bytes > COMPACT_DEAD_FRACTION * self._blob.tell():
+                self.compact()
+
+    def compact(self) -> int:
+        """Rewrite the text blob without the texts of deleted documents.
+
+        Rows keep their numbers, so FAISS rows mapped to them stay valid; the
+        rows of deleted documents are left pointing at no text. Text views
+        handed out earlier keep reading the old blob.
+
+        Returns:
+            Number of bytes reclaimed
+        """
+        with self._lock:
+            live = [
+                row
+                for (row,) in self._db.execute(
+                    "SELECT row FROM chunks WHERE deleted = 0 ORDER BY row"
+                )
+            ]
+            source = self._mapped()
+            offsets = np.zeros(len(self._offsets), dtype=np.int64)
+            lengths = np.zeros(len(self._lengths), dtype=np.uint32)
+
+            compacted_path = self._blob_path + ".compact"
+            offset = 0
+            with open(compacted_path, "wb") as f:
+                for row in live:
+                    start = int(self._offsets[row])
+                    length = int(self._lengths[row])
+                    f.write(_LENGTH_PREFIX.pack(length))
+                    f.write(source[start : start + length])
+                    offsets[row] = offset + _LENGTH_PREFIX.size
+                    lengths[row] = length
+                    offset += _LENGTH_PREFIX.size + length
+
+            reclaimed = self._blob.tell() - offset
+            self._blob.close()
+            os.replace(compacted_path, self._blob_path)
+            self._blob = open(self._blob_path, "ab")
+            # As in _mapped, the old map is left to the garbage collector
+            self._map = None
+            self._offsets, self._lengths = offsets, lengths
+            self._dead_bytes = 0
+            self._db.execute("UPDATE chunks SET metadata = '{}' WHERE deleted = 1")
+            self.flush()
+
+        logger.info(
+            "Docstore compacted",
+            path=self.path,
+            documents=len(live),
+            reclaimed_bytes=reclaimed,
+        )
+        return reclaimed
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Look up a document by id.
+
+        Args:
+            search: Document id
+
+        Returns:
+            The document, or a message string if the id is unknown
+        """
+        row = self.row_of(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self.document_at(row)
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        """Return the storage row of a document id.
+
+        Args:
+            doc_id: Document id
+
+        Returns:
+            Row number, or None if the id is unknown
+        """
+        with self._lock:
+            found = self._db.execute(
+                "SELECT row FROM chunks WHERE doc_id = ? AND deleted = 0", (doc_id,)
+            ).fetchone()
+        return None if found is None else found[0]
+
+    def id_at(self, row: int) -> str:
+        """Return the document id stored at a row.
+
+        Args:
+            row: Storage row
+
+        Returns:
+            Document id
+        """
+        with self._lock:
+            found = self._db.execute(
+                "SELECT doc_id FROM chunks WHERE row = ?", (int(row),)
+            ).fetchone()
+        if found is None:
+            raise KeyError(row)
+        doc_id: str = found[0]
+        return doc_id
+
+    def text_view(self, row: int) -> memoryview:
+        """Return the UTF-8 bytes of a stored text without copying.
+
+        Args:
+            row: Storage row
+
+        Returns:
+            Memory view into the mapped blob
+        """
+        with self._lock:
+            if not 0 <= row < self._size:
+                raise IndexError(row)
+            start = int(self._offsets[row])
+            return memoryview(self._mapped())[start : start + int(self._lengths[row])]
+
+    def document_at(self, row: int) -> Document:
+        """Return the document stored at a row.
+
+        Args:
+            row: Storage row
+
+        Returns:
+            Document with its text and metadata
+        """
+        with self._lock:
+            found = self._db.execute(
+                "SELECT metadata FROM chunks WHERE row = ? AND deleted = 0", (int(row),)
+            ).fetchone()
+        if found is None:
+            raise KeyError(row)
+        return Document(
+            page_content=str(self.text_view(row), "utf-8"),
+            metadata=json.loads(found[0]),
+        )
+
+    def metadatas(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """Return the metadata of many rows with a single query.
+
+        Args:
+            rows: Storage rows
+
+        Returns:
+            Metadata of each row, in order (empty for deleted rows)
+        """
+        with self._lock:
+            found = dict(
+                self._db.execute("SELECT row, metadata FROM chunks WHERE deleted = 0")
+            )
+        return [
+            json.loads(found[row]) if row in found else {}
+            for row in rows.tolist()
+        ]
+
+    def ids(self, include_deleted: bool = False) -> Dict[int, str]:
+        """Return document ids keyed by storage row.
+
+        Args:
+            include_deleted: Whether to include documents marked as deleted
+
+        Returns:
+            Mapping of storage row to document id
+        """
+        query = "SELECT row, doc_id FROM chunks"
+        if not include_deleted:
+            query += " WHERE deleted = 0"
+        with self._lock:
+            return dict(self._db.execute(query))
+
+    def memory_bytes(self) -> int:
+        """Return the heap memory used by the offset arrays.
+
+        The text blob is memory-mapped and paged in by the OS on demand, and
+        metadata stays in SQLite, so neither is counted.
+
+        Returns:
+            Size of the in-memory arrays in bytes
+        """
+        return int(self._offsets[: self._size].nbytes + self._lengths[: self._size].nbytes)
+
+    def flush(self) -> None:
+        """Write pending texts, offsets and metadata to disk."""
+        with self._lock:
+            self._blob.flush()
+            # Read-only arrays are still the memory-mapped files: nothing was
+            # added since they were loaded, and saving over them would
+            # truncate the files they are read from
+            if self._offsets.flags.writeable:
+                size = self._size
+                np.save(os.path.join(self.path, OFFSETS_FILE), self._offsets[:size])
+                np.save(os.path.join(self.path, LENGTHS_FILE), self._lengths[:size])
+            self._db.commit()
+
+    def close(self) -> None:
+        """Flush and close the docstore files."""
+        with self._lock:
+            self.flush()
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    pass  # Still referenced by a text view
+                self._map = None
+            self._blob.close()
+            self._db.close()
+
+
+class RowIdMap(MutableMapping):
+    """Mapping of FAISS row to docstore id backed by a NumPy array.
+
+    Used as ``FAISS.index_to_docstore_id`` so the second per-chunk dict of
+    Python strings is replaced by one int64 array of docstore rows.
+    """
+
+    def __init__(self, docstore: CompactDocstore, rows: Optional[np.ndarray] = None):
+        """Initialize the mapping.
+
+        Args:
+            docstore: Docstore the ids belong to
+            rows: Docstore row of each FAISS row
+        """
+        self.docstore = docstore
+        self.rows = np.array(rows if rows is not None else [], dtype=np.int64)
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < len(self.rows):
+            raise KeyError(index)
+        return self.docstore.id_at(int(self.rows[index]))
+
+    def __setitem__(self, index: int, doc_id: str) -> None:
+        row = self.docstore.row_of(doc_id)
+        if row is None:
+            raise KeyError(doc_id)
+        if index == len(self.rows):
+            self.rows = np.append(self.rows, row)
+        elif 0 <= index < len(self.rows):
+            self.rows[index] = row
+        else:
+            raise KeyError(index)
+
+    def __delitem__(self, index: int) -> None:
+        if index != len(self.rows) - 1:
+            raise KeyError("Only the last FAISS row can be removed")
+        self.rows = self.rows[:-1]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.rows)))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def update(self, other: Any = (), **kwargs: Any) -> None:
+        """Add several FAISS rows at once."""
+        items = sorted(dict(other, **kwargs).items())
+        for index, doc_id in items:
+            self[index] = doc_id
+
+    def values(self) -> List[str]:  # type: ignore[override]
+        """Return the docstore ids of every FAISS row in one query."""
+        ids = self.docstore.ids(include_deleted=True)
+        return [ids[int(row)] for row in self.rows]
+
+    def items(self) -> List[tuple]:  # type: ignore[override]
+        """Return (FAISS row, docstore id) pairs in one query."""
+        return list(enumerate(self.values()))
+
+
+def new_compact_store(
+    path: str, embeddings: Embeddings, index: faiss.Index
+) -> FAISS:
+    """Create an empty FAISS vector store backed by a compact docstore.
+
+    Args:
+        path: Directory for the docstore files
+        embeddings: Embeddings model for queries
+        index: Empty FAISS index
+
+    Returns:
+        FAISS vector store using CompactDocstore and RowIdMap
+    """
+    docstore = CompactDocstore(path)
+    return FilteredFAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=RowIdMap(docstore),
+    )
+
+
+def save_vector_store(vector_store: FAISS, path: str) -> None:
+    """Save a vector store in the compact on-disk format.
+
+    Stores whose docstore is not already a CompactDocstore in this directory
+    are converted.
+
+    Args:
+        vector_store: FAISS vector store to save
+        path: Target directory
+    """
+    os.makedirs(path, exist_ok=True)
+    docstore_path = os.path.join(path, DOCSTORE_DIR)
+    source = vector_store.docstore
+
+    if isinstance(source, CompactDocstore) and os.path.abspath(
+        source.path
+    ) == os.path.abspath(docstore_path):
+        docstore = source
+        rows = _rows_for(vector_store, docstore)
+    else:
+        # Replace any previous save instead of appending to it
+        shutil.rmtree(docstore_path, ignore_errors=True)
+        docstore = CompactDocstore(docstore_path)
+        ids = list(vector_store.index_to_docstore_id.values())
+        docs = {doc_id: source.search(doc_id) for doc_id in ids}
+        docstore.add({k: v for k, v in docs.items() if isinstance(v, Document)})
+        rows = np.array([docstore.row_of(doc_id) for doc_id in ids], dtype=np.int64)
+
+    docstore.flush()
+    np.save(os.path.join(path, ROWS_FILE), rows)
+    faiss.write_index(vector_store.index, os.path.join(path, INDEX_FILE))
+
+    logger.info("Vector store saved", path=path, vectors=int(vector_store.index.ntotal))
+
+
+def _rows_for(vector_store: FAISS, docstore: CompactDocstore) -> np.ndarray:
+    """Return the docstore row of every FAISS row of a vector store."""
+    mapping = vector_store.index_to_docstore_id
+    if isinstance(mapping, RowIdMap):
+        return mapping.rows
+    rows = {doc_id: row for row, doc_id in docstore.ids().items()}
+    return np.array([rows[mapping[i]] for i in range(len(mapping))], dtype=np.int64)
+
+
+def load_vector_store(path: str, embeddings: Embeddings) -> FAISS:
+    """Load a vector store saved with save_vector_store.
+
+    The metadata index is built from the docstore in one pass, so the first
+    filtered search does not look chunks up one by one.
+
+    Args:
+        path: Directory the store was saved to
+        embeddings: Embeddings model for queries
+
+    Returns:
+        FAISS vector store backed by the memory-mapped docstore
+    """
+    docstore = CompactDocstore(os.path.join(path, DOCSTORE_DIR))
+    rows = np.load(os.path.join(path, ROWS_FILE))
+    index = faiss.read_index(os.path.join(path, INDEX_FILE))
+    metadata_index = MetadataIndex()
+    metadata_index.add(docstore.metadatas(rows))
+
+    logger.info("Vector store loaded", path=path, vectors=int(index.ntotal))
+
+    return FilteredFAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=RowIdMap(docstore, rows),
+        metadata_index=metadata_index,
+    )
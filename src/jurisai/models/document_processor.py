@@ -5,35 +5,100 @@ This module handles loading and processing PDF documents.
 Author: a13xh (a13x.h.cc@gmail.com)
 """
 
+import contextlib
 import os
+import shutil
 import tempfile
-from typing import Any, Dict, List, Optional
+import uuid
+from dataclasses import dataclass, replace
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
+import pdfplumber
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.document_loaders import PDFPlumberLoader
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
 
+from src.jurisai.models.docstore import new_compact_store
+from src.jurisai.models.metadata_index import FilteredFAISS, annotate_documents
+from src.jurisai.models.ocr import DEFAULT_OCR_CACHE_DIR, OCRFallback, page_fingerprint
+from src.jurisai.models.revisions import (
+    ChunkRecord,
+    DocumentRevision,
+    RevisionDiff,
+    RevisionTracker,
+    chunk_hash,
+    plan_revision,
+)
+from src.jurisai.models.sharding import ShardedVectorStore, build_shards
+from src.jurisai.models.vector_index import (
+    create_faiss_index,
+    dtype_needs_training,
+    index_footprint,
+)
 from src.jurisai.utils.log_config import get_logger
 
 logger = get_logger(__name__)
 
 
+@dataclass
+class IngestProgress:
+    """Progress of an incremental ingest after one of its stages."""
+
+    stage: str
+    pages_done: int
+    pages_total: int
+    chunks_split: int = 0
+    chunks_indexed: int = 0
+    vector_store: Optional[FAISS] = None
+
+
 class DocumentProcessor:
     """Process and split documents for analysis."""
 
-    def __init__(self, embeddings_model: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        embeddings_model: str = "all-MiniLM-L6-v2",
+        vector_dtype: str = "float32",
+        docstore_dir: Optional[str] = None,
+        ocr: bool = True,
+        ocr_cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+        revisions_path: Optional[str] = None,
+        embeddings: Optional[Embeddings] = None,
+    ):
         """Initialize the document processor.
 
         Args:
             embeddings_model: Name of the Hugging Face embeddings model to use
+            vector_dtype: Storage type for index vectors ("float32", "float16"
+                or scalar-quantized "int8")
+            docstore_dir: Directory for compact, memory-mapped docstores (or
+                None to keep chunks in an in-memory docstore)
+            ocr: Whether to recognize text on scanned pages with Tesseract
+            ocr_cache_dir: Directory where recognized page texts are cached
+            revisions_path: JSON file where indexed document revisions are
+                tracked (or None to track them in memory)
+            embeddings: Already loaded embeddings model to share between
+                processors (or None to load embeddings_model)
         """
-        self.embeddings = HuggingFaceEmbeddings(model_name=embeddings_model)
+        if embeddings is None:
+            embeddings = HuggingFaceEmbeddings(model_name=embeddings_model)
+        self.embeddings = embeddings
+        self.vector_dtype = vector_dtype
+        self.docstore_dir = docstore_dir
+        self.ocr = OCRFallback(cache_dir=ocr_cache_dir) if ocr else None
+        self.revisions = RevisionTracker(revisions_path)
         self.temp_dir = tempfile.mkdtemp()
         logger.info(
             "Document processor initialized",
             embeddings_model=embeddings_model,
+            vector_dtype=vector_dtype,
+            docstore_dir=docstore_dir,
+            ocr=ocr,
             temp_dir=self.temp_dir,
         )
 
@@ -47,17 +112,20 @@ class DocumentProcessor:
         Returns:
             List of document objects with text content
         """
-        # Create a temporary file to save the PDF
-        temp_path = os.path.join(self.temp_dir, filename)
-        
-        with open(temp_path, "wb") as f:
-            f.write(pdf_content)
-        
-        logger.info("PDF saved to temporary file", file_path=temp_path)
-        
-        # Load PDF using PDFPlumberLoader
-        loader = PDFPlumberLoader(temp_path)
-        documents = loader.load()
+        temp_path = self._save_temp_pdf(pdf_content, filename)
+        try:
+            # Load PDF using PDFPlumberLoader
+            loader = PDFPlumberLoader(temp_path)
+            documents = loader.load()
+
+            # Recognize text on scanned pages that have no text layer
+            if self.ocr is not None:
+                documents = self.ocr.apply(temp_path, documents)
+        finally:
+            self._remove_temp_pdf(temp_path)
+
+        # Capture structured metadata used for filtered search
+        documents = annotate_documents(documents, filename)
         
         logger.info(
             "PDF loaded successfully", 
@@ -67,6 +135,90 @@ class DocumentProcessor:
         
         return documents
 
+    def _save_temp_pdf(self, pdf_content: bytes, filename: str) -> str:
+        """Write PDF content to a temporary file.
+
+        Every call gets its own directory, so documents with the same file
+        name (or the same document processed concurrently) never share a file.
+
+        Args:
+            pdf_content: Binary content of the PDF file
+            filename: Name (or path) of the document; its base name is used
+                for the temp file
+
+        Returns:
+            Path of the temporary file
+        """
+        temp_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        temp_path = os.path.join(temp_dir, os.path.basename(filename))
+
+        with open(temp_path, "wb") as f:
+            f.write(pdf_content)
+        
+        logger.info("PDF saved to temporary file", file_path=temp_path)
+
+        return temp_path
+
+    def _remove_temp_pdf(self, temp_path: str) -> None:
+        """Remove a temporary file written by _save_temp_pdf.
+
+        Args:
+            temp_path: Path returned by _save_temp_pdf
+        """
+        shutil.rmtree(os.path.dirname(temp_path), ignore_errors=True)
+
+    def load_pages(
+        self, pdf_path: str, page_numbers: List[int], filename: Optional[str] = None
+    ) -> List[Document]:
+        """Extract the text of selected pages of a PDF.
+
+        Produces the same page documents as load_pdf, but only for the
+        requested pages.
+
+        Args:
+            pdf_path: Path of the PDF file
+            page_numbers: Zero-based indexes of the pages to extract
+            filename: Original file name (defaults to the name of pdf_path)
+
+        Returns:
+            List of page documents
+        """
+        documents = self._extract_pages(pdf_path, page_numbers)
+        return annotate_documents(documents, filename or os.path.basename(pdf_path))
+
+    def _extract_pages(self, pdf_path: str, page_numbers: List[int]) -> List[Document]:
+        """Extract the text of selected pages without annotating them.
+
+        Args:
+            pdf_path: Path of the PDF file
+            page_numbers: Zero-based indexes of the pages to extract
+
+        Returns:
+            List of page documents
+        """
+        with pdfplumber.open(pdf_path) as pdf:
+            pdf_metadata = {
+                k: v for k, v in pdf.metadata.items() if type(v) in [str, int]
+            }
+            documents = [
+                Document(
+                    page_content=(pdf.pages[n].extract_text() or "") + "\n",
+                    metadata={
+                        "source": pdf_path,
+                        "file_path": pdf_path,
+                        "page": n,
+                        "total_pages": len(pdf.pages),
+                        **pdf_metadata,
+                    },
+                )
+                for n in page_numbers
+            ]
+
+        if self.ocr is not None:
+            documents = self.ocr.apply(pdf_path, documents)
+
+        return documents
+
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into semantic chunks.
 
@@ -88,26 +240,104 @@ class DocumentProcessor:
         
         return chunks
 
-    def create_vector_store(self, documents: List[Document]) -> FAISS:
+    def create_vector_store(
+        self, documents: List[Document], ids: Optional[List[str]] = None
+    ) -> FAISS:
         """Create a vector store from document chunks.
 
         Args:
             documents: List of document chunks
+            ids: Ids to store the chunks under (or None for random ids)
 
         Returns:
             FAISS vector store containing document embeddings
         """
-        # Generate embeddings and store in FAISS
-        vector_store = FAISS.from_documents(documents, self.embeddings)
+        if not documents:
+            raise ValueError("No document chunks to index")
+
+        # Generate embeddings
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+        # Store them in a FAISS index with the configured vector type
+        vector_store = self._empty_vector_store(vectors)
+        vector_store.add_embeddings(zip(texts, vectors.tolist()), metadatas, ids=ids)
         
         logger.info(
             "Vector store created",
             documents=len(documents),
-            store_type="FAISS"
+            store_type="FAISS",
+            **index_footprint(vector_store),
         )
         
         return vector_store
         
+    def _empty_vector_store(
+        self, training_vectors: np.ndarray, vector_dtype: Optional[str] = None
+    ) -> FAISS:
+        """Create an empty vector store with the configured vector type.
+
+        Args:
+            training_vectors: Vectors the FAISS index is trained on, if its
+                vector type needs training
+            vector_dtype: Vector storage type (or None for the processor's)
+
+        Returns:
+            Empty FAISS vector store
+        """
+        index = create_faiss_index(
+            training_vectors.shape[1],
+            vector_dtype or self.vector_dtype,
+            training_vectors,
+        )
+        if self.docstore_dir is not None:
+            store_dir = os.path.join(self.docstore_dir, uuid.uuid4().hex)
+            return new_compact_store(store_dir, self.embeddings, index)
+        return FilteredFAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+
+    def create_sharded_vector_store(
+        self,
+        documents: List[Document],
+        num_shards: int,
+        partition: str = "document",
+        executor: str = "thread",
+        shard_dir: Optional[str] = None,
+    ) -> ShardedVectorStore:
+        """Create a vector store partitioned into several FAISS shards.
+
+        Args:
+            documents: List of document chunks
+            num_shards: Number of shards
+            partition: Assign chunks to shards by "document" (source) or "hash"
+            executor: Search shards on "thread"s or worker "process"es
+            shard_dir: Directory shard indexes are saved to for worker processes
+
+        Returns:
+            Sharded vector store searching all shards in parallel
+        """
+        if not documents:
+            raise ValueError("No document chunks to index")
+
+        texts = [doc.page_content for doc in documents]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        shards = build_shards(
+            self.embeddings, documents, vectors, num_shards, partition, self.vector_dtype
+        )
+
+        return ShardedVectorStore(
+            self.embeddings,
+            shards,
+            partition=partition,
+            executor=executor,
+            shard_dir=shard_dir,
+        )
+        
     def process_pdf(self, pdf_content: bytes, filename: str = "document.pdf") -> FAISS:
         """Process a PDF document and create a vector store.
 
@@ -126,10 +356,346 @@ class DocumentProcessor:
         
         return vector_store
 
+    def iter_process_pdf(
+        self,
+        pdf_content: bytes,
+        filename: str = "document.pdf",
+        pages_per_batch: int = 8,
+        lock: Optional[ContextManager] = None,
+        vector_dtype: Optional[str] = None,
+    ) -> Iterator[IngestProgress]:
+        """Process a PDF incrementally, reporting progress after every stage.
+
+        The text of all pages is extracted first ("load"), so sections and
+        document metadata are annotated as in process_pdf. Pages are then
+        split ("split") and embedded ("embed") a batch at a time, and every
+        embedded batch is added to the vector store right away, so the store
+        can be searched before the whole document is indexed. Stopping the
+        iteration cancels the remaining work.
+
+        Args:
+            pdf_content: Binary content of the PDF file
+            filename: Name to use for the temp file
+            pages_per_batch: Number of pages extracted, split or embedded at
+                a time
+            lock: Lock held while chunks are added to the vector store, so it
+                can be searched from other threads during the ingest
+            vector_dtype: Vector storage type of this document (or None for
+                the processor's), so concurrent ingests sharing the processor
+                can use different types
+
+        Yields:
+            Progress after each stage of each batch; "embed" progress carries
+            the vector store once it holds chunks
+        """
+        guard = lock if lock is not None else contextlib.nullcontext()
+        vector_dtype = vector_dtype or self.vector_dtype
+        temp_path = self._save_temp_pdf(pdf_content, filename)
+        try:
+            with pdfplumber.open(temp_path) as pdf:
+                pages_total = len(pdf.pages)
+
+            pages: List[Document] = []
+            for start in range(0, pages_total, pages_per_batch):
+                batch = list(range(start, min(start + pages_per_batch, pages_total)))
+                pages += self._extract_pages(temp_path, batch)
+                yield IngestProgress("load", len(pages), pages_total)
+        finally:
+            self._remove_temp_pdf(temp_path)
+        pages = annotate_documents(pages, filename)
+
+        # Quantized indexes are trained on pages spread over the whole
+        # document; their vectors are reused when their batch is embedded
+        sampled: Dict[str, List[float]] = {}
+        training_vectors: Optional[np.ndarray] = None
+        if dtype_needs_training(vector_dtype) and len(pages) > pages_per_batch:
+            step = len(pages) / pages_per_batch
+            sample_pages = [pages[int(i * step)] for i in range(pages_per_batch)]
+            sample_texts = [
+                doc.page_content for doc in self.split_documents(sample_pages)
+            ]
+            if sample_texts:
+                training_vectors = np.asarray(
+                    self.embeddings.embed_documents(sample_texts), dtype=np.float32
+                )
+                sampled = dict(zip(sample_texts, training_vectors.tolist()))
+
+        vector_store: Optional[FAISS] = None
+        progress = IngestProgress("split", 0, pages_total)
+        for start in range(0, len(pages), pages_per_batch):
+            chunks = self.split_documents(pages[start : start + pages_per_batch])
+            progress.stage = "split"
+            progress.pages_done = min(start + pages_per_batch, len(pages))
+            progress.chunks_split += len(chunks)
+            yield replace(progress)
+
+            if chunks:
+                texts = [doc.page_content for doc in chunks]
+                missing = [text for text in texts if text not in sampled]
+                embedded: Dict[str, List[float]] = {}
+                if missing:
+                    embedded = dict(
+                        zip(missing, self.embeddings.embed_documents(missing))
+                    )
+                vectors = np.asarray(
+                    [sampled.get(text) or embedded[text] for text in texts],
+                    dtype=np.float32,
+                )
+                if vector_store is None:
+                    vector_store = self._empty_vector_store(
+                        vectors if training_vectors is None else training_vectors,
+                        vector_dtype,
+                    )
+                with guard:
+                    vector_store.add_embeddings(
+                        zip(texts, vectors.tolist()), [doc.metadata for doc in chunks]
+                    )
+                progress.chunks_indexed += len(chunks)
+            progress.stage = "embed"
+            progress.vector_store = vector_store
+            yield replace(progress)
+
+        if vector_store is None:
+            raise ValueError("No document chunks to index")
+
+        logger.info(
+            "Vector store created incrementally",
+            documents=progress.chunks_indexed,
+            pages=pages_total,
+            **index_footprint(vector_store),
+        )
+
+    def process_revision(
+        self,
+        pdf_content: bytes,
+        document_id: str,
+        vector_store: Optional[FAISS] = None,
+        filename: str = "document.pdf",
+        lock: Optional[ContextManager] = None,
+    ) -> Tuple[FAISS, RevisionDiff]:
+        """Index a new version of a document, reusing unchanged pages.
+
+        Pages are fingerprinted without extracting text. Only pages whose
+        fingerprint was not indexed for this document id are extracted, chunked
+        and embedded. Chunks of pages that moved are re-added with their new
+        page number using their stored vectors, chunks of removed or changed
+        pages are deleted, and new chunks identical to a deleted one reuse its
+        vector instead of being embedded again.
+
+        Args:
+            pdf_content: Binary content of the new PDF version
+            document_id: Stable identifier of the document across versions
+            vector_store: Vector store holding the previous version (or None to
+                create a new vector store)
+            filename: Name to use for the temp file
+            lock: Lock held while the vector store is read or patched, so
+                several documents can be extracted and embedded concurrently
+                against the same store
+
+        Returns:
+            Tuple of the (patched or new) vector store and a report of changes
+        """
+        guard = lock if lock is not None else contextlib.nullcontext()
+        temp_path = self._save_temp_pdf(pdf_content, filename)
+        try:
+            with pdfplumber.open(temp_path) as pdf:
+                page_hashes = [page_fingerprint(page) for page in pdf.pages]
+
+            previous = None
+            if vector_store is not None:
+                with guard:
+                    previous = self.revisions.get(
+                        document_id
+                    ) or self._seed_revision(vector_store, document_id, filename)
+            unchanged = previous is not None and previous.page_hashes == page_hashes
+
+            # Changed pages are extracted, chunked and embedded again
+            plan = plan_revision(previous, page_hashes)
+            pages: List[Document] = []
+            if not unchanged and plan.changed_pages:
+                pages = self.load_pages(temp_path, plan.changed_pages, filename)
+        finally:
+            self._remove_temp_pdf(temp_path)
+
+        if vector_store is not None and previous is not None and unchanged:
+            logger.info(
+                "Document revision unchanged",
+                document_id=document_id,
+                version=previous.version,
+            )
+            return vector_store, RevisionDiff(
+                document_id=document_id,
+                version=previous.version,
+                unchanged_pages=list(range(len(page_hashes))),
+            )
+
+        version = previous.version + 1 if previous is not None else 1
+
+        diff = RevisionDiff(
+            document_id=document_id,
+            version=version,
+            unchanged_pages=plan.unchanged_pages,
+            moved_pages=sorted(plan.moved_pages),
+            changed_pages=plan.changed_pages,
+            removed_pages=plan.removed_pages,
+        )
+
+        # Unchanged pages keep their chunks as they are; chunks of moved,
+        # changed and removed pages leave the vector store
+        page_chunks: Dict[int, List[ChunkRecord]] = {}
+        stale: List[ChunkRecord] = []
+        if previous is not None:
+            page_chunks = {
+                page: previous.page_chunks.get(page, [])
+                for page in plan.unchanged_pages
+            }
+            stale = [
+                chunk
+                for page, chunks in previous.page_chunks.items()
+                if page not in page_chunks
+                for chunk in chunks
+            ]
+
+        # Moved pages are re-added with their new page number
+        new_chunks: List[Tuple[int, Document]] = []
+        reusable: Dict[str, List[float]] = {}
+        if vector_store is not None and previous is not None:
+            with guard:
+                if stale:
+                    reusable = self._stored_vectors(vector_store, stale)
+                for page, old_page in sorted(plan.moved_pages.items()):
+                    for chunk in previous.page_chunks.get(old_page, []):
+                        stored = vector_store.docstore.search(chunk.id)
+                        if not isinstance(stored, Document):
+                            continue
+                        # Copy instead of patching the docstore's document,
+                        # which still belongs to the chunk being deleted
+                        doc = Document(
+                            page_content=stored.page_content,
+                            metadata={**stored.metadata, "page": page},
+                        )
+                        new_chunks.append((page, doc))
+
+        if pages:
+            for doc in self.split_documents(pages):
+                new_chunks.append((doc.metadata["page"], doc))
+
+        ids = [f"{document_id}:{version}:{i}" for i in range(len(new_chunks))]
+        hashes = [chunk_hash(doc.page_content) for _, doc in new_chunks]
+        for chunk_id, (page, _), text_hash in zip(ids, new_chunks, hashes):
+            page_chunks.setdefault(page, []).append(
+                ChunkRecord(id=chunk_id, hash=text_hash)
+            )
+
+        if vector_store is None:
+            vector_store = self.create_vector_store(
+                [doc for _, doc in new_chunks], ids=ids
+            )
+            diff.embedded_chunks = len(new_chunks)
+        else:
+            missing = [i for i, h in enumerate(hashes) if h not in reusable]
+            embedded = self.embeddings.embed_documents(
+                [new_chunks[i][1].page_content for i in missing]
+            )
+            vectors = [reusable.get(h, []) for h in hashes]
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+
+            with guard:
+                if stale:
+                    vector_store.delete([chunk.id for chunk in stale])
+                if new_chunks:
+                    texts = [doc.page_content for _, doc in new_chunks]
+                    vector_store.add_embeddings(
+                        list(zip(texts, vectors)),
+                        [doc.metadata for _, doc in new_chunks],
+                        ids=ids,
+                    )
+            diff.embedded_chunks = len(missing)
+
+        diff.added_chunks = len(new_chunks)
+        diff.removed_chunks = len(stale)
+        diff.reused_chunks = len(new_chunks) - diff.embedded_chunks
+
+        self.revisions.set(
+            DocumentRevision(
+                document_id=document_id,
+                version=version,
+                page_hashes=page_hashes,
+                page_chunks=page_chunks,
+            )
+        )
+
+        logger.info("Document revision indexed", **diff.to_dict())
+
+        return vector_store, diff
+
+    def _seed_revision(
+        self, vector_store: FAISS, document_id: str, filename: str
+    ) -> Optional[DocumentRevision]:
+        """Build a revision from the chunks a store already holds for a file.
+
+        Stores built with process_pdf have no revision record. Their chunks of
+        the file become the chunks of a version 0 without page fingerprints,
+        so the first revision replaces them (reusing their vectors) instead of
+        adding every chunk a second time.
+
+        Args:
+            vector_store: Vector store that may hold chunks of the file
+            document_id: Identifier of the document
+            filename: File name the chunks were indexed under
+
+        Returns:
+            Revision holding the existing chunks, or None if there are none
+        """
+        if isinstance(vector_store, FilteredFAISS):
+            vector_store._sync_metadata()
+            bitmap = vector_store.metadata_index.select({"source": filename})
+            positions = np.flatnonzero(np.unpackbits(bitmap, bitorder="little"))
+            doc_ids = [vector_store.index_to_docstore_id[int(p)] for p in positions]
+        else:
+            doc_ids = list(vector_store.index_to_docstore_id.values())
+
+        page_chunks: Dict[int, List[ChunkRecord]] = {}
+        for doc_id in doc_ids:
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document) and doc.metadata.get("source") == filename:
+                page_chunks.setdefault(int(doc.metadata.get("page", 0)), []).append(
+                    ChunkRecord(id=doc_id, hash=chunk_hash(doc.page_content))
+                )
+        if not page_chunks:
+            return None
+
+        logger.info(
+            "Seeded revision from stored chunks",
+            document_id=document_id,
+            chunks=sum(len(chunks) for chunks in page_chunks.values()),
+        )
+        return DocumentRevision(
+            document_id=document_id, version=0, page_hashes=[], page_chunks=page_chunks
+        )
+
+    def _stored_vectors(
+        self, vector_store: FAISS, chunks: List[ChunkRecord]
+    ) -> Dict[str, List[float]]:
+        """Read the stored vectors of chunks back from the FAISS index.
+
+        Args:
+            vector_store: Vector store holding the chunks
+            chunks: Chunks whose vectors to read
+
+        Returns:
+            Mapping of chunk hash to stored vector
+        """
+        rows = {doc_id: row for row, doc_id in vector_store.index_to_docstore_id.items()}
+        return {
+            chunk.hash: vector_store.index.reconstruct(rows[chunk.id]).tolist()
+            for chunk in chunks
+            if chunk.id in rows
+        }
+
     def cleanup(self) -> None:
         """Remove temporary files."""
-        import shutil
-        
         try:
             shutil.rmtree(self.temp_dir)
             logger.info("Temporary files cleaned up", temp_dir=self.temp_dir)
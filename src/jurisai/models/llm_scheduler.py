@@ -0,0 +1,363 @@
+"""LLM request scheduling module.
+
+This module puts a scheduler in front of the LLM so that concurrent questions
+from several sessions share the model in a controlled way: a priority queue,
+a cap on in-flight generations per model, fair queuing across sessions and
+coalescing of identical in-flight prompts.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple, Union
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM, BaseLLM
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Lower values are served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+
+@dataclass(order=True)
+class _Job:
+    """A queued generation request."""
+
+    sort_key: Tuple[int, int, int]
+    model: str = field(compare=False)
+    key: Hashable = field(compare=False)
+    session_id: str = field(compare=False)
+    fn: Callable[[], str] = field(compare=False)
+    future: "Future[str]" = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class LLMScheduler:
+    """Schedule LLM generations across sessions and models.
+
+    Requests are ordered by priority first and then by a per-session virtual
+    time tag, so a session that floods the queue cannot starve the others.
+    Identical prompts for the same model that are still queued or running
+    share a single generation.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Union[int, Dict[str, int]] = 1,
+        max_workers: int = 16,
+        stats_window: int = 1000,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            max_in_flight: Maximum concurrent generations per model, either a
+                single value for every model or a mapping of model name to limit
+                (models missing from the mapping get a limit of 1)
+            max_workers: Size of the thread pool executing generations
+            stats_window: Number of recent wait times kept per model
+        """
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="llm-scheduler"
+        )
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queues: Dict[str, List[_Job]] = defaultdict(list)
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._pending: Dict[Hashable, "Future[str]"] = {}
+        self._virtual_time: Dict[str, int] = defaultdict(int)
+        self._session_tags: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._waits: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=stats_window)
+        )
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"submitted": 0, "coalesced": 0, "completed": 0, "failed": 0}
+        )
+        self._closed = False
+
+        logger.info(
+            "LLM scheduler initialized",
+            max_in_flight=max_in_flight,
+            max_workers=max_workers,
+        )
+
+    def limit_for(self, model: str) -> int:
+        """Return the in-flight limit for a model.
+
+        Args:
+            model: Model name
+
+        Returns:
+            Maximum number of concurrent generations for the model
+        """
+        if isinstance(self.max_in_flight, dict):
+            return max(1, self.max_in_flight.get(model, 1))
+        return max(1, self.max_in_flight)
+
+    def submit(
+        self,
+        model: str,
+        prompt: str,
+        fn: Callable[[], str],
+        session_id: str = "default",
+        priority: int = PRIORITY_NORMAL,
+        variant: Hashable = None,
+    ) -> "Future[str]":
+        """Queue a generation request.
+
+        Args:
+            model: Name of the model the request targets
+            prompt: Prompt text, used to coalesce identical requests
+            fn: Callable performing the actual generation
+            session_id: Identifier of the requesting session for fair queuing
+            priority: Request priority (lower is served first)
+            variant: Extra generation settings that must match for two
+                requests to be coalesced (e.g. temperature or stop words)
+
+        Returns:
+            Future resolving to the generated text
+        """
+        key = (model, prompt, variant)
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("LLM scheduler has been shut down")
+
+            counters = self._counters[model]
+            existing = self._pending.get(key)
+            if existing is not None:
+                counters["coalesced"] += 1
+                logger.debug("Coalesced LLM request", model=model, session_id=session_id)
+                return existing
+
+            # Start-time fair queuing: each session advances its own tag
+            tag_key = (model, session_id)
+            tag = max(self._virtual_time[model], self._session_tags[tag_key]) + 1
+            self._session_tags[tag_key] = tag
+
+            future: "Future[str]" = Future()
+            job = _Job(
+                sort_key=(priority, tag, next(self._seq)),
+                model=model,
+                key=key,
+                session_id=session_id,
+                fn=fn,
+                future=future,
+                enqueued_at=time.monotonic(),
+            )
+            heapq.heappush(self._queues[model], job)
+            self._pending[key] = future
+            counters["submitted"] += 1
+            self._dispatch(model)
+
+        return future
+
+    def run(
+        self,
+        model: str,
+        prompt: str,
+        fn: Callable[[], str],
+        session_id: str = "default",
+        priority: int = PRIORITY_NORMAL,
+        variant: Hashable = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Queue a generation request and wait for its result.
+
+        Args:
+            model: Name of the model the request targets
+            prompt: Prompt text
+            fn: Callable performing the actual generation
+            session_id: Identifier of the requesting session
+            priority: Request priority (lower is served first)
+            variant: Extra generation settings used for coalescing
+            timeout: Maximum time to wait in seconds (None waits forever)
+
+        Returns:
+            Generated text
+        """
+        return self.submit(
+            model, prompt, fn, session_id=session_id, priority=priority, variant=variant
+        ).result(timeout=timeout)
+
+    def _dispatch(self, model: str) -> None:
+        """Start queued jobs for a model while capacity allows.
+
+        Must be called with the lock held.
+
+        Args:
+            model: Model whose queue should be drained
+        """
+        queue = self._queues[model]
+        limit = self.limit_for(model)
+
+        while queue and self._in_flight[model] < limit:
+            job = heapq.heappop(queue)
+            self._in_flight[model] += 1
+            self._virtual_time[model] = job.sort_key[1]
+            self._waits[model].append(time.monotonic() - job.enqueued_at)
+            self._executor.submit(self._execute, job)
+
+    def _execute(self, job: _Job) -> None:
+        """Run a job and release its slot.
+
+        Args:
+            job: Job to run
+        """
+        result = ""
+        error: Optional[BaseException] = None
+
+        try:
+            result = job.fn()
+        except BaseException as e:  # propagated through the future
+            error = e
+
+        with self._lock:
+            self._pending.pop(job.key, None)
+            self._in_flight[job.model] -= 1
+            self._counters[job.model]["failed" if error else "completed"] += 1
+            self._dispatch(job.model)
+
+        if error is not None:
+            logger.error(
+                "Scheduled LLM request failed",
+                model=job.model,
+                session_id=job.session_id,
+                error=str(error),
+            )
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return queue statistics per model.
+
+        Returns:
+            Mapping of model name to queue depth, in-flight count, request
+            counters and wait times in seconds
+        """
+        with self._lock:
+            models = set(self._queues) | set(self._counters)
+            stats = {}
+            for model in sorted(models):
+                waits = sorted(self._waits[model])
+                stats[model] = {
+                    "queue_depth": len(self._queues[model]),
+                    "in_flight": self._in_flight[model],
+                    "max_in_flight": self.limit_for(model),
+                    **self._counters[model],
+                    "wait_avg_s": sum(waits) / len(waits) if waits else 0.0,
+                    "wait_p95_s": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                    "wait_max_s": waits[-1] if waits else 0.0,
+                }
+            return stats
+
+    def queue_depth(self, model: str) -> int:
+        """Return the number of queued and running requests for a model.
+
+        Args:
+            model: Model name
+
+        Returns:
+            Queued plus in-flight request count
+        """
+        with self._lock:
+            return len(self._queues[model]) + self._in_flight[model]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting requests and shut the worker pool down.
+
+        Args:
+            wait: Whether to wait for running generations to finish
+        """
+        with self._lock:
+            self._closed = True
+            for queue in self._queues.values():
+                for job in queue:
+                    job.future.cancel()
+                queue.clear()
+            self._pending.clear()
+
+        self._executor.shutdown(wait=wait)
+        logger.info("LLM scheduler shut down")
+
+
+def generation_variant(
+    llm: BaseLLM, stop: Optional[List[str]], kwargs: Dict[str, Any]
+) -> Hashable:
+    """Return the settings two requests must share to be coalesced.
+
+    Models whose output depends on the session's conversation (those with a
+    session_id, such as ContextOllama) only coalesce within their session.
+
+    Args:
+        llm: Model generating the text
+        stop: Stop words of the request
+        kwargs: Extra generation arguments of the request
+
+    Returns:
+        Hashable variant for LLMScheduler.submit
+    """
+    return (
+        tuple(stop or ()),
+        getattr(llm, "temperature", None),
+        getattr(llm, "session_id", None),
+        tuple(sorted((k, repr(v)) for k, v in kwargs.items())),
+    )
+
+
+class ScheduledLLM(LLM):
+    """LangChain LLM that routes generations through an LLMScheduler."""
+
+    llm: BaseLLM
+    scheduler: LLMScheduler
+    session_id: str = "default"
+    priority: int = PRIORITY_NORMAL
+
+    @property
+    def _llm_type(self) -> str:
+        """Return the type of this LLM."""
+        return "scheduled"
+
+    @property
+    def model_name(self) -> str:
+        """Return the name of the wrapped model."""
+        return getattr(self.llm, "model", None) or self.llm._llm_type
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Generate text through the scheduler.
+
+        Args:
+            prompt: Prompt to generate from
+            stop: Optional stop words
+            run_manager: Callback manager for the run
+            **kwargs: Extra generation arguments passed to the wrapped LLM
+
+        Returns:
+            Generated text
+        """
+        return self.scheduler.run(
+            self.model_name,
+            prompt,
+            lambda: self.llm.invoke(prompt, stop=stop, **kwargs),
+            session_id=self.session_id,
+            priority=self.priority,
+            variant=generation_variant(self.llm, stop, kwargs),
+        )
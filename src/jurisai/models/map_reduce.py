@@ -0,0 +1,281 @@
+"""Map-reduce answering module.
+
+This module answers questions whose evidence is spread over many chunks.
+Retrieved chunks are split into groups that are answered concurrently (map),
+with a bounded number of LLM calls in flight, and the partial answers are
+combined into one answer (reduce). Mapping stops early once enough
+high-confidence partial answers exist.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from langchain.prompts import PromptTemplate
+from langchain.schema import Document
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.retrievers import BaseRetriever
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+MAP_PROMPT = PromptTemplate.from_template(
+    """
+1. Answer the question using ONLY the excerpts below.
+2. If the excerpts do not answer it, reply exactly "NOT FOUND".
+3. Keep the answer under 3 sentences.
+4. End with a line "CONFIDENCE: <0-100>" rating how fully the excerpts answer it.
+
+Excerpts:
+{context}
+
+Question: {question}
+
+Answer:
+"""
+)
+
+REDUCE_PROMPT = PromptTemplate.from_template(
+    """
+1. Combine the partial answers below into one answer.
+2. Use ONLY the partial answers; keep every relevant fact and cite the sources.
+3. If they disagree, say so.
+4. Keep the answer under 5 sentences.
+
+Partial answers:
+{context}
+
+Question: {question}
+
+Answer:
+"""
+)
+
+_CONFIDENCE_PATTERN = re.compile(r"CONFIDENCE:\s*(\d{1,3})", re.IGNORECASE)
+_NOT_FOUND_PATTERN = re.compile(r"\bNOT FOUND\b|\bI don'?t know\b", re.IGNORECASE)
+
+
+def parse_partial(text: str) -> Tuple[str, float]:
+    """Split a map answer into its text and confidence.
+
+    Args:
+        text: Raw LLM output for one chunk group
+
+    Returns:
+        Tuple of (answer text, confidence between 0 and 1)
+    """
+    match = _CONFIDENCE_PATTERN.search(text)
+    answer = _CONFIDENCE_PATTERN.sub("", text).strip()
+    if not answer or _NOT_FOUND_PATTERN.search(answer):
+        return "", 0.0
+    # Answers without a rating are kept but never trigger early termination
+    confidence = min(int(match.group(1)), 100) / 100 if match else 0.5
+    return answer, confidence
+
+
+@dataclass
+class PartialAnswer:
+    """Answer of one chunk group."""
+
+    group: int
+    answer: str
+    confidence: float
+    sources: List[str]
+    elapsed_s: float
+
+
+@dataclass
+class MapReduceResult:
+    """Final answer with the partial answers and per-stage timing."""
+
+    answer: str
+    partials: List[PartialAnswer] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    groups_total: int = 0
+    groups_answered: int = 0
+    groups_failed: int = 0
+    early_stopped: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return asdict(self)
+
+
+def source_label(doc: Document) -> str:
+    """Return a short citation for a chunk.
+
+    Args:
+        doc: Retrieved chunk
+
+    Returns:
+        Document name and 1-based page, e.g. "lease.pdf p.3"
+    """
+    source = doc.metadata.get("source", "document")
+    page = doc.metadata.get("page")
+    return f"{source} p.{page + 1}" if isinstance(page, int) else str(source)
+
+
+class MapReduceAnswerer:
+    """Answer questions by mapping over chunk groups and reducing the answers."""
+
+    def __init__(
+        self,
+        llm: BaseLanguageModel,
+        retriever: BaseRetriever,
+        group_size: int = 3,
+        max_concurrency: int = 3,
+        min_confident: int = 2,
+        confidence_threshold: float = 0.7,
+    ):
+        """Initialize the answerer.
+
+        Args:
+            llm: Model answering the map and reduce prompts
+            retriever: Retriever returning the candidate chunks, most relevant
+                first
+            group_size: Number of chunks answered by one map call
+            max_concurrency: Maximum number of map calls in flight
+            min_confident: Stop mapping once this many partial answers reach
+                the confidence threshold (0 disables early termination)
+            confidence_threshold: Confidence for a partial answer to count
+        """
+        self.llm = llm
+        self.retriever = retriever
+        self.group_size = max(group_size, 1)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.min_confident = min_confident
+        self.confidence_threshold = confidence_threshold
+
+    def _invoke(self, prompt: str) -> str:
+        """Call the LLM and return its text."""
+        result = self.llm.invoke(prompt)
+        return str(getattr(result, "content", result))
+
+    def _map_group(
+        self, number: int, group: List[Document], question: str
+    ) -> PartialAnswer:
+        """Answer the question from one group of chunks."""
+        start = time.perf_counter()
+        context = "\n\n".join(
+            f"[{source_label(doc)}]\n{doc.page_content.strip()}" for doc in group
+        )
+        raw = self._invoke(MAP_PROMPT.format(context=context, question=question))
+        answer, confidence = parse_partial(raw)
+        return PartialAnswer(
+            group=number,
+            answer=answer,
+            confidence=confidence,
+            sources=list(dict.fromkeys(source_label(doc) for doc in group)),
+            elapsed_s=time.perf_counter() - start,
+        )
+
+    def answer(self, question: str) -> MapReduceResult:
+        """Answer a question with map-reduce over the retrieved chunks.
+
+        Args:
+            question: Question to answer
+
+        Returns:
+            Final answer with partial answers and timing of each stage
+        """
+        started = time.perf_counter()
+        documents = self.retriever.invoke(question)
+        retrieved = time.perf_counter()
+
+        groups = [
+            documents[i : i + self.group_size]
+            for i in range(0, len(documents), self.group_size)
+        ]
+        partials: List[PartialAnswer] = []
+        failures: Dict[int, Exception] = {}
+        early_stopped = False
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            # Groups are submitted in relevance order, so the most relevant
+            # ones are answered first and the tail is what gets skipped
+            numbers = {
+                executor.submit(self._map_group, number, group, question): number
+                for number, group in enumerate(groups)
+            }
+            pending = set(numbers)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # A failed group is skipped; the others are still reduced
+                    try:
+                        partials.append(future.result())
+                    except Exception as e:
+                        failures[numbers[future]] = e
+                        logger.warning(
+                            "Map group failed", group=numbers[future], error=str(e)
+                        )
+                confident_count = sum(
+                    p.confidence >= self.confidence_threshold for p in partials
+                )
+                if (
+                    pending
+                    and self.min_confident
+                    and confident_count >= self.min_confident
+                ):
+                    early_stopped = True
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        mapped = time.perf_counter()
+
+        if failures and not partials:
+            raise RuntimeError(
+                f"All {len(failures)} map groups failed"
+            ) from next(iter(failures.values()))
+
+        partials.sort(key=lambda p: p.group)
+        useful = [p for p in partials if p.answer]
+        confident = [p for p in useful if p.confidence >= self.confidence_threshold]
+        selected = sorted(confident or useful, key=lambda p: (-p.confidence, p.group))
+
+        if not selected:
+            answer = "I don't know."
+        elif len(selected) == 1:
+            answer = selected[0].answer
+        else:
+            context = "\n\n".join(
+                f"[{', '.join(p.sources)}]\n{p.answer}" for p in selected
+            )
+            answer = self._invoke(
+                REDUCE_PROMPT.format(context=context, question=question)
+            ).strip()
+        finished = time.perf_counter()
+
+        result = MapReduceResult(
+            answer=answer,
+            partials=partials,
+            timings={
+                "retrieve_s": retrieved - started,
+                "map_s": mapped - retrieved,
+                "reduce_s": finished - mapped,
+                "total_s": finished - started,
+            },
+            groups_total=len(groups),
+            groups_answered=len(partials),
+            groups_failed=len(failures),
+            early_stopped=early_stopped,
+        )
+
+        logger.info(
+            "Map-reduce answer",
+            question=question,
+            chunks=len(documents),
+            groups_total=result.groups_total,
+            groups_answered=result.groups_answered,
+            groups_failed=result.groups_failed,
+            early_stopped=early_stopped,
+            **{name: round(value, 3) for name, value in result.timings.items()},
+        )
+
+        return result
@@ -0,0 +1,474 @@
+"""Metadata index module.
+
+This module captures structured metadata for chunks at ingest (source, page,
+section, document date and type) and keeps it in compact columns aligned
+with FAISS rows. Filters are turned into a row bitmap and
+applied inside the FAISS search through an IDSelector, so a filtered query
+scans no more than an unfiltered one instead of over-fetching and
+post-filtering.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain.schema import Document
+
+from src.jurisai.models.vector_index import fit_quantizer
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+CATEGORICAL_FIELDS = ("source", "section", "document_type")
+NUMERIC_FIELDS = ("page", "year")
+
+# Sentinel for rows without a value in a numeric column
+_MISSING = np.iinfo(np.int64).min
+
+# Code of rows without a value in a categorical column
+_NO_CODE = -1
+
+_RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+
+_SECTION_PATTERN = re.compile(
+    r"^\s*((?:ARTICLE|Article|SECTION|Section|EXHIBIT|Exhibit|SCHEDULE|Schedule)"
+    r"\s+[\dIVXLC]+[A-Z]?(?:\.\d+)*\b.{0,80}"
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z][A-Z ,&'-]{3,80})$",
+    re.MULTILINE,
+)
+_PDF_DATE_PATTERN = re.compile(r"D:(\d{4})(\d{2})?(\d{2})?")
+_TEXT_DATE_PATTERN = re.compile(
+    r"\b(?:January|February|March|April|May|June|July|August|September|October|"
+    r"November|December)\s+\d{1,2},\s+((?:19|20)\d{2})\b"
+    r"|\b((?:19|20)\d{2})-\d{2}-\d{2}\b"
+)
+_DOCUMENT_TYPES = (
+    ("exhibit", ("exhibit",)),
+    ("agreement", ("agreement", "contract", "lease", "license")),
+    ("motion", ("motion",)),
+    ("complaint", ("complaint", "petition")),
+    ("order", ("order", "judgment", "ruling")),
+    ("brief", ("brief", "memorandum")),
+    ("affidavit", ("affidavit", "declaration")),
+)
+
+
+def _document_type(filename: str, first_page: str) -> str:
+    """Guess the type of a legal document from its name and first page."""
+    haystack = f"{filename} {first_page[:500]}".lower()
+    for document_type, keywords in _DOCUMENT_TYPES:
+        if any(keyword in haystack for keyword in keywords):
+            return document_type
+    return "document"
+
+
+def _document_date(pdf_metadata: Dict[str, Any], first_page: str) -> Optional[str]:
+    """Return the document date from PDF metadata or the first page text."""
+    for key in ("CreationDate", "ModDate"):
+        match = _PDF_DATE_PATTERN.match(str(pdf_metadata.get(key, "")))
+        if match:
+            month = match.group(2) or "01"
+            day = match.group(3) or "01"
+            return f"{match.group(1)}-{month}-{day}"
+    match = _TEXT_DATE_PATTERN.search(first_page)
+    if match:
+        return f"{match.group(1) or match.group(2)}-01-01"
+    return None
+
+
+def annotate_documents(documents: List[Document], filename: str) -> List[Document]:
+    """Add structured metadata used for filtering to page documents.
+
+    Sets ``source`` to the file name, ``section`` to the last heading seen up
+    to each page, and ``document_date``, ``year`` and ``document_type`` from
+    the PDF metadata or the first page.
+
+    Args:
+        documents: Page documents of one PDF, in page order
+        filename: Original file name of the PDF
+
+    Returns:
+        The same documents with added metadata
+    """
+    if not documents:
+        return documents
+
+    first_page = documents[0].page_content
+    document_type = _document_type(os.path.basename(filename), first_page)
+    document_date = _document_date(documents[0].metadata, first_page)
+
+    section = None
+    for doc in documents:
+        headings = _SECTION_PATTERN.findall(doc.page_content)
+        if headings:
+            section = headings[0].strip()[:120]
+        doc.metadata["source"] = filename
+        doc.metadata["document_type"] = document_type
+        if section is not None:
+            doc.metadata["section"] = section
+        if document_date is not None:
+            doc.metadata["document_date"] = document_date
+            doc.metadata["year"] = int(document_date[:4])
+
+    return documents
+
+
+class MetadataIndex:
+    """Column indexes over chunk metadata, aligned with FAISS rows.
+
+    Categorical fields are kept as int32 columns of value codes and numeric
+    fields as int64 columns, so adding, removing and filtering rows are
+    vectorized operations over whole columns.
+    """
+
+    def __init__(
+        self,
+        categorical: Sequence[str] = CATEGORICAL_FIELDS,
+        numeric: Sequence[str] = NUMERIC_FIELDS,
+    ):
+        """Initialize the metadata index.
+
+        Args:
+            categorical: Fields filtered by exact value
+            numeric: Integer fields that also support range filters
+        """
+        self.categorical = tuple(categorical)
+        self.numeric = tuple(numeric)
+        self._lock = threading.Lock()
+        self._size = 0
+        self._codes: Dict[str, Dict[Any, int]] = {
+            field: {} for field in self.categorical
+        }
+        self._categories: Dict[str, np.ndarray] = {
+            field: np.full(0, _NO_CODE, dtype=np.int32) for field in self.categorical
+        }
+        self._columns: Dict[str, np.ndarray] = {
+            field: np.full(0, _MISSING, dtype=np.int64) for field in self.numeric
+        }
+
+    def __len__(self) -> int:
+        """Return the number of indexed rows."""
+        return self._size
+
+    def add(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Append rows to the index.
+
+        Args:
+            metadatas: Metadata of each new row, in FAISS row order
+        """
+        metadatas = list(metadatas)
+        with self._lock:
+            for field in self.numeric:
+                column = np.full(len(metadatas), _MISSING, dtype=np.int64)
+                for i, metadata in enumerate(metadatas):
+                    value = metadata.get(field)
+                    if isinstance(value, (int, np.integer)) and not isinstance(
+                        value, bool
+                    ):
+                        column[i] = value
+                self._columns[field] = np.concatenate([self._columns[field], column])
+
+            for field in self.categorical:
+                codes = self._codes[field]
+                column = np.full(len(metadatas), _NO_CODE, dtype=np.int32)
+                for i, metadata in enumerate(metadatas):
+                    value = metadata.get(field)
+                    if value is not None:
+                        column[i] = codes.setdefault(value, len(codes))
+                self._categories[field] = np.concatenate(
+                    [self._categories[field], column]
+                )
+
+            self._size += len(metadatas)
+
+    def remove(self, rows: Iterable[int]) -> None:
+        """Remove rows and shift later rows down, as FAISS ``remove_ids`` does.
+
+        Args:
+            rows: Row positions to remove
+        """
+        rows = sorted(set(int(row) for row in rows))
+        if not rows:
+            return
+
+        with self._lock:
+            keep = np.ones(self._size, dtype=bool)
+            keep[rows] = False
+            for field in self.numeric:
+                self._columns[field] = self._columns[field][keep]
+            for field in self.categorical:
+                self._categories[field] = self._categories[field][keep]
+
+            self._size -= len(rows)
+
+    def can_filter(self, filter: Any) -> bool:
+        """Check whether a filter only uses indexed fields and known operators.
+
+        Args:
+            filter: Metadata filter
+
+        Returns:
+            True if the filter can be evaluated on the index
+        """
+        if not isinstance(filter, dict) or not filter:
+            return False
+        for field, condition in filter.items():
+            if field in self.numeric:
+                if isinstance(condition, dict) and not set(condition).issubset(
+                    _RANGE_OPERATORS + ("$eq", "$in")
+                ):
+                    return False
+            elif field in self.categorical:
+                if isinstance(condition, dict) and not set(condition).issubset(
+                    ("$eq", "$in")
+                ):
+                    return False
+            else:
+                return False
+        return True
+
+    def _categorical_mask(self, field: str, condition: Any) -> np.ndarray:
+        """Return the boolean row mask matching a categorical condition."""
+        codes = self._codes[field]
+        if isinstance(condition, dict):
+            values = list(condition.get("$in", [])) + (
+                [condition["$eq"]] if "$eq" in condition else []
+            )
+        elif isinstance(condition, (list, tuple, set)):
+            values = list(condition)
+        else:
+            values = [condition]
+
+        wanted = [codes[value] for value in values if value in codes]
+        mask: np.ndarray = np.isin(self._categories[field], wanted)
+        return mask
+
+    def _numeric_mask(self, field: str, condition: Any) -> np.ndarray:
+        """Return the boolean row mask matching a numeric condition."""
+        column = self._columns[field]
+        mask: np.ndarray = column != _MISSING
+
+        if isinstance(condition, tuple) and len(condition) == 2:
+            low, high = condition
+            mask = mask & (column >= low) & (column <= high)
+        elif isinstance(condition, (list, set)):
+            mask = mask & np.isin(column, list(condition))
+        elif not isinstance(condition, dict):
+            mask = mask & (column == condition)
+        else:
+            if "$eq" in condition:
+                mask = mask & (column == condition["$eq"])
+            if "$in" in condition:
+                mask = mask & np.isin(column, list(condition["$in"]))
+            if "$gt" in condition:
+                mask = mask & (column > condition["$gt"])
+            if "$gte" in condition:
+                mask = mask & (column >= condition["$gte"])
+            if "$lt" in condition:
+                mask = mask & (column < condition["$lt"])
+            if "$lte" in condition:
+                mask = mask & (column <= condition["$lte"])
+        return mask
+
+    def select(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Evaluate a filter into a packed row bitmap.
+
+        Conditions on different fields are combined with AND. A categorical
+        condition is a value or a list of values; a numeric condition is a
+        value, a list of values, an inclusive ``(low, high)`` tuple or a dict of
+        ``$eq``/``$in``/``$gt``/``$gte``/``$lt``/``$lte`` operators.
+
+        Args:
+            filter: Metadata filter
+
+        Returns:
+            Little-endian packed bitmap with one bit per FAISS row, as expected
+            by ``faiss.IDSelectorBitmap``
+        """
+        with self._lock:
+            mask = np.ones(self._size, dtype=bool)
+            for field, condition in filter.items():
+                if field in self.categorical:
+                    mask &= self._categorical_mask(field, condition)
+                elif field in self.numeric:
+                    mask &= self._numeric_mask(field, condition)
+
+        return np.packbits(mask, bitorder="little")
+
+    def count(self, filter: Dict[str, Any]) -> int:
+        """Return the number of rows matching a filter.
+
+        Args:
+            filter: Metadata filter
+
+        Returns:
+            Number of matching rows
+        """
+        return int(np.unpackbits(self.select(filter)).sum())
+
+    def values(self, field: str) -> List[Any]:
+        """Return the distinct values of a categorical field.
+
+        Args:
+            field: Categorical field name
+
+        Returns:
+            Sorted list of values present in the index
+        """
+        with self._lock:
+            present = set(np.unique(self._categories[field]).tolist())
+            values = self._codes[field].items()
+            return sorted((value for value, code in values if code in present), key=str)
+
+
+class FilteredFAISS(FAISS):
+    """FAISS vector store that pre-filters searches with a MetadataIndex."""
+
+    def __init__(
+        self,
+        *args: Any,
+        metadata_index: Optional[MetadataIndex] = None,
+        **kwargs: Any,
+    ):
+        """Initialize the vector store.
+
+        Args:
+            *args: Positional arguments for FAISS
+            metadata_index: Metadata index aligned with the FAISS rows (a new
+                one is built from the docstore if None)
+            **kwargs: Keyword arguments for FAISS
+        """
+        super().__init__(*args, **kwargs)
+        self.metadata_index = (
+            metadata_index if metadata_index is not None else MetadataIndex()
+        )
+        # Guards the FAISS rows together with the metadata index, so a row
+        # selection is searched before rows are added or removed
+        self._metadata_lock = threading.RLock()
+
+    def _sync_metadata(self) -> None:
+        """Index the metadata of FAISS rows added since the last sync."""
+        with self._metadata_lock:
+            start = len(self.metadata_index)
+            end = int(self.index.ntotal)
+            if start >= end:
+                return
+            metadatas = []
+            for position in range(start, end):
+                doc = self.docstore.search(self.index_to_docstore_id[position])
+                metadatas.append({} if isinstance(doc, str) else doc.metadata)
+            self.metadata_index.add(metadatas)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed and add texts and index their metadata."""
+        texts = list(texts)
+        embeddings = self._embed_documents(texts)
+        return self.add_embeddings(zip(texts, embeddings), metadatas, ids, **kwargs)
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Add embeddings and index their metadata.
+
+        An int8 index whose range does not cover the new vectors is retrained
+        first, so they are not clipped.
+        """
+        text_embeddings = list(text_embeddings)
+        with self._metadata_lock:
+            if text_embeddings:
+                vectors = np.asarray([vector for _, vector in text_embeddings])
+                self.index = fit_quantizer(self.index, vectors)
+            result = super().add_embeddings(text_embeddings, metadatas, ids, **kwargs)
+            self._sync_metadata()
+        return result
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete chunks and drop their rows from the metadata index."""
+        with self._metadata_lock:
+            self._sync_metadata()
+            wanted = set(ids or [])
+            rows = [
+                position
+                for position, doc_id in self.index_to_docstore_id.items()
+                if doc_id in wanted
+            ]
+            result = super().delete(ids, **kwargs)
+            self.metadata_index.remove(rows)
+        return result
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Any] = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Search, applying indexed metadata filters inside FAISS.
+
+        Filters the metadata index can evaluate become an IDSelector bitmap,
+        so only matching rows are scored. Other filters fall back to the
+        default over-fetch and post-filter behaviour.
+
+        Args:
+            embedding: Query vector
+            k: Number of documents to return
+            filter: Metadata filter
+            fetch_k: Documents fetched before post-filtering (fallback only)
+            **kwargs: Extra search arguments such as ``score_threshold``
+
+        Returns:
+            List of (document, distance) tuples
+        """
+        self._sync_metadata()
+        if filter is None or not self.metadata_index.can_filter(filter):
+            return super().similarity_search_with_score_by_vector(
+                embedding, k, filter=filter, fetch_k=fetch_k, **kwargs
+            )
+
+        query = np.asarray([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(query)
+        with self._metadata_lock:
+            self._sync_metadata()
+            bitmap = self.metadata_index.select(filter)
+            if not bitmap.any():
+                return []
+            # The selector takes the bitmap length in bytes
+            selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+            params = faiss.SearchParameters()
+            params.sel = selector
+            distances, positions = self.index.search(query, k, params=params)
+            ids = [
+                self.index_to_docstore_id[int(position)] if position >= 0 else None
+                for position in positions[0]
+            ]
+
+        score_threshold = kwargs.get("score_threshold")
+        results = []
+        for distance, doc_id in zip(distances[0], ids):
+            if doc_id is None:
+                continue
+            if score_threshold is not None and distance > score_threshold:
+                continue
+            doc = self.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                results.append((doc, float(distance)))
+
+        return results
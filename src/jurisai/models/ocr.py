@@ -0,0 +1,272 @@
+"""OCR fallback module.
+
+This module recovers text from scanned PDF pages. Pages without an extractable
+text layer are rasterized and passed through Tesseract in a long-lived process
+pool, and the recognized text is cached by page fingerprint so re-ingesting a scanned
+record skips pages that were already recognized.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import pdfplumber
+from langchain.schema import Document
+
+from src.jurisai.utils.log_config import get_logger
+
+try:
+    import pytesseract
+except ImportError:  # Optional dependency, see the "ocr" extra
+    pytesseract = None
+
+logger = get_logger(__name__)
+
+DEFAULT_OCR_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "jurisai", "ocr")
+
+# OCR worker pools shared by every OCRFallback, keyed by worker count
+_pools: Dict[Optional[int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def ocr_available() -> bool:
+    """Check whether pytesseract and the tesseract binary are installed.
+
+    Returns:
+        True if pages can be recognized
+    """
+    return pytesseract is not None and shutil.which("tesseract") is not None
+
+
+def page_fingerprint(page: Any) -> str:
+    """Hash the raw content of a PDF page.
+
+    The hash covers the page content streams and the raw bytes of every image
+    on the page, so it changes whenever the page would render differently but
+    does not require extracting text or rasterizing the page.
+
+    Args:
+        page: pdfplumber page
+
+    Returns:
+        Hex SHA-256 digest of the page content
+    """
+    digest = hashlib.sha256()
+    for stream in page.page_obj.contents:
+        digest.update(stream.get_data())
+    for image in page.images:
+        digest.update(image["stream"].get_rawdata() or b"")
+    return digest.hexdigest()
+
+
+def _ocr_page(pdf_path: str, page_number: int, resolution: int, language: str) -> str:
+    """Rasterize and recognize a single page.
+
+    Runs in a worker process, so it reopens the PDF itself.
+
+    Args:
+        pdf_path: Path of the PDF file
+        page_number: Zero-based page index
+        resolution: Rasterization resolution in DPI
+        language: Tesseract language code
+
+    Returns:
+        Recognized text of the page
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        image = pdf.pages[page_number].to_image(resolution=resolution).original
+    text: str = pytesseract.image_to_string(image, lang=language)
+    return text
+
+
+def _ocr_pool(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    """Return the shared OCR worker pool, starting it on first use.
+
+    Workers are spawned rather than forked, since the Streamlit app and the
+    ingestion daemon call this from threads.
+
+    Args:
+        max_workers: Number of worker processes (None for the CPU count)
+
+    Returns:
+        Process pool running _ocr_page
+    """
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pools[max_workers] = pool
+        return pool
+
+
+def shutdown_ocr_pools() -> None:
+    """Stop the shared OCR worker processes."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+class OCRFallback:
+    """Recognize text on pages that have no text layer."""
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+        max_workers: Optional[int] = None,
+        resolution: int = 300,
+        language: str = "eng",
+        min_chars: int = 20,
+    ):
+        """Initialize the OCR fallback.
+
+        Args:
+            cache_dir: Directory where recognized page texts are cached
+            max_workers: Number of OCR worker processes (defaults to CPU count)
+            resolution: Rasterization resolution in DPI
+            language: Tesseract language code
+            min_chars: Pages with fewer extracted characters are treated as scanned
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.resolution = resolution
+        self.language = language
+        self.min_chars = min_chars
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def find_textless_pages(self, documents: List[Document]) -> List[int]:
+        """Return the positions of page documents without usable text.
+
+        Args:
+            documents: Page documents as returned by the PDF loader
+
+        Returns:
+            Positions in the list of pages that need OCR
+        """
+        return [
+            i
+            for i, doc in enumerate(documents)
+            if len(doc.page_content.strip()) < self.min_chars
+        ]
+
+    def _cache_path(self, fingerprint: str) -> str:
+        """Return the cache file for a page fingerprint."""
+        key = hashlib.sha256(
+            f"{fingerprint}:{self.resolution}:{self.language}".encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _write_cache(self, cache_path: str, text: str) -> None:
+        """Store recognized text, replacing the cache file atomically.
+
+        A crash while writing leaves a stray temp file rather than a truncated
+        entry that later reads would trust.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def recognize(self, pdf_path: str, page_numbers: List[int]) -> Dict[int, str]:
+        """Recognize the text of several pages, using the cache where possible.
+
+        Args:
+            pdf_path: Path of the PDF file
+            page_numbers: Zero-based page indexes to recognize
+
+        Returns:
+            Mapping of page index to recognized text
+        """
+        with pdfplumber.open(pdf_path) as pdf:
+            cache_paths = {
+                number: self._cache_path(page_fingerprint(pdf.pages[number]))
+                for number in page_numbers
+            }
+
+        texts: Dict[int, str] = {}
+        missing = []
+        for number, cache_path in cache_paths.items():
+            if os.path.exists(cache_path):
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    texts[number] = f.read()
+            else:
+                missing.append(number)
+
+        if missing:
+            args = [(pdf_path, n, self.resolution, self.language) for n in missing]
+            if len(missing) == 1:
+                results = [_ocr_page(*args[0])]
+            else:
+                pool = _ocr_pool(self.max_workers)
+                try:
+                    results = list(pool.map(_ocr_page, *zip(*args)))
+                except BrokenProcessPool:
+                    # A worker died; the next call starts a new pool
+                    with _pools_lock:
+                        if _pools.get(self.max_workers) is pool:
+                            del _pools[self.max_workers]
+                    raise
+
+            for number, text in zip(missing, results):
+                texts[number] = text
+                self._write_cache(cache_paths[number], text)
+
+        logger.info(
+            "OCR completed",
+            file_path=pdf_path,
+            pages=len(page_numbers),
+            cached=len(page_numbers) - len(missing),
+            recognized=len(missing),
+        )
+
+        return texts
+
+    def apply(self, pdf_path: str, documents: List[Document]) -> List[Document]:
+        """Fill in the text of scanned pages.
+
+        Args:
+            pdf_path: Path of the PDF file the documents were loaded from
+            documents: Page documents as returned by the PDF loader
+
+        Returns:
+            The documents, with OCR text on pages that had no text layer
+        """
+        positions = self.find_textless_pages(documents)
+        if not positions:
+            return documents
+
+        if not ocr_available():
+            logger.warning(
+                "Scanned pages found but OCR is unavailable",
+                file_path=pdf_path,
+                pages=len(positions),
+                hint="install the 'ocr' extra and the tesseract binary",
+            )
+            return documents
+
+        page_numbers = {
+            i: int(documents[i].metadata.get("page", i)) for i in positions
+        }
+        texts = self.recognize(pdf_path, sorted(set(page_numbers.values())))
+
+        for i, number in page_numbers.items():
+            documents[i].page_content = texts[number]
+            documents[i].metadata["ocr"] = True
+
+        return documents
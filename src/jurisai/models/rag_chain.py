@@ -10,8 +10,17 @@ from typing import Any, Dict, List, Optional
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain, RetrievalQA, StuffDocumentsChain
 from langchain_community.llms import Ollama
-from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.vectorstores import VectorStore
 
+from src.jurisai.models.context_cache import ContextOllama, ConversationContextCache
+from src.jurisai.models.corpus import DocumentCorpus
+from src.jurisai.models.llm_scheduler import LLMScheduler, ScheduledLLM
+from src.jurisai.models.map_reduce import MapReduceAnswerer
+from src.jurisai.models.retriever import CachedQueryRetriever, QueryEncoder
+from src.jurisai.models.router import ModelRouter, RoutedLLM
+from src.jurisai.models.summary_index import SummaryIndex, summary_level
 from src.jurisai.utils.log_config import get_logger
 
 logger = get_logger(__name__)
@@ -25,6 +34,10 @@ class RAGChain:
         model_name: str = "deepseek-r1:1.5b",
         prompt_template: Optional[str] = None,
         temperature: float = 0.1,
+        scheduler: Optional[LLMScheduler] = None,
+        session_id: str = "default",
+        router: Optional[ModelRouter] = None,
+        context_cache: Optional[ConversationContextCache] = None,
     ):
         """Initialize the RAG chain.
         
@@ -32,9 +45,33 @@ class RAGChain:
             model_name: Name of the Ollama model to use
             prompt_template: Custom prompt template to use (or None for default)
             temperature: Temperature for LLM generation
+            scheduler: Shared scheduler to queue LLM calls through (or None to
+                call the model directly)
+            session_id: Session identifier used for fair queuing
+            router: Router choosing a model per question (questions then use
+                the router's models and scheduler; model_name only builds
+                summaries)
+            context_cache: Cache of Ollama conversation contexts through
+                which follow-up questions with the same prompt prefix reuse
+                the evaluated prefix (or None to send every prompt in full)
         """
+        self.model_name = model_name
+        self.session_id = session_id
+        self.context_cache = context_cache
+        self.scheduler = router.scheduler if router is not None else scheduler
+        
         # Initialize Ollama LLM
-        self.llm = Ollama(model=model_name, temperature=temperature)
+        self.llm = self._new_model(model_name, temperature)
+        self._models: List[BaseLLM] = [self.llm]
+        if router is not None:
+            llms = {name: self._new_model(name, temperature) for name in router.models}
+            self._models = list(llms.values())
+            self.llm = RoutedLLM(router=router, llms=llms, session_id=session_id)
+        elif scheduler is not None:
+            self.llm = ScheduledLLM(
+                llm=self.llm, scheduler=scheduler, session_id=session_id
+            )
+        self._temperature = temperature
         
         # Set up the prompt template
         if prompt_template is None:
@@ -51,6 +88,22 @@ Question: {question}
 Answer:
 """
         self.qa_prompt = PromptTemplate.from_template(prompt_template)
+        self._query_encoders: Dict[int, QueryEncoder] = {}
+        
+        # Prompt for broad questions answered from precomputed summaries
+        self.summary_prompt = PromptTemplate.from_template(
+            """
+1. Use ONLY the document summaries below.
+2. If unsure, say "I don't know".
+3. Be complete but concise; use a list when the question asks for one.
+
+Summaries: {context}
+
+Question: {question}
+
+Answer:
+"""
+        )
         
         # Document formatting prompt
         self.document_prompt = PromptTemplate(
@@ -58,47 +111,242 @@ Answer:
             input_variables=["page_content", "source"]
         )
         
+        # Prompts for questions across a multi-document corpus
+        self.corpus_prompt = PromptTemplate.from_template(
+            """
+1. Use ONLY the context below, which comes from several documents.
+2. If unsure, say "I don't know".
+3. Keep answers under 5 sentences.
+4. Cite the document and page of every fact in brackets, e.g. [lease.pdf p.3].
+
+Context: {context}
+
+Question: {question}
+
+Answer:
+"""
+        )
+        self.citation_prompt = PromptTemplate(
+            template="[{citation}]\n{page_content}",
+            input_variables=["page_content", "citation"]
+        )
+        
         logger.info(
             "RAG chain initialized", 
-            model=model_name, 
-            temperature=temperature
+            model=model_name if router is None else "auto", 
+            temperature=temperature,
+            scheduled=scheduler is not None,
+            context_reuse=context_cache is not None,
+        )
+    
+    def _new_model(self, model_name: str, temperature: float) -> BaseLLM:
+        """Create the Ollama LLM for a model.
+
+        Args:
+            model_name: Name of the Ollama model
+            temperature: Temperature for generation
+
+        Returns:
+            Ollama LLM, continuing cached conversations if this chain has a
+            context cache
+        """
+        if self.context_cache is None:
+            llm: BaseLLM = Ollama(model=model_name, temperature=temperature)
+            return llm
+        return ContextOllama(
+            model=model_name,
+            temperature=temperature,
+            context_cache=self.context_cache,
+            session_id=self.session_id,
         )
         
-    def create_chain(self, vector_store: FAISS, k: int = 3) -> RetrievalQA:
+    def summary_llm(self) -> BaseLLM:
+        """Return the model for building summaries of this chain's documents.
+
+        Summaries are cached across sessions by content, so they are built
+        with the plain model_name model: without the session's conversation
+        context and without routing, whose classifier is meant for questions.
+
+        Returns:
+            Ollama LLM, queued through the chain's scheduler if it has one
+        """
+        llm: BaseLLM = Ollama(model=self.model_name, temperature=self._temperature)
+        if self.scheduler is None:
+            return llm
+        return ScheduledLLM(
+            llm=llm, scheduler=self.scheduler, session_id=self.session_id
+        )
+
+    @property
+    def temperature(self) -> float:
+        """Return the generation temperature."""
+        return self._temperature
+
+    @temperature.setter
+    def temperature(self, value: float) -> None:
+        """Set the generation temperature of every model in place.
+
+        The models are not rebuilt, so chains and answerers created earlier
+        use the new temperature as well.
+
+        Args:
+            value: New temperature
+        """
+        for model in self._models:
+            if isinstance(model, (Ollama, ContextOllama)):
+                model.temperature = value
+        self._temperature = value
+
+    def get_query_encoder(self, embeddings: Embeddings) -> QueryEncoder:
+        """Return the query encoder for an embeddings model.
+
+        Encoders are kept per embeddings model so their query cache survives
+        chain rebuilds.
+
+        Args:
+            embeddings: Embeddings model used by the vector store
+
+        Returns:
+            Query encoder wrapping the embeddings model
+        """
+        encoder = self._query_encoders.get(id(embeddings))
+        if encoder is None or encoder.embeddings is not embeddings:
+            encoder = QueryEncoder(embeddings)
+            self._query_encoders[id(embeddings)] = encoder
+        return encoder
+
+    def create_retriever(
+        self,
+        vector_store: VectorStore,
+        k: int = 3,
+        filter: Optional[Dict[str, Any]] = None,
+        canonical_order: bool = False,
+    ) -> CachedQueryRetriever:
+        """Create a retriever with cached, micro-batched query encoding.
+
+        Args:
+            vector_store: FAISS vector store containing document embeddings
+            k: Number of similar documents to retrieve
+            filter: Optional metadata filter applied during retrieval
+            canonical_order: Return documents ordered by source and page
+                instead of by score
+
+        Returns:
+            Retriever over the vector store
+        """
+        if vector_store.embeddings is None:
+            raise ValueError("The vector store has no embeddings model")
+        search_kwargs: Dict[str, Any] = {"k": k}
+        if filter:
+            search_kwargs["filter"] = filter
+        return CachedQueryRetriever(
+            vector_store=vector_store,
+            encoder=self.get_query_encoder(vector_store.embeddings),
+            search_kwargs=search_kwargs,
+            canonical_order=canonical_order,
+        )
+
+    def create_chain(
+        self,
+        vector_store: VectorStore,
+        k: int = 3,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> RetrievalQA:
         """Create a retrieval QA chain.
         
+        A DocumentCorpus is answered with prompts that cite the document and
+        page of each chunk. Retrieved chunks are stuffed in canonical order,
+        so questions retrieving the same chunks share the prompt prefix up to
+        the question, which the model server and the context cache reuse.
+        
         Args:
-            vector_store: FAISS vector store containing document embeddings
+            vector_store: FAISS vector store containing document embeddings,
+                or a DocumentCorpus of several documents
             k: Number of similar documents to retrieve
+            filter: Optional metadata filter applied during retrieval
             
         Returns:
             RetrievalQA chain ready for answering questions
         """
-        # Set up retriever
-        retriever = vector_store.as_retriever(search_kwargs={"k": k})
+        retriever = self.create_retriever(vector_store, k, filter, canonical_order=True)
+        corpus = isinstance(vector_store, DocumentCorpus)
         
         # Chain 1: Generate answers
-        llm_chain = LLMChain(llm=self.llm, prompt=self.qa_prompt)
+        llm_chain = LLMChain(
+            llm=self.llm, prompt=self.corpus_prompt if corpus else self.qa_prompt
+        )
         
         # Final RAG pipeline
         qa = RetrievalQA(
             combine_documents_chain=StuffDocumentsChain(
                 llm_chain=llm_chain,
-                document_prompt=self.document_prompt
+                document_prompt=(
+                    self.citation_prompt if corpus else self.document_prompt
+                ),
+                document_variable_name="context",
             ),
             retriever=retriever
         )
         
-        logger.info("QA chain created", retriever_k=k)
+        logger.info("QA chain created", retriever_k=k, filter=filter, corpus=corpus)
         
         return qa
     
-    def answer_question(self, qa_chain: RetrievalQA, question: str) -> str:
+    def create_map_reduce(
+        self,
+        vector_store: VectorStore,
+        k: int = 12,
+        filter: Optional[Dict[str, Any]] = None,
+        group_size: int = 3,
+        max_concurrency: int = 3,
+        min_confident: int = 2,
+    ) -> MapReduceAnswerer:
+        """Create a map-reduce answerer for evidence spread over many chunks.
+
+        Args:
+            vector_store: FAISS vector store containing document embeddings
+            k: Number of similar documents to retrieve
+            filter: Optional metadata filter applied during retrieval
+            group_size: Number of chunks answered by one map call
+            max_concurrency: Maximum number of map calls in flight
+            min_confident: Confident partial answers after which mapping stops
+
+        Returns:
+            Map-reduce answerer using this chain's LLM
+        """
+        answerer = MapReduceAnswerer(
+            llm=self.llm,
+            retriever=self.create_retriever(vector_store, k, filter),
+            group_size=group_size,
+            max_concurrency=max_concurrency,
+            min_confident=min_confident,
+        )
+        
+        logger.info(
+            "Map-reduce answerer created",
+            retriever_k=k,
+            group_size=group_size,
+            max_concurrency=max_concurrency,
+        )
+        
+        return answerer
+    
+    def answer_question(
+        self,
+        qa_chain: RetrievalQA,
+        question: str,
+        summary_index: Optional[SummaryIndex] = None,
+    ) -> str:
         """Answer a question using the RAG chain.
         
+        Broad questions about whole documents are answered from the summary
+        index when one is given, instead of from a few retrieved chunks.
+        
         Args:
             qa_chain: The RetrievalQA chain to use
             question: Question to answer
+            summary_index: Precomputed document summaries (or None to always
+                use retrieval)
             
         Returns:
             Answer to the question
@@ -106,13 +354,21 @@ Answer:
         logger.info("Processing question", question=question)
         
         try:
-            result = qa_chain(question)
-            answer = result["result"]
+            level = summary_level(question) if summary_index else None
+            if summary_index is not None and level is not None:
+                prompt = self.summary_prompt.format(
+                    context=summary_index.context(level), question=question
+                )
+                answer = self.llm.invoke(prompt)
+            else:
+                result = qa_chain(question)
+                answer = result["result"]
             
             logger.info(
                 "Question answered", 
                 question=question, 
-                answer_length=len(answer)
+                answer_length=len(answer),
+                route=f"summary:{level}" if level else "retrieval",
             )
             
             return answer
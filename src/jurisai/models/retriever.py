@@ -0,0 +1,218 @@
+"""Retriever module.
+
+This module provides the retriever used by the RAG chain. Query vectors are
+kept in an LRU cache, and concurrent cache misses are micro-batched into a
+single encoder call so retrieval cost is amortized under load.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from langchain.schema import Document
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def stable_order(documents: List[Document]) -> List[Document]:
+    """Sort retrieved documents into a canonical order.
+
+    Documents are ordered by source, page and text instead of by score, so
+    the same chunks always produce the same prompt text and the prompt
+    prefix can be reused by the model server.
+
+    Args:
+        documents: Retrieved documents
+
+    Returns:
+        The documents sorted by (source, page, text)
+    """
+
+    def key(doc: Document) -> Tuple[str, int, str]:
+        page = doc.metadata.get("page")
+        return (
+            str(doc.metadata.get("source", "")),
+            page if isinstance(page, int) else -1,
+            doc.page_content,
+        )
+
+    return sorted(documents, key=key)
+
+
+class QueryEncoder:
+    """Encode queries with an LRU cache and micro-batching."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_size: int = 1024,
+        batch_window_ms: float = 5.0,
+        max_batch_size: int = 32,
+        batch_encode: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    ):
+        """Initialize the query encoder.
+
+        Args:
+            embeddings: Embeddings model used to encode queries
+            cache_size: Maximum number of query vectors kept in the cache
+            batch_window_ms: Time the first query of a batch waits for others
+            max_batch_size: Batch size that triggers encoding immediately
+            batch_encode: Function encoding a list of queries at once (defaults
+                to ``embeddings.embed_query`` on each query, which is what FAISS
+                uses; pass ``embeddings.embed_documents`` to encode a batch in
+                one call for models that embed queries and documents alike)
+        """
+        self.embeddings = embeddings
+        self.cache_size = cache_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._batch_encode = batch_encode or self._embed_queries
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._batch: Dict[str, "Future[List[float]]"] = {}
+        self._batch_full = threading.Event()
+        self._collecting = False
+        self._stats = {"hits": 0, "misses": 0, "batches": 0, "encoded": 0}
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Encode queries one by one with the model's query embedding.
+
+        Models such as e5, bge or instructor prefix queries differently from
+        documents, so embed_documents would not match the vectors of
+        embed_query.
+        """
+        return [self.embeddings.embed_query(query) for query in queries]
+
+    def encode(self, query: str) -> List[float]:
+        """Return the embedding vector for a query.
+
+        Args:
+            query: Query text
+
+        Returns:
+            Query embedding vector
+        """
+        with self._lock:
+            vector = self._cache.get(query)
+            if vector is not None:
+                self._cache.move_to_end(query)
+                self._stats["hits"] += 1
+                return vector
+
+            self._stats["misses"] += 1
+            future = self._batch.get(query)
+            leader = False
+            if future is None:
+                future = Future()
+                self._batch[query] = future
+                if not self._collecting:
+                    self._collecting = True
+                    self._batch_full.clear()
+                    leader = True
+                elif len(self._batch) >= self.max_batch_size:
+                    self._batch_full.set()
+
+        if leader:
+            self._encode_batch()
+
+        return future.result()
+
+    def _encode_batch(self) -> None:
+        """Collect concurrent queries for one window and encode them together."""
+        self._batch_full.wait(timeout=self.batch_window)
+
+        with self._lock:
+            batch = self._batch
+            self._batch = {}
+            self._collecting = False
+
+        queries = list(batch)
+        try:
+            vectors = self._batch_encode(queries)
+        except Exception as e:
+            logger.error("Query encoding failed", queries=len(queries), error=str(e))
+            for future in batch.values():
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["encoded"] += len(queries)
+            for query, vector in zip(queries, vectors):
+                self._cache[query] = list(vector)
+                self._cache.move_to_end(query)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        for query, vector in zip(queries, vectors):
+            batch[query].set_result(list(vector))
+
+        logger.debug("Query batch encoded", batch_size=len(queries))
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache and batching statistics.
+
+        Returns:
+            Counts of cache hits, misses, encoder batches and encoded queries
+        """
+        with self._lock:
+            return {**self._stats, "cached": len(self._cache)}
+
+
+class CachedQueryRetriever(BaseRetriever):
+    """Vector store retriever that encodes queries through a QueryEncoder."""
+
+    vector_store: VectorStore
+    encoder: QueryEncoder
+    search_kwargs: Dict[str, Any] = {"k": 4}
+    # Return documents in stable_order rather than by score
+    canonical_order: bool = False
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Retrieve documents relevant to a query.
+
+        Args:
+            query: Query text
+            run_manager: Callback manager for the run
+
+        Returns:
+            Most similar documents from the vector store
+        """
+        vector = self.encoder.encode(query)
+        documents = self.vector_store.similarity_search_by_vector(
+            vector, **self.search_kwargs
+        )
+        return stable_order(documents) if self.canonical_order else documents
+
+    def search_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """Retrieve documents relevant to a query along with their scores.
+
+        Args:
+            query: Query text
+
+        Returns:
+            List of (document, distance) tuples
+        """
+        vector = self.encoder.encode(query)
+        # Implemented by FAISS and the stores wrapping it, not by VectorStore
+        vector_store: Any = self.vector_store
+        results: List[Tuple[Document, float]] = (
+            vector_store.similarity_search_with_score_by_vector(
+                vector, **self.search_kwargs
+            )
+        )
+        return results
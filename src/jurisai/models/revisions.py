@@ -0,0 +1,226 @@
+"""Document revision tracking module.
+
+This module tracks per-page and per-chunk content hashes for each document id
+so a new version of a document only re-extracts and re-embeds the pages that
+changed, and the existing vector store is patched instead of rebuilt.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def chunk_hash(text: str) -> str:
+    """Hash the text of a chunk.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Hex SHA-256 digest of the text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ChunkRecord:
+    """A chunk stored in the vector store for a document page."""
+
+    id: str
+    hash: str
+
+
+@dataclass
+class DocumentRevision:
+    """Indexed state of one version of a document."""
+
+    document_id: str
+    version: int
+    page_hashes: List[str]
+    page_chunks: Dict[int, List[ChunkRecord]] = field(default_factory=dict)
+
+    def chunk_ids(self) -> List[str]:
+        """Return the ids of every chunk of this revision."""
+        return [chunk.id for chunks in self.page_chunks.values() for chunk in chunks]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentRevision":
+        """Create a revision from its dictionary representation."""
+        return cls(
+            document_id=data["document_id"],
+            version=data["version"],
+            page_hashes=data["page_hashes"],
+            page_chunks={
+                int(page): [ChunkRecord(**chunk) for chunk in chunks]
+                for page, chunks in data["page_chunks"].items()
+            },
+        )
+
+
+@dataclass
+class RevisionPlan:
+    """Pages of a new document version grouped by what must happen to them."""
+
+    unchanged_pages: List[int] = field(default_factory=list)
+    moved_pages: Dict[int, int] = field(default_factory=dict)
+    changed_pages: List[int] = field(default_factory=list)
+    removed_pages: List[int] = field(default_factory=list)
+
+
+@dataclass
+class RevisionDiff:
+    """Report of what changed when a document version was indexed."""
+
+    document_id: str
+    version: int
+    unchanged_pages: List[int] = field(default_factory=list)
+    moved_pages: List[int] = field(default_factory=list)
+    changed_pages: List[int] = field(default_factory=list)
+    removed_pages: List[int] = field(default_factory=list)
+    added_chunks: int = 0
+    removed_chunks: int = 0
+    reused_chunks: int = 0
+    embedded_chunks: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return asdict(self)
+
+
+def plan_revision(
+    previous: Optional[DocumentRevision], page_hashes: List[str]
+) -> RevisionPlan:
+    """Compare the pages of a new version against the indexed revision.
+
+    A page whose hash was already indexed is unchanged if it kept its
+    position and moved otherwise. Every other page has to be extracted again.
+
+    Args:
+        previous: Indexed revision of the document, if any
+        page_hashes: Fingerprint of each page of the new version
+
+    Returns:
+        Plan grouping the new pages (and the removed old pages)
+    """
+    plan = RevisionPlan()
+    if previous is None:
+        plan.changed_pages = list(range(len(page_hashes)))
+        return plan
+
+    old_positions: Dict[str, List[int]] = {}
+    for position, page_hash in enumerate(previous.page_hashes):
+        old_positions.setdefault(page_hash, []).append(position)
+
+    claimed = set()
+    for position, page_hash in enumerate(page_hashes):
+        candidates = [p for p in old_positions.get(page_hash, []) if p not in claimed]
+        if not candidates:
+            plan.changed_pages.append(position)
+            continue
+
+        # Prefer the page at the same position so duplicates stay in place
+        old_position = position if position in candidates else candidates[0]
+        claimed.add(old_position)
+        if old_position == position:
+            plan.unchanged_pages.append(position)
+        else:
+            plan.moved_pages[position] = old_position
+
+    plan.removed_pages = [
+        p for p in range(len(previous.page_hashes)) if p not in claimed
+    ]
+    return plan
+
+
+class RevisionTracker:
+    """Keep the indexed revision of each document, optionally on disk."""
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the tracker.
+
+        Args:
+            path: JSON file to persist revisions to (or None to keep them in memory)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._revisions: Dict[str, DocumentRevision] = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._revisions = {
+                    doc_id: DocumentRevision.from_dict(data)
+                    for doc_id, data in json.load(f).items()
+                }
+
+    def get(self, document_id: str) -> Optional[DocumentRevision]:
+        """Return the indexed revision of a document.
+
+        Args:
+            document_id: Document identifier
+
+        Returns:
+            The revision, or None if the document was never indexed
+        """
+        with self._lock:
+            return self._revisions.get(document_id)
+
+    def document_ids(self) -> List[str]:
+        """Return the ids of every tracked document."""
+        with self._lock:
+            return list(self._revisions)
+
+    def set(self, revision: DocumentRevision) -> None:
+        """Record the indexed revision of a document.
+
+        Args:
+            revision: Revision that is now in the vector store
+        """
+        with self._lock:
+            self._revisions[revision.document_id] = revision
+            self._write()
+
+    def remove(self, document_id: str) -> Optional[DocumentRevision]:
+        """Forget a document.
+
+        Args:
+            document_id: Document identifier
+
+        Returns:
+            The removed revision, if any
+        """
+        with self._lock:
+            revision = self._revisions.pop(document_id, None)
+            self._write()
+        return revision
+
+    def save(self) -> None:
+        """Write the revisions to disk if a path is configured."""
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        """Write the revisions to disk if a path is configured.
+
+        Must be called with the lock held, so concurrent writers do not share
+        the temporary file.
+        """
+        if self.path is None:
+            return
+        data = {doc_id: rev.to_dict() for doc_id, rev in self._revisions.items()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,294 @@
+"""Model routing module.
+
+This module picks the model that answers each question. A cheap local
+classifier rates how complex a question is: short factual lookups go to the
+smallest model and analytical questions to larger ones. Each candidate's
+latency is then predicted from its observed generation times and its current
+queue depth, and a model predicted to miss the latency SLO is passed over in
+favour of one that meets it, so p95 latency stays under the SLO under load.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM, BaseLLM
+
+from src.jurisai.models.llm_scheduler import (
+    PRIORITY_NORMAL,
+    LLMScheduler,
+    generation_variant,
+)
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Complexity at or above which a question counts as analytical
+ANALYTICAL_THRESHOLD = 0.5
+
+DEFAULT_SLO_S = 10.0
+SLO_ENV_VAR = "JURISAI_LATENCY_SLO_S"
+
+_ANALYTICAL_PATTERN = re.compile(
+    r"\b(why|how (?:does|do|would|could|should|might)|explain|analy[sz]e|compare|"
+    r"contrast|differ(?:ence|ent)?|implications?|consequences?|risks?|assess|"
+    r"evaluate|interpret|enforceable|reasonable|advantages?|disadvantages?|"
+    r"summari[sz]e|overview|relationship|what if|whether)\b",
+    re.IGNORECASE,
+)
+_LOOKUP_PATTERN = re.compile(
+    r"^\s*(who|when|where|what (?:is|are|was|were) the|which|how (?:much|many|long)|"
+    r"is there|does|is|are)\b",
+    re.IGNORECASE,
+)
+_QUESTION_PATTERN = re.compile(r"Question:\s*(.*?)\s*(?:Answer:|$)", re.DOTALL)
+
+
+def extract_question(prompt: str) -> str:
+    """Return the part of a prompt that states the task.
+
+    Args:
+        prompt: Full prompt, possibly with retrieved context
+
+    Returns:
+        The text after the last "Question:" marker, or the first line of the
+        prompt when there is none
+    """
+    matches = _QUESTION_PATTERN.findall(prompt)
+    if matches:
+        return str(matches[-1])
+    for line in prompt.splitlines():
+        if line.strip():
+            return line.strip()
+    return ""
+
+
+def question_complexity(question: str) -> float:
+    """Rate how much reasoning a question needs.
+
+    Args:
+        question: Question text
+
+    Returns:
+        Score between 0 (factual lookup) and 1 (analytical)
+    """
+    words = len(question.split())
+    cues = len(_ANALYTICAL_PATTERN.findall(question))
+    score = min(words / 40, 0.3) + 0.4 * min(cues, 2)
+    # Several questions or clauses in one
+    score += 0.1 * min(max(question.count("?") - 1, 0) + question.count(";"), 2)
+    if not cues and words <= 12 and _LOOKUP_PATTERN.match(question):
+        score -= 0.2
+    return max(0.0, min(score, 1.0))
+
+
+class ModelRouter:
+    """Route questions to models by complexity and predicted latency."""
+
+    def __init__(
+        self,
+        models: List[str],
+        slo_s: Optional[float] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        window: int = 200,
+    ):
+        """Initialize the router.
+
+        Args:
+            models: Candidate model names, from smallest to largest
+            slo_s: Target p95 latency of a generation in seconds (defaults
+                to $JURISAI_LATENCY_SLO_S or 10 seconds)
+            scheduler: Scheduler whose queues the models are served from (or
+                None to ignore queueing)
+            window: Number of recent latencies kept per model
+        """
+        if not models:
+            raise ValueError("At least one model is required")
+        self.models = list(models)
+        if slo_s is None:
+            slo_s = float(os.environ.get(SLO_ENV_VAR) or DEFAULT_SLO_S)
+        self.slo_s = slo_s
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._service: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+        self._latency: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+        self._routed: Dict[str, int] = defaultdict(int)
+        self._fallbacks = 0
+
+    @staticmethod
+    def _p95(values: Iterable[float]) -> float:
+        """Return the 95th percentile of a window (0 if empty)."""
+        ordered = sorted(values)
+        return ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0
+
+    def record(self, model: str, service_s: float, latency_s: float) -> None:
+        """Record a finished generation.
+
+        Args:
+            model: Model that generated
+            service_s: Time spent generating
+            latency_s: Time from request to answer, including queueing
+        """
+        with self._lock:
+            self._service[model].append(service_s)
+            self._latency[model].append(latency_s)
+
+    def predicted_latency(self, model: str) -> float:
+        """Predict the latency of a request sent to a model now.
+
+        Models without observations are predicted to be instant, so each gets
+        tried before its latency is known.
+
+        Args:
+            model: Model name
+
+        Returns:
+            Predicted seconds until the answer
+        """
+        with self._lock:
+            service = self._p95(self._service[model])
+        if self.scheduler is None:
+            return service
+        depth = self.scheduler.queue_depth(model)
+        limit = self.scheduler.limit_for(model)
+        # Queued and running requests ahead of this one, plus this one
+        return service * math.ceil((depth + 1) / limit)
+
+    def route(self, question: str) -> str:
+        """Pick the model for a question.
+
+        Lookups prefer the smallest model and analytical questions the
+        largest; the first preferred model predicted to meet the SLO is used,
+        or the fastest model if none is.
+
+        Args:
+            question: Question (or task) text
+
+        Returns:
+            Name of the chosen model
+        """
+        complexity = question_complexity(question)
+        analytical = complexity >= ANALYTICAL_THRESHOLD
+        preferred = list(reversed(self.models)) if analytical else self.models
+        predictions = {model: self.predicted_latency(model) for model in self.models}
+
+        meeting = [m for m in preferred if predictions[m] <= self.slo_s]
+        fallback = not meeting
+        if meeting:
+            chosen = meeting[0]
+        else:
+            chosen = min(self.models, key=lambda m: predictions[m])
+
+        with self._lock:
+            self._routed[chosen] += 1
+            self._fallbacks += fallback
+
+        logger.info(
+            "Question routed",
+            model=chosen,
+            complexity=round(complexity, 2),
+            analytical=analytical,
+            predicted_s=round(predictions[chosen], 2),
+            slo_fallback=fallback,
+        )
+        return chosen
+
+    def stats(self) -> Dict[str, Any]:
+        """Return routing statistics.
+
+        Returns:
+            Overall p95 latency against the SLO, the number of SLO fallbacks
+            and per-model request counts and latencies
+        """
+        with self._lock:
+            every = [v for values in self._latency.values() for v in values]
+            return {
+                "slo_s": self.slo_s,
+                "p95_s": self._p95(every),
+                "fallbacks": self._fallbacks,
+                "models": {
+                    model: {
+                        "routed": self._routed[model],
+                        "service_p95_s": self._p95(self._service[model]),
+                        "latency_p95_s": self._p95(self._latency[model]),
+                    }
+                    for model in self.models
+                },
+            }
+
+
+class RoutedLLM(LLM):
+    """LangChain LLM that sends each prompt to the model picked by a router."""
+
+    router: ModelRouter
+    llms: Dict[str, BaseLLM]
+    session_id: str = "default"
+    priority: int = PRIORITY_NORMAL
+
+    @property
+    def _llm_type(self) -> str:
+        """Return the type of this LLM."""
+        return "routed"
+
+    @property
+    def model_name(self) -> str:
+        """Return an identifier of the candidate models."""
+        return "auto:" + ",".join(self.router.models)
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Generate text with the routed model.
+
+        Args:
+            prompt: Prompt to generate from
+            stop: Optional stop words
+            run_manager: Callback manager for the run
+            **kwargs: Extra generation arguments passed to the model
+
+        Returns:
+            Generated text
+        """
+        model = self.router.route(extract_question(prompt))
+        llm = self.llms[model]
+        service: List[float] = []
+
+        def generate() -> str:
+            start = time.perf_counter()
+            try:
+                return llm.invoke(prompt, stop=stop, **kwargs)
+            finally:
+                service.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scheduler = self.router.scheduler
+        if scheduler is None:
+            text = generate()
+        else:
+            text = scheduler.run(
+                model,
+                prompt,
+                generate,
+                session_id=self.session_id,
+                priority=self.priority,
+                variant=generation_variant(llm, stop, kwargs),
+            )
+        latency = time.perf_counter() - start
+        # Coalesced requests share another request's generation
+        self.router.record(model, service[0] if service else latency, latency)
+        return text
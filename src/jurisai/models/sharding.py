@@ -0,0 +1,555 @@
+"""Sharded vector store module.
+
+This module splits a corpus over several FAISS indexes. Chunks are assigned
+to shards by document or by chunk id hash, queries fan out to every shard in
+parallel (threads, or worker processes that keep their shard indexes loaded)
+and the per-shard top-k lists are merged. Shards can be rebalanced to a new
+shard count without re-embedding.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import heapq
+import os
+import threading
+import uuid
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain.schema import Document
+
+from src.jurisai.models.docstore import INDEX_FILE
+from src.jurisai.models.vector_index import create_faiss_index, index_dtype
+from src.jurisai.models.metadata_index import FilteredFAISS
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+PARTITIONS = ("document", "hash")
+
+# Shard indexes loaded by each worker process, keyed by path
+_worker_indexes: Dict[str, Tuple[Tuple[int, int], faiss.Index]] = {}
+
+
+def _search_shard_file(
+    path: str, vector: List[float], k: int
+) -> Tuple[List[float], List[int]]:
+    """Search a shard index saved on disk.
+
+    Runs in a worker process, which keeps every shard index it has loaded
+    until the file on disk changes.
+
+    Args:
+        path: Directory the shard was saved to
+        vector: Query vector
+        k: Number of results
+
+    Returns:
+        Tuple of distances and FAISS row positions
+    """
+    index_path = os.path.join(path, INDEX_FILE)
+    stat = os.stat(index_path)
+    version = (stat.st_ino, stat.st_mtime_ns)
+    cached = _worker_indexes.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, faiss.read_index(index_path))
+        _worker_indexes[path] = cached
+
+    query = np.asarray([vector], dtype=np.float32)
+    distances, positions = cached[1].search(query, k)
+    return distances[0].tolist(), positions[0].tolist()
+
+
+def shard_key(partition: str, doc_id: str, metadata: Dict[str, Any]) -> str:
+    """Return the value a chunk is partitioned on.
+
+    Args:
+        partition: Partitioning scheme, "document" or "hash"
+        doc_id: Chunk id
+        metadata: Chunk metadata
+
+    Returns:
+        Key hashed to pick the shard
+    """
+    if partition == "document":
+        return str(metadata.get("source", doc_id))
+    return doc_id
+
+
+def shard_for(key: str, num_shards: int) -> int:
+    """Map a partition key to a shard number with a stable hash.
+
+    Args:
+        key: Partition key
+        num_shards: Number of shards
+
+    Returns:
+        Shard number
+    """
+    return zlib.crc32(key.encode("utf-8")) % num_shards
+
+
+class ShardedVectorStore(VectorStore):
+    """Vector store that scatters queries over several FAISS shards."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        shards: List[FAISS],
+        partition: str = "document",
+        executor: str = "thread",
+        max_workers: Optional[int] = None,
+        shard_dir: Optional[str] = None,
+    ):
+        """Initialize the sharded vector store.
+
+        Args:
+            embeddings: Embeddings model for queries and new texts
+            shards: FAISS vector store of each shard
+            partition: How chunks are assigned to shards, "document" or "hash"
+            executor: Where shard searches run, "thread" or "process"
+            max_workers: Number of search workers (defaults to the shard count)
+            shard_dir: Directory shards are saved to for worker processes
+                (required for the "process" executor)
+        """
+        if partition not in PARTITIONS:
+            raise ValueError(
+                f"Unknown partition '{partition}', expected one of {PARTITIONS}"
+            )
+        if executor not in ("thread", "process"):
+            raise ValueError(
+                f"Unknown executor '{executor}', expected 'thread' or 'process'"
+            )
+        if executor == "process" and shard_dir is None:
+            raise ValueError("shard_dir is required for the process executor")
+
+        self._embeddings = embeddings
+        self.shards = shards
+        self.partition = partition
+        self.executor_type = executor
+        self.max_workers = max_workers
+        self.shard_dir = shard_dir
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.RLock()
+        self._dirty = True
+
+        logger.info(
+            "Sharded vector store created",
+            shards=len(shards),
+            partition=partition,
+            executor=executor,
+            vectors=self.ntotal,
+        )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Return the embeddings model."""
+        return self._embeddings
+
+    @property
+    def ntotal(self) -> int:
+        """Return the number of vectors over all shards."""
+        return sum(int(shard.index.ntotal) for shard in self.shards)
+
+    def shard_sizes(self) -> List[int]:
+        """Return the number of vectors in each shard."""
+        return [int(shard.index.ntotal) for shard in self.shards]
+
+    def _pool(self, processes: bool) -> Executor:
+        """Return the executor running shard searches.
+
+        Args:
+            processes: Whether to return the worker process pool
+
+        Returns:
+            Process or thread pool sized to the shard count
+        """
+        workers = self.max_workers or len(self.shards)
+        if processes:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=workers)
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="shard-search"
+            )
+        return self._thread_pool
+
+    def _shard_path(self, number: int) -> str:
+        """Return the directory a shard is saved to."""
+        if self.shard_dir is None:
+            raise ValueError("Shards are only saved with a shard_dir")
+        return os.path.join(self.shard_dir, f"shard-{number:03d}")
+
+    def sync(self) -> None:
+        """Save changed shard indexes so worker processes see the current data.
+
+        Workers only search the FAISS indexes; documents are looked up in this
+        process, so the docstores are not written.
+        """
+        with self._lock:
+            if self.shard_dir is None or not self._dirty:
+                return
+            for number, shard in enumerate(self.shards):
+                path = self._shard_path(number)
+                os.makedirs(path, exist_ok=True)
+                tmp_path = os.path.join(path, f"{INDEX_FILE}.tmp")
+                faiss.write_index(shard.index, tmp_path)
+                os.replace(tmp_path, os.path.join(path, INDEX_FILE))
+            self._dirty = False
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Any] = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Search every shard in parallel and merge the results.
+
+        Args:
+            embedding: Query vector
+            k: Number of documents to return
+            filter: Metadata filter passed to each shard (filtered searches
+                always run on threads)
+            fetch_k: Documents fetched per shard before filtering
+            **kwargs: Extra arguments passed to each shard search
+
+        Returns:
+            The k closest documents over all shards with their L2 distances
+        """
+        with self._lock:
+            shards = list(self.shards)
+            use_processes = self.executor_type == "process" and filter is None
+            if use_processes:
+                self.sync()
+
+        pool = self._pool(use_processes)
+        if use_processes:
+            score_threshold = kwargs.get("score_threshold")
+            futures = [
+                pool.submit(_search_shard_file, self._shard_path(n), embedding, k)
+                for n in range(len(shards))
+            ]
+            results: List[Tuple[Document, float]] = []
+            for shard, future in zip(shards, futures):
+                distances, positions = future.result()
+                for distance, position in zip(distances, positions):
+                    if position < 0:
+                        continue
+                    if score_threshold is not None and distance > score_threshold:
+                        continue
+                    doc = shard.docstore.search(shard.index_to_docstore_id[position])
+                    if isinstance(doc, Document):
+                        results.append((doc, float(distance)))
+        else:
+            shard_futures = [
+                pool.submit(
+                    shard.similarity_search_with_score_by_vector,
+                    embedding,
+                    k,
+                    filter=filter,
+                    fetch_k=fetch_k,
+                    **kwargs,
+                )
+                for shard in shards
+            ]
+            results = [pair for future in shard_futures for pair in future.result()]
+
+        return heapq.nsmallest(k, results, key=lambda pair: pair[1])
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        """Return the documents closest to a query vector.
+
+        Args:
+            embedding: Query vector
+            k: Number of documents to return
+            **kwargs: Extra search arguments
+
+        Returns:
+            The k closest documents over all shards
+        """
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score_by_vector(
+                embedding, k, **kwargs
+            )
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        """Return the documents closest to a query.
+
+        Args:
+            query: Query text
+            k: Number of documents to return
+            **kwargs: Extra search arguments
+
+        Returns:
+            The k closest documents over all shards
+        """
+        return self.similarity_search_by_vector(
+            self._embeddings.embed_query(query), k, **kwargs
+        )
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the documents closest to a query with their distances."""
+        return self.similarity_search_with_score_by_vector(
+            self._embeddings.embed_query(query), k, **kwargs
+        )
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add pre-computed embeddings, routing each to its shard.
+
+        Args:
+            text_embeddings: Pairs of text and vector
+            metadatas: Metadata of each text
+            ids: Ids of each text (or None for random ids)
+
+        Returns:
+            Ids of the added texts
+        """
+        pairs = list(text_embeddings)
+        metadatas = metadatas or [{} for _ in pairs]
+        ids = ids or [str(uuid.uuid4()) for _ in pairs]
+
+        groups: Dict[int, List[int]] = {}
+        for i, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+            key = shard_key(self.partition, doc_id, metadata)
+            groups.setdefault(shard_for(key, len(self.shards)), []).append(i)
+
+        with self._lock:
+            for number, positions in groups.items():
+                self.shards[number].add_embeddings(
+                    [pairs[i] for i in positions],
+                    [metadatas[i] for i in positions],
+                    ids=[ids[i] for i in positions],
+                )
+            self._dirty = True
+
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed texts and add them to their shards.
+
+        Args:
+            texts: Texts to add
+            metadatas: Metadata of each text
+            ids: Ids of each text (or None for random ids)
+            **kwargs: Unused
+
+        Returns:
+            Ids of the added texts
+        """
+        texts = list(texts)
+        vectors = self._embeddings.embed_documents(texts)
+        return self.add_embeddings(zip(texts, vectors), metadatas, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete chunks from whichever shards hold them.
+
+        Args:
+            ids: Ids of the chunks to delete
+            **kwargs: Unused
+
+        Returns:
+            True if the chunks were deleted
+
+        Raises:
+            ValueError: If some ids are not stored; nothing is deleted then
+        """
+        if not ids:
+            raise ValueError("No ids provided to delete.")
+
+        remaining = set(ids)
+        with self._lock:
+            found = []
+            for shard in self.shards:
+                held = remaining.intersection(shard.index_to_docstore_id.values())
+                found.append(held)
+                remaining -= held
+            if remaining:
+                raise ValueError(
+                    f"Some specified ids do not exist: {sorted(remaining)}"
+                )
+
+            for shard, held in zip(self.shards, found):
+                if held:
+                    shard.delete(list(held))
+            self._dirty = True
+        return True
+
+    def _entries(self) -> List[Tuple[str, Document, np.ndarray]]:
+        """Return every stored chunk with its id and stored vector."""
+        entries = []
+        for shard in self.shards:
+            for position, doc_id in shard.index_to_docstore_id.items():
+                doc = shard.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    entries.append((doc_id, doc, shard.index.reconstruct(position)))
+        return entries
+
+    def rebalance(
+        self, num_shards: Optional[int] = None, partition: Optional[str] = None
+    ) -> None:
+        """Redistribute the stored vectors over a new set of shards.
+
+        Vectors are read back from the shard indexes, so nothing is embedded
+        again.
+
+        Args:
+            num_shards: New shard count (defaults to the current count)
+            partition: New partitioning scheme (defaults to the current one)
+        """
+        with self._lock:
+            num_shards = num_shards or len(self.shards)
+            partition = partition or self.partition
+            dtype = index_dtype(self.shards[0].index)
+            entries = self._entries()
+
+            self.partition = partition
+            self.shards = build_shards(
+                self._embeddings,
+                [doc for _, doc, _ in entries],
+                np.asarray([vector for _, _, vector in entries], dtype=np.float32),
+                num_shards,
+                partition,
+                dtype,
+                ids=[doc_id for doc_id, _, _ in entries],
+                dimension=int(self.shards[0].index.d),
+            )
+            self._dirty = True
+
+        # Pools sized to the old shard count are recreated on the next search
+        if self.max_workers is None:
+            self.close()
+
+        logger.info(
+            "Shards rebalanced",
+            shards=num_shards,
+            partition=partition,
+            sizes=self.shard_sizes(),
+        )
+
+    def close(self) -> None:
+        """Shut down the search workers."""
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        self._thread_pool = None
+        self._process_pool = None
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        num_shards: int = 2,
+        partition: str = "document",
+        **kwargs: Any,
+    ) -> "ShardedVectorStore":
+        """Build a sharded vector store from texts.
+
+        Args:
+            texts: Texts to index
+            embedding: Embeddings model
+            metadatas: Metadata of each text
+            ids: Ids of each text (or None for random ids)
+            num_shards: Number of shards
+            partition: How chunks are assigned to shards
+            **kwargs: Extra arguments for the ShardedVectorStore constructor
+
+        Returns:
+            Sharded vector store holding the texts
+        """
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas)
+        ]
+        vectors = np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32)
+        shards = build_shards(
+            embedding, documents, vectors, num_shards, partition, ids=ids
+        )
+        return cls(embedding, shards, partition=partition, **kwargs)
+
+
+def build_shards(
+    embeddings: Embeddings,
+    documents: List[Document],
+    vectors: np.ndarray,
+    num_shards: int,
+    partition: str = "document",
+    dtype: str = "float32",
+    ids: Optional[List[str]] = None,
+    dimension: Optional[int] = None,
+) -> List[FAISS]:
+    """Partition embedded chunks into FAISS shards.
+
+    Args:
+        embeddings: Embeddings model for queries
+        documents: Chunks to index
+        vectors: Embedding vector of each chunk
+        num_shards: Number of shards
+        partition: How chunks are assigned to shards, "document" or "hash"
+        dtype: Vector storage type of the shard indexes
+        ids: Ids of each chunk (or None for random ids)
+        dimension: Vector dimension, needed when there are no vectors
+
+    Returns:
+        FAISS vector store of each shard
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be at least 1")
+
+    ids = ids or [str(uuid.uuid4()) for _ in documents]
+    dimension = dimension or vectors.shape[1]
+
+    groups: List[List[int]] = [[] for _ in range(num_shards)]
+    for i, (doc_id, doc) in enumerate(zip(ids, documents)):
+        key = shard_key(partition, doc_id, doc.metadata)
+        groups[shard_for(key, num_shards)].append(i)
+
+    shards: List[FAISS] = []
+    for positions in groups:
+        # Every shard shares a quantizer trained on the full corpus
+        shard = FilteredFAISS(
+            embedding_function=embeddings,
+            index=create_faiss_index(dimension, dtype, vectors),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+        if positions:
+            shard.add_embeddings(
+                [(documents[i].page_content, vectors[i].tolist()) for i in positions],
+                [documents[i].metadata for i in positions],
+                ids=[ids[i] for i in positions],
+            )
+        shards.append(shard)
+
+    return shards
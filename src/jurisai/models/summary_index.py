@@ -0,0 +1,462 @@
+"""Hierarchical summary index module.
+
+This module precomputes a summary tree for ingested documents: chunk
+summaries are rolled up into section summaries and section summaries into a
+document summary. Summaries are generated in parallel and cached by content
+hash, so broad questions ("summarize this agreement", "list all
+obligations") are answered from a few precomputed summaries instead of a
+prompt stuffed with many chunks.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from langchain_core.language_models import BaseLanguageModel
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SUMMARY_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "jurisai", "summaries"
+)
+
+CHUNK_PROMPT = """Summarize this excerpt of a legal document in at most 3 sentences.
+Keep the parties, obligations, amounts and dates it mentions.
+
+Excerpt:
+{text}
+
+Summary:"""
+
+SECTION_PROMPT = """Combine these summaries of consecutive parts of "{title}"
+into one summary of at most 5 sentences. Keep every obligation, amount and date.
+
+Summaries:
+{text}
+
+Summary:"""
+
+DOCUMENT_PROMPT = """Combine these section summaries of "{title}" into a summary
+of the whole document: its purpose, the parties and their main obligations.
+
+Section summaries:
+{text}
+
+Summary:"""
+
+# Longest summary context put into a prompt (about 3k tokens), so broad
+# questions fit the model's context window like retrieved chunks do
+DEFAULT_MAX_CONTEXT_CHARS = 12000
+
+# Questions about a whole document rather than a specific passage
+_BROAD_PATTERN = re.compile(
+    r"\b(summar\w*|overview|outline|gist|key (?:terms|points|provisions)|"
+    r"main (?:points|terms|provisions)|what is (?:this|the) (?:document|agreement|"
+    r"contract) about|(?:list|identify|enumerate) (?:all|every|each)|"
+    r"all (?:the )?(?:obligations|terms|provisions|parties|deadlines|clauses)|"
+    r"whole (?:document|agreement|contract)|entire (?:document|agreement|contract))\b",
+    re.IGNORECASE,
+)
+# Broad questions that need per-section detail rather than one overview
+_DETAIL_PATTERN = re.compile(r"\b(list|all|every|each|enumerate|identify)\b", re.I)
+
+
+def summary_level(question: str) -> Optional[str]:
+    """Decide whether a question should be answered from the summary index.
+
+    Args:
+        question: User question
+
+    Returns:
+        "section" for broad questions that enumerate details, "document" for
+        other broad questions, or None for questions that need retrieval
+    """
+    if not _BROAD_PATTERN.search(question):
+        return None
+    return "section" if _DETAIL_PATTERN.search(question) else "document"
+
+
+@dataclass
+class SectionSummary:
+    """Summary of one section of a document."""
+
+    title: str
+    pages: List[int]
+    summary: str
+    chunk_summaries: List[str] = field(default_factory=list)
+
+
+@dataclass
+class DocumentSummary:
+    """Summary tree of one document."""
+
+    source: str
+    summary: str
+    sections: List[SectionSummary] = field(default_factory=list)
+
+
+class SummaryIndex:
+    """Precomputed document and section summaries keyed by source."""
+
+    def __init__(self, documents: Optional[Dict[str, DocumentSummary]] = None):
+        """Initialize the summary index.
+
+        Args:
+            documents: Summary tree of each document, keyed by source
+        """
+        self.documents: Dict[str, DocumentSummary] = documents or {}
+
+    def __len__(self) -> int:
+        """Return the number of summarized documents."""
+        return len(self.documents)
+
+    def context(
+        self,
+        level: str,
+        sources: Optional[List[str]] = None,
+        max_chars: int = DEFAULT_MAX_CONTEXT_CHARS,
+    ) -> str:
+        """Return the summaries of a level formatted as prompt context.
+
+        The budget is shared evenly between the documents; what a short
+        document leaves unused goes to the others. Sections that do not fit
+        their document's share are left out, and a single summary longer
+        than the share is cut.
+
+        Args:
+            level: "document" or "section"
+            sources: Documents to include (or None for every document)
+            max_chars: Maximum length of the context
+
+        Returns:
+            Summaries with their source and section titles
+        """
+        selected: Dict[str, List[str]] = {}
+        for source, document in sorted(self.documents.items()):
+            if sources is not None and source not in sources:
+                continue
+            if level == "document":
+                selected[source] = [f"source: {source}\n{document.summary}"]
+                continue
+            selected[source] = [
+                f"source: {source}, {section.title} "
+                f"(pages {section.pages[0] + 1}-{section.pages[-1] + 1})\n"
+                f"{section.summary}"
+                for section in document.sections
+            ]
+
+        separator = "\n\n"
+        kept: Dict[str, List[str]] = {}
+        remaining, omitted = max_chars, 0
+        # Shortest documents first, so their unused share is passed on
+        by_length = sorted(selected, key=lambda s: sum(map(len, selected[s])))
+        for position, source in enumerate(by_length):
+            share = remaining // (len(by_length) - position)
+            used = 0
+            parts: List[str] = []
+            for part in selected[source]:
+                if used + len(part) > share:
+                    if not parts:
+                        parts.append(part[: max(share, 0)])
+                        used += len(parts[0])
+                    break
+                parts.append(part)
+                used += len(part) + len(separator)
+            kept[source] = parts
+            omitted += len(selected[source]) - len(parts)
+            remaining -= used
+
+        if omitted:
+            logger.info(
+                "Summary context truncated",
+                level=level,
+                omitted=omitted,
+                max_chars=max_chars,
+            )
+        return separator.join(part for source in selected for part in kept[source])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {source: asdict(doc) for source, doc in self.documents.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SummaryIndex":
+        """Create a summary index from its dictionary representation."""
+        return cls(
+            {
+                source: DocumentSummary(
+                    source=doc["source"],
+                    summary=doc["summary"],
+                    sections=[SectionSummary(**s) for s in doc["sections"]],
+                )
+                for source, doc in data.items()
+            }
+        )
+
+    def save(self, path: str) -> None:
+        """Write the summary index to a JSON file.
+
+        Args:
+            path: Target file
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SummaryIndex":
+        """Read a summary index written with save.
+
+        Args:
+            path: JSON file
+
+        Returns:
+            The summary index
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def stored_documents(vector_store: FAISS) -> List[Document]:
+    """Return the chunks of a vector store in page order.
+
+    Args:
+        vector_store: FAISS vector store
+
+    Returns:
+        Chunk documents sorted by source and page
+    """
+    found = [
+        vector_store.docstore.search(doc_id)
+        for doc_id in vector_store.index_to_docstore_id.values()
+    ]
+    documents = [doc for doc in found if isinstance(doc, Document)]
+    return sorted(
+        documents,
+        key=lambda doc: (
+            str(doc.metadata.get("source", "")),
+            doc.metadata.get("page", 0),
+        ),
+    )
+
+
+class SummaryBuilder:
+    """Build summary trees with an LLM, caching summaries by content hash."""
+
+    def __init__(
+        self,
+        llm: BaseLanguageModel,
+        cache_dir: Optional[str] = DEFAULT_SUMMARY_CACHE_DIR,
+        max_workers: int = 4,
+        fan_in: int = 8,
+    ):
+        """Initialize the summary builder.
+
+        Args:
+            llm: Model generating the summaries (any LangChain LLM, so tests and
+                offline runs can use a stub)
+            cache_dir: Directory where summaries are cached (or None to disable
+                caching)
+            max_workers: Maximum number of concurrent LLM calls
+            fan_in: Maximum number of summaries combined by one LLM call
+        """
+        self.llm = llm
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.fan_in = max(fan_in, 2)
+        self.stats = {"generated": 0, "cached": 0}
+        self._stats_lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _model_key(self) -> str:
+        """Return an identifier of the model for cache keys."""
+        llm = getattr(self.llm, "llm", self.llm)  # Unwrap ScheduledLLM
+        for attribute in ("model", "model_name"):
+            value = getattr(llm, attribute, None)
+            if isinstance(value, str):
+                return value
+        return type(llm).__name__
+
+    def _cache_path(self, prompt: str) -> Optional[str]:
+        """Return the cache file for a prompt (or None without a cache)."""
+        if not self.cache_dir:
+            return None
+        key = hashlib.sha256(f"{self._model_key()}\n{prompt}".encode("utf-8"))
+        return os.path.join(self.cache_dir, f"{key.hexdigest()}.txt")
+
+    def _summarize(self, prompt: str) -> str:
+        """Summarize with the LLM unless the prompt was summarized before."""
+        cache_path = self._cache_path(prompt)
+        if cache_path is not None and os.path.exists(cache_path):
+            with self._stats_lock:
+                self.stats["cached"] += 1
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return f.read()
+
+        response = self.llm.invoke(prompt)
+        summary = str(getattr(response, "content", response)).strip()
+        with self._stats_lock:
+            self.stats["generated"] += 1
+        if cache_path is not None:
+            with open(cache_path, "w", encoding="utf-8") as f:
+                f.write(summary)
+        return summary
+
+    def _map(self, executor: ThreadPoolExecutor, prompts: List[str]) -> List[str]:
+        """Summarize several prompts concurrently, keeping their order."""
+        return list(executor.map(self._summarize, prompts))
+
+    def _roll_up(
+        self,
+        executor: ThreadPoolExecutor,
+        groups: List[List[str]],
+        template: str,
+        titles: List[str],
+    ) -> List[str]:
+        """Combine each group of summaries into one summary.
+
+        Groups larger than fan_in are combined in several rounds, and all
+        groups advance one round at a time so their LLM calls run
+        concurrently. A group with a single summary is used as is.
+
+        Args:
+            executor: Pool running the LLM calls
+            groups: Summaries to combine, one list per output summary
+            template: Prompt with ``title`` and ``text`` placeholders
+            titles: Title of each group
+
+        Returns:
+            One combined summary per group
+        """
+        groups = [list(group) for group in groups]
+        while True:
+            prompts, owners = [], []
+            for i, group in enumerate(groups):
+                if len(group) <= 1:
+                    continue
+                for start in range(0, len(group), self.fan_in):
+                    text = "\n\n".join(group[start : start + self.fan_in])
+                    prompts.append(template.format(title=titles[i], text=text))
+                    owners.append(i)
+            if not prompts:
+                return [group[0] if group else "" for group in groups]
+
+            combined: Dict[int, List[str]] = {}
+            for owner, summary in zip(owners, self._map(executor, prompts)):
+                combined.setdefault(owner, []).append(summary)
+            for owner, summaries in combined.items():
+                groups[owner] = summaries
+
+    def _outline(
+        self, documents: List[Document]
+    ) -> List[Tuple[str, str, List[Document]]]:
+        """Group chunks into (source, section title, chunks) in document order.
+
+        Consecutive chunks with the same ``section`` metadata form a section;
+        chunks without one are grouped fan_in at a time and titled by pages.
+        """
+        groups: List[List[Any]] = []
+        for doc in documents:
+            source = str(doc.metadata.get("source", "document"))
+            title = doc.metadata.get("section")
+            last = groups[-1] if groups else None
+            if (
+                last is None
+                or last[0] != source
+                or last[1] != title
+                or (title is None and len(last[2]) >= self.fan_in)
+            ):
+                groups.append([source, title, []])
+            groups[-1][2].append(doc)
+
+        outline = []
+        for source, title, chunks in groups:
+            if title is None:
+                pages = [int(chunk.metadata.get("page", 0)) for chunk in chunks]
+                title = f"Pages {min(pages) + 1}-{max(pages) + 1}"
+            outline.append((source, title, chunks))
+        return outline
+
+    def build(self, documents: List[Document]) -> SummaryIndex:
+        """Build the summary tree of chunked documents.
+
+        Args:
+            documents: Chunks in page order, with ``source`` and (optionally)
+                ``section`` metadata
+
+        Returns:
+            Summary index with one tree per source
+        """
+        outline = self._outline(documents)
+        sources = list(dict.fromkeys(source for source, _, _ in outline))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            chunk_summaries = self._map(
+                executor,
+                [
+                    CHUNK_PROMPT.format(text=chunk.page_content.strip())
+                    for _, _, chunks in outline
+                    for chunk in chunks
+                ],
+            )
+
+            groups, start = [], 0
+            for _, _, chunks in outline:
+                groups.append(chunk_summaries[start : start + len(chunks)])
+                start += len(chunks)
+            section_summaries = self._roll_up(
+                executor, groups, SECTION_PROMPT, [title for _, title, _ in outline]
+            )
+
+            per_source: Dict[str, List[Tuple[str, str]]] = {s: [] for s in sources}
+            for (source, title, _), summary in zip(outline, section_summaries):
+                per_source[source].append((title, summary))
+            document_summaries = self._roll_up(
+                executor,
+                [
+                    [f"{title}: {summary}" for title, summary in entries]
+                    if len(entries) > 1
+                    else [entries[0][1]]
+                    for entries in per_source.values()
+                ],
+                DOCUMENT_PROMPT,
+                sources,
+            )
+
+        index = SummaryIndex()
+        for source, summary in zip(sources, document_summaries):
+            index.documents[source] = DocumentSummary(source=source, summary=summary)
+        for (source, title, chunks), summary, chunk_group in zip(
+            outline, section_summaries, groups
+        ):
+            index.documents[source].sections.append(
+                SectionSummary(
+                    title=title,
+                    pages=sorted({int(c.metadata.get("page", 0)) for c in chunks}),
+                    summary=summary,
+                    chunk_summaries=chunk_group,
+                )
+            )
+
+        logger.info(
+            "Summary index built",
+            documents=len(index),
+            sections=len(outline),
+            chunks=len(chunk_summaries),
+            **self.stats,
+        )
+
+        return index
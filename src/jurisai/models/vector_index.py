@@ -0,0 +1,259 @@
+"""Vector index module.
+
+This module builds the FAISS indexes behind our vector stores. Vectors can be
+stored as full float32, float16 or scalar-quantized int8 to fit more documents
+per node, and helpers report the memory footprint of an index and measure the
+recall lost to quantization.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import json
+import sys
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Supported vector storage types and their FAISS scalar quantizer
+VECTOR_DTYPES = {
+    "float32": None,
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# Share of vector components an int8 index may clip before it is retrained
+MAX_CLIPPED_FRACTION = 0.001
+
+
+def create_faiss_index(
+    dimension: int,
+    dtype: str = "float32",
+    training_vectors: Optional[np.ndarray] = None,
+) -> faiss.Index:
+    """Create an empty FAISS index storing vectors with the given type.
+
+    Args:
+        dimension: Dimension of the embedding vectors
+        dtype: Vector storage type, one of "float32", "float16" or "int8"
+        training_vectors: Sample vectors used to train the int8 quantizer; without
+            them an int8 index is returned untrained and fit_quantizer trains
+            it on the first vectors added
+
+    Returns:
+        Empty FAISS index using L2 distance
+    """
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(
+            f"Unsupported vector dtype '{dtype}', expected one of {sorted(VECTOR_DTYPES)}"
+        )
+
+    qtype = VECTOR_DTYPES[dtype]
+    if qtype is None:
+        return faiss.IndexFlatL2(dimension)
+
+    index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2)
+    if not index.is_trained and training_vectors is not None and len(training_vectors):
+        index.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+
+    return index
+
+
+def dtype_needs_training(dtype: str) -> bool:
+    """Return whether indexes with a vector storage type must be trained.
+
+    Args:
+        dtype: Vector storage type
+
+    Returns:
+        True if the quantizer is trained on sample vectors
+    """
+    qtype = VECTOR_DTYPES.get(dtype)
+    if qtype is None:
+        return False
+    return not faiss.IndexScalarQuantizer(1, qtype, faiss.METRIC_L2).is_trained
+
+
+def clipped_fraction(index: faiss.Index, vectors: np.ndarray) -> float:
+    """Return the share of vector components outside an int8 index's range.
+
+    The int8 quantizer maps each dimension onto the range of its training
+    vectors; components outside it are clipped when they are added.
+
+    Args:
+        index: FAISS index
+        vectors: Vectors about to be added
+
+    Returns:
+        Fraction of clipped components between 0.0 and 1.0 (always 0.0 for
+        indexes that do not clip)
+    """
+    quantized: Any = faiss.downcast_index(index)
+    if index_dtype(quantized) != "int8" or len(vectors) == 0:
+        return 0.0
+    trained = faiss.vector_to_array(quantized.sq.trained)
+    vmin, vdiff = trained[: quantized.d], trained[quantized.d :]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    # Allow for the rounding of the trained bounds
+    slack = 1e-5 * vdiff
+    clipped = (vectors < vmin - slack) | (vectors > vmin + vdiff + slack)
+    return float(clipped.mean())
+
+
+def fit_quantizer(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    max_clipped: float = MAX_CLIPPED_FRACTION,
+) -> faiss.Index:
+    """Retrain an int8 index whose range does not cover new vectors.
+
+    An untrained index is trained on the new vectors. When more than
+    max_clipped of the components of the new vectors fall outside the
+    trained range, a new index is trained on the stored vectors
+    together with the new ones and the stored vectors are re-added in the
+    same order, so row positions stay valid.
+
+    Args:
+        index: FAISS index the vectors are about to be added to
+        vectors: Vectors about to be added
+        max_clipped: Largest tolerated fraction of clipped components
+
+    Returns:
+        The index itself, or the retrained index holding the same vectors
+    """
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+        return index
+
+    clipped = clipped_fraction(index, vectors)
+    if clipped <= max_clipped:
+        return index
+
+    stored = index.reconstruct_n(0, index.ntotal) if index.ntotal else None
+    sample = np.asarray(vectors, dtype=np.float32)
+    if stored is not None:
+        sample = np.vstack([stored, sample])
+    retrained = create_faiss_index(index.d, "int8", sample)
+    if stored is not None:
+        retrained.add(stored)
+    logger.warning(
+        "Retrained int8 index for out-of-range vectors",
+        clipped_fraction=round(clipped, 4),
+        vectors=int(index.ntotal),
+    )
+    return retrained
+
+
+def index_dtype(index: faiss.Index) -> str:
+    """Return the vector storage type of a FAISS index.
+
+    Args:
+        index: FAISS index
+
+    Returns:
+        Storage type name, or the index class name if it is not one we build
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexFlat):
+        return "float32"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        for name, qtype in VECTOR_DTYPES.items():
+            if qtype is not None and index.sq.qtype == qtype:
+                return name
+    return type(index).__name__
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Return the memory used by the vectors stored in a FAISS index.
+
+    Args:
+        index: FAISS index
+
+    Returns:
+        Size of the stored vector codes in bytes
+    """
+    index = faiss.downcast_index(index)
+    if hasattr(index, "code_size"):
+        return int(index.code_size) * int(index.ntotal)
+    # Fall back to the serialized size for index types without flat codes
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def docstore_memory_bytes(vector_store: FAISS) -> int:
+    """Estimate the memory used by the docstore of a vector store.
+
+    Args:
+        vector_store: FAISS vector store
+
+    Returns:
+        Approximate size of chunk texts, metadata and object overhead in bytes
+    """
+    docstore = vector_store.docstore
+    if hasattr(docstore, "memory_bytes"):
+        return int(docstore.memory_bytes())
+
+    total = 0
+    for doc_id in vector_store.index_to_docstore_id.values():
+        doc = docstore.search(doc_id)
+        if isinstance(doc, str):
+            continue
+        total += sys.getsizeof(doc) + sys.getsizeof(doc.page_content)
+        total += len(json.dumps(doc.metadata, default=str))
+    return total
+
+
+def index_footprint(vector_store: FAISS) -> Dict[str, Any]:
+    """Report the memory footprint of a vector store.
+
+    Args:
+        vector_store: FAISS vector store
+
+    Returns:
+        Vector count, dimension, storage type and byte sizes of the index
+    """
+    index = vector_store.index
+    vector_bytes = index_memory_bytes(index)
+    docstore_bytes = docstore_memory_bytes(vector_store)
+
+    return {
+        "vectors": int(index.ntotal),
+        "dimension": int(index.d),
+        "dtype": index_dtype(index),
+        "vector_bytes": vector_bytes,
+        "docstore_bytes": docstore_bytes,
+        "total_bytes": vector_bytes + docstore_bytes,
+        "bytes_per_vector": vector_bytes / index.ntotal if index.ntotal else 0.0,
+    }
+
+
+def measure_recall(
+    reference: faiss.Index, candidate: faiss.Index, queries: np.ndarray, k: int = 10
+) -> float:
+    """Measure how many exact top-k neighbours a candidate index returns.
+
+    Args:
+        reference: Index returning the exact (float32) neighbours
+        candidate: Index to evaluate, holding the same vectors in the same order
+        queries: Query vectors
+        k: Number of neighbours per query
+
+    Returns:
+        Recall@k of the candidate index between 0.0 and 1.0
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    _, expected = reference.search(queries, k)
+    _, found = candidate.search(queries, k)
+
+    hits = 0
+    total = 0
+    for expected_row, found_row in zip(expected, found):
+        expected_ids = {i for i in expected_row if i >= 0}
+        hits += len(expected_ids.intersection(found_row))
+        total += len(expected_ids)
+
+    return hits / total if total else 1.0
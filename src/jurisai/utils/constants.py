@@ -0,0 +1,24 @@
+"""Shared constants module.
+
+This module holds defaults needed by the command line before any document
+processing module is imported, so parsing arguments (or printing the
+version) stays fast.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import os
+
+# Persistent vector index of the ingestion daemon
+DEFAULT_INDEX_DIR = os.path.join(
+    os.path.expanduser("~"), ".local", "share", "jurisai", "index"
+)
+
+# Revision records of the documents in a persistent index, next to it
+REVISIONS_FILE = "revisions.json"
+
+# Vector storage types, see vector_index.VECTOR_DTYPES
+VECTOR_DTYPE_NAMES = ("float32", "float16", "int8")
+
+# Chunks per Parquet row group of an index export
+DEFAULT_ROW_GROUP_SIZE = 4096
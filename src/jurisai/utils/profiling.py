@@ -0,0 +1,275 @@
+"""Profiling utilities for JurisAI.
+
+This module runs a piece of work under cProfile and tracemalloc while a
+sampler thread records the call stacks of the profiled thread. It writes the
+samples and the live allocations as collapsed stacks (one "frame;frame;...
+count" line per stack, the input format of flamegraph.pl, speedscope and
+inferno), a pstats dump, and a summary of the top hotspots and allocation
+sites.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.jurisai.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL_S = 0.005
+DEFAULT_TRACEMALLOC_FRAMES = 25
+
+
+@dataclass
+class ProfileReport:
+    """Files and summary statistics of one profiled run."""
+
+    name: str
+    wall_s: float
+    samples: int
+    peak_bytes: int
+    hotspots: List[Dict[str, Any]] = field(default_factory=list)
+    allocations: List[Dict[str, Any]] = field(default_factory=list)
+    files: Dict[str, str] = field(default_factory=dict)
+
+
+class StackSampler:
+    """Sample the call stack of one thread at a fixed interval."""
+
+    def __init__(
+        self, thread_id: int, interval_s: float = DEFAULT_SAMPLE_INTERVAL_S
+    ):
+        """Initialize the sampler.
+
+        Args:
+            thread_id: Identifier of the thread to sample
+            interval_s: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    @staticmethod
+    def _collapse(frame: Optional[FrameType]) -> str:
+        """Return a stack as root-first "file:function" frames joined by ";"."""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self) -> None:
+        """Record samples until stopped."""
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        self._thread.join()
+
+
+def write_collapsed(stacks: Dict[str, int], path: str) -> None:
+    """Write stacks in collapsed format, heaviest first.
+
+    Args:
+        stacks: Mapping of ";"-joined stack to its weight
+        path: Target file
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, weight in sorted(stacks.items(), key=lambda item: -item[1]):
+            if stack and weight > 0:
+                f.write(f"{stack} {weight}\n")
+
+
+def allocation_stacks(snapshot: tracemalloc.Snapshot) -> Dict[str, int]:
+    """Return the live allocations of a snapshot as collapsed stacks.
+
+    Args:
+        snapshot: tracemalloc snapshot taken with several frames per trace
+
+    Returns:
+        Mapping of root-first "file:line" stack to allocated bytes
+    """
+    stacks: Counter = Counter()
+    for stat in snapshot.statistics("traceback"):
+        frames = [
+            f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            for frame in stat.traceback
+        ]
+        stacks[";".join(frames)] += stat.size
+    return stacks
+
+
+def _hotspots(stats: pstats.Stats, top_n: int) -> List[Dict[str, Any]]:
+    """Return the functions with the most self time."""
+    rows = []
+    entries = stats.stats  # type: ignore[attr-defined]
+    for (filename, lineno, function), entry in entries.items():
+        _, calls, self_s, cumulative_s, _ = entry
+        rows.append(
+            {
+                "function": f"{os.path.basename(filename)}:{lineno}({function})",
+                "calls": calls,
+                "self_s": self_s,
+                "cumulative_s": cumulative_s,
+            }
+        )
+    rows.sort(key=lambda row: -row["self_s"])
+    return rows[:top_n]
+
+
+def _allocation_sites(
+    snapshot: tracemalloc.Snapshot, top_n: int
+) -> List[Dict[str, Any]]:
+    """Return the source lines holding the most live memory."""
+    return [
+        {
+            "site": f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}",
+            "size_bytes": stat.size,
+            "blocks": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:top_n]
+    ]
+
+
+def profile_call(
+    name: str,
+    fn: Callable[[], Any],
+    output_dir: str,
+    top_n: int = 20,
+    interval_s: float = DEFAULT_SAMPLE_INTERVAL_S,
+    tracemalloc_frames: int = DEFAULT_TRACEMALLOC_FRAMES,
+) -> Tuple[Any, ProfileReport]:
+    """Run a callable under cProfile, tracemalloc and the stack sampler.
+
+    Writes <name>.cpu.collapsed (sampled stacks), <name>.alloc.collapsed
+    (live allocations in bytes) and <name>.pstats to output_dir.
+
+    Args:
+        name: Name of the profiled work, used for the output files
+        fn: Work to profile
+        output_dir: Directory for the output files
+        top_n: Number of hotspots and allocation sites in the report
+        interval_s: Seconds between stack samples
+        tracemalloc_frames: Frames recorded per allocation
+
+    Returns:
+        Tuple of (return value of fn, report)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), interval_s)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start(tracemalloc_frames)
+    tracemalloc.reset_peak()
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            result = fn()
+        finally:
+            profiler.disable()
+    finally:
+        wall_s = time.perf_counter() - start
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        if not tracing:
+            tracemalloc.stop()
+
+    # Leave out the allocations of the profilers themselves
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        ]
+    )
+
+    files = {
+        "cpu": os.path.join(output_dir, f"{name}.cpu.collapsed"),
+        "alloc": os.path.join(output_dir, f"{name}.alloc.collapsed"),
+        "pstats": os.path.join(output_dir, f"{name}.pstats"),
+    }
+    write_collapsed(sampler.stacks, files["cpu"])
+    write_collapsed(allocation_stacks(snapshot), files["alloc"])
+    profiler.dump_stats(files["pstats"])
+
+    report = ProfileReport(
+        name=name,
+        wall_s=wall_s,
+        samples=sum(sampler.stacks.values()),
+        peak_bytes=peak_bytes,
+        hotspots=_hotspots(pstats.Stats(profiler), top_n),
+        allocations=_allocation_sites(snapshot, top_n),
+        files=files,
+    )
+    logger.info(
+        "Profile written",
+        name=name,
+        wall_s=round(wall_s, 3),
+        samples=report.samples,
+        peak_bytes=peak_bytes,
+        output_dir=output_dir,
+    )
+    return result, report
+
+
+def format_report(report: ProfileReport) -> str:
+    """Render a report as a plain-text summary.
+
+    Args:
+        report: Report returned by profile_call
+
+    Returns:
+        Multi-line summary of timing, hotspots, allocations and output files
+    """
+    lines = [
+        f"Profile: {report.name}",
+        f"Wall time: {report.wall_s:.3f}s ({report.samples} stack samples)",
+        f"Peak traced memory: {report.peak_bytes / 1e6:.1f} MB",
+        "",
+        f"Top {len(report.hotspots)} hotspots by self time:",
+        f"{'self s':>9} {'cum s':>9} {'calls':>9}  function",
+    ]
+    for row in report.hotspots:
+        lines.append(
+            f"{row['self_s']:9.3f} {row['cumulative_s']:9.3f} "
+            f"{row['calls']:9d}  {row['function']}"
+        )
+    lines += [
+        "",
+        f"Top {len(report.allocations)} allocation sites (live at the end):",
+        f"{'KiB':>9} {'blocks':>9}  site",
+    ]
+    for row in report.allocations:
+        lines.append(
+            f"{row['size_bytes'] / 1024:9.1f} {row['blocks']:9d}  {row['site']}"
+        )
+    lines += ["", "Files:"]
+    lines += [f"  {kind}: {path}" for kind, path in report.files.items()]
+    return "\n".join(lines)
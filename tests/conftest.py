@@ -0,0 +1,67 @@
+"""Shared test fixtures for JurisAI.
+
+This module contains fixtures used by several test modules.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+from typing import Callable, List
+from unittest import mock
+
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+
+def _text_pdf(pages: List[str]) -> bytes:
+    """Build a minimal PDF with one line of Helvetica text per page."""
+    objects: List[object] = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode("latin-1")
+            + stream
+            + b"\nendstream"
+        )
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            "/Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        body = obj if isinstance(obj, bytes) else str(obj).encode("latin-1")
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return bytes(out)
+
+
+@pytest.fixture
+def text_pdf() -> Callable[[List[str]], bytes]:
+    """Return a factory building PDFs with the given page texts."""
+    return _text_pdf
+
+
+@pytest.fixture
+def fake_embeddings():
+    """Patch the processor's Hugging Face embeddings with deterministic fakes."""
+    with mock.patch(
+        "jurisai.models.document_processor.HuggingFaceEmbeddings",
+        return_value=DeterministicFakeEmbedding(size=16),
+    ) as patched:
+        yield patched
@@ -6,11 +6,13 @@ Author: a13xh (a13x.h.cc@gmail.com)
 """
 
 import signal
+import threading
 from unittest import mock
 
 import pytest
 import structlog
 
+from jurisai.core import app as app_module
 from jurisai.core.app import (
     cleanup_resources, 
     run_application, 
@@ -54,27 +56,18 @@ def test_cleanup_resources():
     )
 
 
-@mock.patch("jurisai.core.app.time.sleep")
+@mock.patch("jurisai.core.app._shutdown_event")
 @mock.patch("jurisai.core.app.cleanup_resources")
 @mock.patch("jurisai.core.app.setup_signal_handlers")
 @mock.patch("jurisai.core.app.get_logger")
 def test_run_application(
-    mock_get_logger, mock_setup_signal_handlers, mock_cleanup_resources, mock_sleep
+    mock_get_logger, mock_setup_signal_handlers, mock_cleanup_resources, mock_event
 ):
     """Test the main application loop."""
     # Set up mocks
     mock_logger = mock.MagicMock()
     mock_get_logger.return_value = mock_logger
     
-    # Set flag to request shutdown after first loop
-    def side_effect(*args, **kwargs):
-        from jurisai.core.app import _shutdown_requested
-        import builtins
-        from jurisai.core import app
-        builtins.setattr(app, "_shutdown_requested", True)
-    
-    mock_sleep.side_effect = side_effect
-    
     # Run the application
     exit_code = run_application()
     
@@ -82,7 +75,7 @@ def test_run_application(
     assert exit_code == 0
     mock_setup_signal_handlers.assert_called_once_with(mock_logger)
     mock_cleanup_resources.assert_called_once_with(mock_logger)
-    assert mock_sleep.call_count == 1
+    mock_event.wait.assert_called_once_with()
     mock_logger.info.assert_any_call(
         "Application initialized", status="success", component="main"
     )
@@ -91,4 +84,44 @@ def test_run_application(
     )
     mock_logger.info.assert_any_call(
         "Application shutdown", status="complete", app_name="JurisAI"
-    )
\ No newline at end of file
+    )
+
+
+@mock.patch("jurisai.core.app._shutdown_event")
+@mock.patch("src.jurisai.core.ingest_daemon.IngestDaemon")
+@mock.patch("jurisai.core.app.setup_signal_handlers")
+@mock.patch("jurisai.core.app.get_logger")
+def test_run_application_drains_daemon(
+    mock_get_logger, mock_setup_signal_handlers, mock_daemon_class, mock_event
+):
+    """Test that watched directories start a daemon stopped on cleanup."""
+    exit_code = run_application(["/tmp/inbox"], index_dir="/tmp/index", workers=3)
+
+    assert exit_code == 0
+    mock_daemon_class.assert_called_once_with(
+        ["/tmp/inbox"], index_dir="/tmp/index", max_workers=3
+    )
+    daemon = mock_daemon_class.return_value
+    daemon.start.assert_called_once_with()
+    daemon.stop.assert_called_once_with()
+
+
+@mock.patch("jurisai.core.app.setup_signal_handlers")
+@mock.patch("jurisai.core.app.get_logger")
+def test_run_application_waits_again_after_a_shutdown(
+    mock_get_logger, mock_setup_signal_handlers
+):
+    """Test that a second run is not ended by the first run's shutdown."""
+    # A previous run in this process was shut down
+    app_module._shutdown_requested = True
+    app_module._shutdown_event.set()
+    exit_codes = []
+
+    runner = threading.Thread(target=lambda: exit_codes.append(run_application()))
+    runner.start()
+    runner.join(timeout=0.2)
+    assert runner.is_alive()
+
+    app_module._shutdown_event.set()
+    runner.join(timeout=5)
+    assert exit_codes == [0]
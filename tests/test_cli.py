@@ -6,6 +6,9 @@ Author: a13xh (a13x.h.cc@gmail.com)
 """
 
 import logging
+import os
+import subprocess
+import sys
 from unittest import mock
 
 import pytest
@@ -30,6 +33,16 @@ def test_parse_args():
     args = parse_args(["search", "legal precedent"])
     assert args.command == "search"
     assert args.query == "legal precedent"
+    
+    # Test export and import commands, with --index-dir on either side
+    args = parse_args(["export", "chunks.parquet", "--index-dir", "/tmp/index"])
+    assert args.command == "export"
+    assert args.index_dir == "/tmp/index"
+    
+    args = parse_args(["--index-dir", "/tmp/index", "import", "chunks.parquet"])
+    assert args.command == "import"
+    assert args.index_dir == "/tmp/index"
+    assert args.dtype is None
 
 
 @mock.patch("jurisai.cli.commands.configure_logging")
@@ -88,4 +101,21 @@ def test_main_with_no_command(mock_configure_logging, mock_run_application):
         # Verify
         assert result == 0
         mock_run_application.assert_called_once()
-        mock_configure_logging.assert_called_once_with(level="INFO")
\ No newline at end of file
+        mock_configure_logging.assert_called_once_with(level="INFO")
+
+def test_cli_import_skips_document_processing():
+    """Test that loading the CLI does not import the ML stack."""
+    code = (
+        "import sys, jurisai.cli.commands; "
+        "print(sorted(m for m in ('faiss', 'pandas', 'pyarrow', 'langchain') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,169 @@
+"""Tests for the columnar export module.
+
+This module contains unit tests for exporting vector stores to Parquet and
+rebuilding them without re-embedding.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import json
+import os
+
+import pyarrow.parquet as pq
+import pytest
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from jurisai.models.columnar import (
+    export_index,
+    export_parquet,
+    import_index,
+    import_parquet,
+    iter_export,
+    read_chunks,
+    read_export_info,
+    read_export_revisions,
+)
+from jurisai.models.docstore import load_vector_store, save_vector_store
+from jurisai.models.metadata_index import FilteredFAISS
+from jurisai.models.vector_index import create_faiss_index
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings counting the texts embedded."""
+
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def _store(count=10):
+    """Return a vector store over chunks of two documents."""
+    documents = [
+        Document(
+            page_content=f"Clause {i} of the agreement.",
+            metadata={
+                "source": "lease.pdf" if i % 2 else "nda.pdf",
+                "page": i,
+                "section": f"Section {i // 4}",
+            },
+        )
+        for i in range(count)
+    ]
+    ids = [f"chunk-{i}" for i in range(count)]
+    return FilteredFAISS.from_documents(
+        documents, DeterministicFakeEmbedding(size=16), ids=ids
+    )
+
+
+def test_export_streams_row_groups(tmp_path):
+    """Test that chunks are written in row groups with the export metadata."""
+    path = str(tmp_path / "chunks.parquet")
+
+    assert export_parquet(_store(), path, row_group_size=4) == 10
+
+    assert pq.ParquetFile(path).num_row_groups == 3
+    info = read_export_info(path)
+    assert info["dimension"] == 16
+    assert info["dtype"] == "float32"
+    assert [len(b) for b in iter_export(path, batch_size=4)] == [4, 4, 2]
+
+
+def test_import_rebuilds_store_without_embedding(tmp_path):
+    """Test that an imported store returns the same search results."""
+    store = _store()
+    path = str(tmp_path / "chunks.parquet")
+    export_parquet(store, path, row_group_size=3)
+    embeddings = CountingEmbedding(size=16)
+
+    imported = import_parquet(path, embeddings, batch_size=3)
+
+    assert embeddings.calls == 0
+    assert imported.index.ntotal == 10
+    query = "Clause 7 of the agreement."
+    expected = store.similarity_search_with_score(query, k=3)
+    results = imported.similarity_search_with_score(query, k=3)
+    assert [(d.page_content, d.metadata) for d, _ in results] == [
+        (d.page_content, d.metadata) for d, _ in expected
+    ]
+    # Metadata filters work on the rebuilt store
+    filtered = imported.similarity_search(query, k=10, filter={"source": "nda.pdf"})
+    assert len(filtered) == 5
+
+
+def test_import_can_quantize(tmp_path):
+    """Test rebuilding the index with another vector type."""
+    path = str(tmp_path / "chunks.parquet")
+    export_parquet(_store(), path)
+
+    imported = import_parquet(path, DeterministicFakeEmbedding(size=16), dtype="int8")
+
+    assert imported.index.ntotal == 10
+    assert imported.similarity_search("Clause 3 of the agreement.", k=1)
+
+
+def test_read_chunks_for_analytics(tmp_path):
+    """Test loading the chunk columns into pandas."""
+    path = str(tmp_path / "chunks.parquet")
+    export_parquet(_store(), path)
+
+    frame = read_chunks(path)
+
+    assert "embedding" not in frame.columns
+    assert frame.groupby("source").size().to_dict() == {"lease.pdf": 5, "nda.pdf": 5}
+    assert frame["page"].max() == 9
+
+
+def test_index_directory_roundtrip(tmp_path):
+    """Test exporting a saved index and importing it on another node."""
+    source_dir = str(tmp_path / "source")
+    target_dir = str(tmp_path / "target")
+    path = str(tmp_path / "chunks.parquet")
+    save_vector_store(_store(), source_dir)
+
+    assert export_index(source_dir, path) == 10
+    assert import_index(path, target_dir) == 10
+
+    loaded = load_vector_store(target_dir, DeterministicFakeEmbedding(size=16))
+    assert loaded.similarity_search("Clause 2 of the agreement.", k=1)
+    with pytest.raises(FileExistsError):
+        import_index(path, target_dir)
+
+
+def test_empty_int8_roundtrip(tmp_path):
+    """Test exporting and importing an int8 index without chunks."""
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = FilteredFAISS(
+        embeddings, create_faiss_index(16, "int8"), InMemoryDocstore(), {}
+    )
+    path = str(tmp_path / "chunks.parquet")
+
+    assert export_parquet(store, path) == 0
+    imported = import_parquet(path, embeddings)
+
+    assert imported.index.ntotal == 0
+    # The untrained index is trained by the first chunks added to it
+    imported.add_texts([f"Clause {i}." for i in range(4)])
+    assert imported.index.is_trained
+    assert imported.similarity_search("Clause 2.", k=1)
+
+
+def test_index_directory_carries_revisions(tmp_path):
+    """Test that the daemon's revision records travel with the export."""
+    source_dir = str(tmp_path / "source")
+    target_dir = str(tmp_path / "target")
+    path = str(tmp_path / "chunks.parquet")
+    save_vector_store(_store(), source_dir)
+    revisions = {"lease.pdf": {"version": 3, "page_hashes": ["a", "b"]}}
+    with open(os.path.join(source_dir, "revisions.json"), "w") as f:
+        json.dump(revisions, f)
+
+    export_index(source_dir, path)
+    import_index(path, target_dir)
+
+    assert read_export_revisions(path) == revisions
+    with open(os.path.join(target_dir, "revisions.json")) as f:
+        assert json.load(f) == revisions
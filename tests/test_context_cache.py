@@ -0,0 +1,209 @@
+"""Tests for the context cache module.
+
+This module contains unit tests for stable prompt prefixes and the reuse of
+Ollama conversation contexts across follow-up questions.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from jurisai.models import rag_chain as rag_chain_module
+from jurisai.models.context_cache import (
+    ContextOllama,
+    ConversationContextCache,
+    split_prompt,
+)
+from jurisai.models.llm_scheduler import LLMScheduler, generation_variant
+from jurisai.models.metadata_index import FilteredFAISS
+from jurisai.models.retriever import stable_order
+
+PREFIX = "Use ONLY the context below.\n\nContext: Rent is due monthly.\n\n"
+
+
+class FakeOllamaClient:
+    """Ollama client appending one token per word to the given context."""
+
+    def __init__(self):
+        self.requests: List[Dict[str, Any]] = []
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        self.requests.append(
+            {"model": model, "prompt": prompt, "context": context, "options": options}
+        )
+        tokens = list(context or []) + list(range(len(prompt.split()) + 2))
+        return {
+            "response": f"answer {len(self.requests)}",
+            "context": tokens,
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": 1000000,
+        }
+
+
+def _llm(cache, client, session_id="session", model="small"):
+    """Return a context-reusing LLM with a fake client."""
+    return ContextOllama(
+        model=model, context_cache=cache, client=client, session_id=session_id
+    )
+
+
+def test_split_prompt_at_last_question():
+    """Test that the prefix ends before the last question marker."""
+    prompt = PREFIX + "Question: When is rent due?\n\nAnswer:\n"
+
+    prefix, question = split_prompt(prompt)
+
+    assert prefix == PREFIX
+    assert question == "Question: When is rent due?\n\nAnswer:\n"
+    assert split_prompt("Summarize this.") == ("", "Summarize this.")
+
+
+def test_follow_up_sends_only_the_question():
+    """Test that a follow-up over the same prefix continues the conversation."""
+    cache = ConversationContextCache()
+    client = FakeOllamaClient()
+    llm = _llm(cache, client)
+
+    assert llm.invoke(PREFIX + "Question: When is rent due?") == "answer 1"
+    llm.invoke(PREFIX + "Question: How much is it?")
+    llm.invoke(PREFIX + "Question: Is there a late fee?")
+
+    first, second, third = client.requests
+    assert first["prompt"].startswith(PREFIX) and first["context"] is None
+    assert second["prompt"] == "Question: How much is it?"
+    assert second["context"] == client.generate("small", first["prompt"])["context"]
+    assert third["context"][: len(second["context"])] == second["context"]
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["reused_tokens"] > 0
+
+
+def test_changed_prefix_is_sent_in_full():
+    """Test that a prompt with other context starts a new conversation."""
+    client = FakeOllamaClient()
+    llm = _llm(ConversationContextCache(), client)
+
+    llm.invoke(PREFIX + "Question: When is rent due?")
+    llm.invoke("Context: The term is five years.\n\nQuestion: How long is it?")
+
+    assert client.requests[1]["context"] is None
+    assert client.requests[1]["prompt"].startswith("Context:")
+
+
+def test_conversations_are_scoped_to_session_and_model():
+    """Test that sessions and models never share a context."""
+    cache = ConversationContextCache()
+    client = FakeOllamaClient()
+
+    _llm(cache, client, session_id="a").invoke(PREFIX + "Question: One?")
+    _llm(cache, client, session_id="b").invoke(PREFIX + "Question: Two?")
+    _llm(cache, client, model="large").invoke(PREFIX + "Question: Three?")
+
+    assert all(request["context"] is None for request in client.requests)
+    assert cache.drop_session("a") == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_long_conversations_start_over():
+    """Test that a context beyond the token limit is not reused."""
+    cache = ConversationContextCache(max_context_tokens=20)
+    client = FakeOllamaClient()
+    llm = _llm(cache, client)
+
+    for question in ["One?", "Two?", "Three?", "Four?"]:
+        llm.invoke(PREFIX + f"Question: {question}")
+
+    contexts = [request["context"] for request in client.requests]
+    assert contexts[0] is None
+    assert contexts[1] is not None
+    assert contexts[3] is None
+    assert cache.stats()["overflows"] >= 1
+
+
+def test_idle_and_least_recent_conversations_are_dropped():
+    """Test expiry and the entry limit."""
+    cache = ConversationContextCache(max_entries=2)
+    for name in ["a", "b", "c"]:
+        cache.put("session", "small", name, [1, 2])
+
+    assert cache.get("session", "small", "a") is None
+    assert cache.get("session", "small", "c") == [1, 2]
+
+    cache.idle_seconds = 0.0
+    assert cache.get("session", "small", "c") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_stable_order_gives_identical_prefixes():
+    """Test that retrieval order does not change the stuffed context."""
+    texts = ["Rent is due monthly.", "The term is five years.", "Pets allowed."]
+    store = FilteredFAISS.from_texts(
+        texts,
+        DeterministicFakeEmbedding(size=16),
+        metadatas=[{"source": "lease.pdf", "page": i} for i in (2, 0, 1)],
+    )
+    rag_chain = rag_chain_module.RAGChain()
+    retriever = rag_chain.create_chain(store, k=3).retriever
+
+    first = retriever.invoke("When is rent due?")
+    second = retriever.invoke("Can I keep a cat?")
+
+    assert [doc.page_content for doc in first] == [
+        doc.page_content for doc in second
+    ]
+    assert [doc.metadata["page"] for doc in first] == [0, 1, 2]
+    assert stable_order(list(reversed(first))) == first
+
+
+def test_conversations_are_coalesced_only_within_a_session():
+    """Test that session-scoped generations are not shared across sessions."""
+    cache = ConversationContextCache()
+    client = FakeOllamaClient()
+    scheduler = LLMScheduler(max_in_flight=1)
+    gate = threading.Event()
+    blocker = scheduler.submit("small", "blocker", lambda: gate.wait(timeout=5))
+    prompt = PREFIX + "Question: When is rent due?"
+
+    def submit(session_id):
+        llm = _llm(cache, client, session_id=session_id)
+        return scheduler.submit(
+            "small",
+            prompt,
+            lambda: llm.invoke(prompt),
+            session_id=session_id,
+            variant=generation_variant(llm, None, {}),
+        )
+
+    a, b, again = submit("a"), submit("b"), submit("a")
+    gate.set()
+
+    assert a is again
+    assert a is not b
+    assert blocker.result(timeout=5)
+    assert a.result(timeout=5) != b.result(timeout=5)
+    assert len(client.requests) == 2
+    scheduler.shutdown()
+
+
+def test_rag_chain_uses_context_cache():
+    """Test that RAGChain builds context-reusing models for its session."""
+    cache = rag_chain_module.ConversationContextCache()
+    rag_chain = rag_chain_module.RAGChain(
+        model_name="small", session_id="session", context_cache=cache
+    )
+
+    assert isinstance(rag_chain.llm, rag_chain_module.ContextOllama)
+    assert rag_chain.llm.context_cache is cache
+    assert rag_chain.llm.session_id == "session"
+    rag_chain.temperature = 0.5
+    assert rag_chain.llm.temperature == 0.5
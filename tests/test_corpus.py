@@ -0,0 +1,224 @@
+"""Tests for the document corpus module.
+
+This module contains unit tests for routed, parallel retrieval across
+several documents with a per-document diversity cap.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+from jurisai.models import rag_chain as rag_chain_module
+from jurisai.models.corpus import DocumentCorpus
+from jurisai.models.metadata_index import FilteredFAISS
+
+DIMENSION = 16
+
+
+class TopicEmbeddings(Embeddings):
+    """Embed "topic N" texts near the N-th basis vector."""
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.full(DIMENSION, 0.01, dtype=np.float32)
+        match = re.search(r"topic (\d+)", text)
+        if match:
+            vector[int(match.group(1)) % DIMENSION] = 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class RecordingLLM(LLM):
+    """LLM recording its prompts."""
+
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _call(
+        self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> str:
+        self.prompts.append(prompt)
+        return "Answer [doc3.pdf p.1]."
+
+
+class StoreHandle:
+    """Object resolving to a vector store, like an evictable index handle."""
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = 0
+
+    def get(self):
+        self.calls += 1
+        return self.store
+
+
+def _document(topic: int, chunks: int = 3, offset: float = 0.0) -> FilteredFAISS:
+    """Return the index of doc<topic>.pdf with chunks about one topic."""
+    embeddings = TopicEmbeddings()
+    texts = [f"Clause {i} about topic {topic}." for i in range(chunks)]
+    vectors = np.asarray(embeddings.embed_documents(texts))
+    vectors[:, (topic + 1) % DIMENSION] += offset + 0.01 * np.arange(chunks)
+    return FilteredFAISS.from_embeddings(
+        list(zip(texts, vectors.tolist())),
+        embeddings,
+        metadatas=[{"source": f"doc{topic}.pdf", "page": i} for i in range(chunks)],
+    )
+
+
+def _corpus(documents: int, corpus_class: Any = DocumentCorpus, **kwargs: Any):
+    """Return a corpus of documents about topics 0..documents-1."""
+    corpus = corpus_class(TopicEmbeddings(), **kwargs)
+    for topic in range(documents):
+        corpus.add_document(f"doc{topic}.pdf", _document(topic))
+    return corpus
+
+
+def test_search_routes_to_a_subset_of_documents():
+    """Test that only about sqrt(N) documents are searched."""
+    corpus = _corpus(16, min_probe=2)
+    searched = []
+    search_document = corpus._search_document
+    corpus._search_document = lambda name, *args, **kwargs: (
+        searched.append(name) or search_document(name, *args, **kwargs)
+    )
+
+    results = corpus.similarity_search("What about topic 7?", k=2)
+
+    assert corpus.probe_count() == 4
+    assert len(searched) == 4
+    assert searched and "doc7.pdf" in searched
+    assert {doc.metadata["source"] for doc in results} == {"doc7.pdf"}
+    corpus.close()
+
+
+def test_diversity_cap_spreads_results_over_documents():
+    """Test that one document cannot fill every slot."""
+    corpus = DocumentCorpus(TopicEmbeddings(), per_document_cap=2)
+    corpus.add_document("doc3.pdf", _document(3, chunks=5))
+    corpus.add_document("doc4.pdf", _document(4, chunks=5, offset=0.5))
+    query = TopicEmbeddings().embed_query("topic 3")
+
+    results = corpus.similarity_search_with_score_by_vector(query, k=4)
+    sources = [doc.metadata["source"] for doc, _ in results]
+    assert sources.count("doc3.pdf") == 2
+    assert sources.count("doc4.pdf") == 2
+    assert [score for _, score in results] == sorted(score for _, score in results)
+
+    uncapped = corpus.similarity_search_by_vector(query, k=4, per_document_cap=0)
+    assert {doc.metadata["source"] for doc in uncapped} == {"doc3.pdf"}
+    corpus.close()
+
+
+def test_cap_is_relaxed_when_other_documents_run_out():
+    """Test that k results are returned from a single document."""
+    corpus = _corpus(1, per_document_cap=1)
+
+    assert len(corpus.similarity_search("topic 0", k=3)) == 3
+    corpus.close()
+
+
+def test_results_cite_document_and_page():
+    """Test the citation added to every result."""
+    corpus = _corpus(3)
+
+    doc = corpus.similarity_search("topic 2", k=1)[0]
+
+    assert doc.metadata["citation"] == "doc2.pdf p.1"
+    corpus.close()
+
+
+def test_source_filter_selects_documents():
+    """Test that a source filter bypasses routing."""
+    corpus = _corpus(8, min_probe=1)
+
+    results = corpus.similarity_search(
+        "topic 1", k=4, filter={"source": ["doc5.pdf", "doc6.pdf"]}
+    )
+
+    assert {doc.metadata["source"] for doc in results} == {"doc5.pdf", "doc6.pdf"}
+    corpus.close()
+
+
+def test_documents_can_be_handles_and_removed():
+    """Test sources resolved through get() and document removal."""
+    corpus = DocumentCorpus(TopicEmbeddings())
+    handle = StoreHandle(_document(1))
+    corpus.add_document("doc1.pdf", handle)
+    corpus.add_document("doc2.pdf", _document(2))
+
+    assert corpus.similarity_search("topic 1", k=1)[0].metadata["source"] == "doc1.pdf"
+    assert handle.calls >= 2
+    assert corpus.metadata_values("source") == ["doc1.pdf", "doc2.pdf"]
+
+    corpus.remove_document("doc1.pdf")
+    assert corpus.names() == ["doc2.pdf"]
+    assert corpus.similarity_search("topic 1", k=1)[0].metadata["source"] == "doc2.pdf"
+    corpus.close()
+
+
+def test_growing_document_reads_only_new_vectors():
+    """Test that partial adds update the centroids from the new batch only."""
+    corpus = DocumentCorpus(TopicEmbeddings(), centroids_per_document=2)
+    store = _document(5, chunks=4)
+    lock = threading.RLock()
+    reconstruct_n = store.index.reconstruct_n
+    ranges = []
+
+    def recording_reconstruct_n(start, count):
+        ranges.append((start, count))
+        return reconstruct_n(start, count)
+
+    store.index.reconstruct_n = recording_reconstruct_n
+    corpus.add_document("doc5.pdf", store, lock=lock)
+    store.add_texts([f"Clause {i} about topic 5." for i in range(4, 7)])
+    corpus.add_document("doc5.pdf", store, lock=lock)
+    corpus.add_document("doc5.pdf", store)
+
+    assert ranges == [(0, 4), (4, 3), (0, 7)]
+    assert corpus._centroids["doc5.pdf"].shape == (2, DIMENSION)
+    assert corpus.similarity_search("topic 5", k=1)[0].metadata["source"] == "doc5.pdf"
+    corpus.close()
+
+
+def test_shared_pool_outlives_corpus():
+    """Test that closing a corpus leaves a shared search pool running."""
+    pool = ThreadPoolExecutor(max_workers=2)
+    corpus = _corpus(3, executor=pool)
+
+    assert corpus.similarity_search("topic 1", k=1)
+    corpus.close()
+
+    assert pool.submit(lambda: 1).result() == 1
+    pool.shutdown()
+
+
+def test_rag_chain_cites_documents_for_corpus():
+    """Test that corpus answers are prompted with document and page labels."""
+    # The chain checks for the corpus class of its own module
+    corpus = _corpus(4, corpus_class=rag_chain_module.DocumentCorpus)
+    rag_chain = rag_chain_module.RAGChain()
+    rag_chain.llm = RecordingLLM(prompts=[])
+
+    qa_chain = rag_chain.create_chain(corpus, k=2)
+    answer = rag_chain.answer_question(qa_chain, "What does topic 3 say?")
+
+    assert answer == "Answer [doc3.pdf p.1]."
+    prompt = rag_chain.llm.prompts[0]
+    assert "[doc3.pdf p.1]" in prompt
+    assert "Cite the document and page" in prompt
+    corpus.close()
@@ -0,0 +1,166 @@
+"""Tests for the compact docstore module.
+
+This module contains unit tests for the memory-mapped docstore and the
+compact vector store save/load path.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import os
+from unittest import mock
+
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from jurisai.models.docstore import (
+    CompactDocstore,
+    RowIdMap,
+    load_vector_store,
+    save_vector_store,
+)
+from jurisai.models.document_processor import DocumentProcessor
+
+
+def test_add_search_and_delete(tmp_path):
+    """Test basic docstore operations."""
+    docstore = CompactDocstore(str(tmp_path))
+    docstore.add(
+        {
+            "a": Document(page_content="Governing law: Delaware.", metadata={"page": 1}),
+            "b": Document(page_content="Términos y condiciones.", metadata={"page": 2}),
+        }
+    )
+
+    found = docstore.search("b")
+    assert found.page_content == "Términos y condiciones."
+    assert found.metadata == {"page": 2}
+    assert bytes(docstore.text_view(docstore.row_of("a"))) == b"Governing law: Delaware."
+
+    docstore.delete(["a"])
+    assert docstore.search("a") == "ID a not found."
+    assert len(docstore) == 1
+    docstore.close()
+
+
+def test_reopen_restores_contents(tmp_path):
+    """Test that a flushed docstore reopens with the same contents."""
+    docstore = CompactDocstore(str(tmp_path))
+    docstore.add({"a": Document(page_content="First chunk.", metadata={"page": 1})})
+    docstore.close()
+
+    reopened = CompactDocstore(str(tmp_path))
+    reopened.add({"b": Document(page_content="Second chunk.", metadata={"page": 2})})
+
+    assert reopened.search("a").page_content == "First chunk."
+    assert reopened.search("b").page_content == "Second chunk."
+    reopened.close()
+
+
+def test_save_and_load_vector_store(tmp_path):
+    """Test converting an in-memory FAISS store and loading it back."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+    texts = ["The lease term is five years.", "Rent is due monthly."]
+    vector_store = FAISS.from_texts(
+        texts, embeddings, metadatas=[{"page": 1}, {"page": 2}]
+    )
+
+    save_vector_store(vector_store, str(tmp_path))
+    loaded = load_vector_store(str(tmp_path), embeddings)
+
+    assert isinstance(loaded.index_to_docstore_id, RowIdMap)
+    assert loaded.similarity_search(texts[1], k=1)[0].page_content == texts[1]
+
+    # Stores opened from disk keep accepting documents
+    added = "Late fees apply after ten days."
+    loaded.add_texts([added], metadatas=[{"page": 3}])
+    assert loaded.similarity_search(added, k=1)[0].metadata == {"page": 3}
+
+
+def test_load_builds_the_metadata_index(tmp_path):
+    """Test that filtered searches after a load need no per-chunk lookups."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+    texts = [f"Clause {i}." for i in range(6)]
+    vector_store = FAISS.from_texts(
+        texts,
+        embeddings,
+        metadatas=[{"source": f"doc-{i % 2}.pdf", "page": i} for i in range(6)],
+    )
+    save_vector_store(vector_store, str(tmp_path))
+
+    loaded = load_vector_store(str(tmp_path), embeddings)
+
+    assert len(loaded.metadata_index) == 6
+    with mock.patch.object(
+        CompactDocstore, "search", wraps=loaded.docstore.search
+    ) as search:
+        results = loaded.similarity_search("Clause 3.", k=6, filter={"page": (0, 3)})
+    assert sorted(doc.metadata["page"] for doc in results) == [0, 1, 2, 3]
+    # Only the returned chunks are read from the docstore
+    assert search.call_count == 4
+
+
+def test_resave_after_delete_and_conversion(tmp_path):
+    """Test saving a loaded store in place and re-converting a store."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+    texts = ["The lease term is five years.", "Rent is due monthly."]
+    vector_store = FAISS.from_texts(texts, embeddings, ids=["a", "b"])
+    save_vector_store(vector_store, str(tmp_path))
+    # Converting the same in-memory store again replaces the earlier save
+    save_vector_store(vector_store, str(tmp_path))
+
+    loaded = load_vector_store(str(tmp_path), embeddings)
+    loaded.delete(["b"])
+    save_vector_store(loaded, str(tmp_path))
+    reloaded = load_vector_store(str(tmp_path), embeddings)
+
+    assert reloaded.index.ntotal == 1
+    assert reloaded.docstore.search("a").page_content == texts[0]
+
+
+@mock.patch("jurisai.models.document_processor.HuggingFaceEmbeddings")
+def test_processor_uses_compact_docstore(mock_embeddings, tmp_path):
+    """Test that DocumentProcessor builds compact stores when configured."""
+    mock_embeddings.return_value = DeterministicFakeEmbedding(size=8)
+    processor = DocumentProcessor(docstore_dir=str(tmp_path))
+    chunks = [Document(page_content=f"Section {i}.", metadata={"page": i}) for i in range(3)]
+
+    vector_store = processor.create_vector_store(chunks)
+    processor.cleanup()
+
+    assert type(vector_store.docstore).__name__ == "CompactDocstore"
+    assert os.path.dirname(vector_store.docstore.path) == str(tmp_path)
+    assert vector_store.similarity_search("Section 2.", k=1)[0].metadata == {"page": 2}
+
+
+def test_deletes_compact_the_text_blob(tmp_path):
+    """Test that the blob is rewritten once most of it is deleted."""
+    docstore = CompactDocstore(str(tmp_path))
+    docstore.add(
+        {
+            f"chunk-{i}": Document(page_content=f"Clause {i}. " * 20, metadata={"i": i})
+            for i in range(10)
+        }
+    )
+    docstore.flush()
+    blob_path = tmp_path / "texts.bin"
+    full_size = blob_path.stat().st_size
+    kept_row = docstore.row_of("chunk-9")
+
+    docstore.delete([f"chunk-{i}" for i in range(4)])
+    assert blob_path.stat().st_size == full_size
+
+    docstore.delete([f"chunk-{i}" for i in range(4, 6)])
+    assert blob_path.stat().st_size < full_size / 2
+    assert docstore.row_of("chunk-9") == kept_row
+    assert docstore.search("chunk-9").page_content == "Clause 9. " * 20
+    assert docstore.search("chunk-0") == "ID chunk-0 not found."
+
+    docstore.add({"chunk-10": Document(page_content="New clause.", metadata={})})
+    docstore.close()
+
+    reopened = CompactDocstore(str(tmp_path))
+    assert len(reopened) == 5
+    assert reopened.search("chunk-6").metadata == {"i": 6}
+    assert reopened.search("chunk-10").page_content == "New clause."
+    reopened.close()
@@ -0,0 +1,207 @@
+"""Tests for the ingestion daemon module.
+
+This module contains unit tests for watch-folder ingestion into the
+persistent index.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from jurisai.core.ingest_daemon import REVISIONS_FILE, IngestDaemon
+from jurisai.models.docstore import load_vector_store, save_vector_store
+from jurisai.models.document_processor import DocumentProcessor
+
+PAGES = [
+    "This lease is made between the landlord and the tenant.",
+    "Rent is due on the first day of each month.",
+]
+
+
+@pytest.fixture
+def make_daemon(fake_embeddings, tmp_path):
+    """Return a factory for daemons watching tmp_path/inbox."""
+    daemons = []
+
+    def factory(use_inotify=False):
+        processor = DocumentProcessor(
+            ocr=False, revisions_path=str(tmp_path / "index" / REVISIONS_FILE)
+        )
+        daemon = IngestDaemon(
+            [str(tmp_path / "inbox")],
+            index_dir=str(tmp_path / "index"),
+            processor=processor,
+            debounce_s=0.05,
+            poll_interval_s=0.05,
+            use_inotify=use_inotify,
+        )
+        daemons.append(daemon)
+        return daemon
+
+    os.makedirs(tmp_path / "inbox")
+    yield factory
+    for daemon in daemons:
+        daemon._stop.set()
+
+
+def _write(path, content):
+    """Write a file atomically, as a copy into the watched folder would."""
+    with open(f"{path}.part", "wb") as f:
+        f.write(content)
+    os.replace(f"{path}.part", path)
+
+
+def _wait_for(daemon, counter, value, timeout=10.0):
+    """Wait until a daemon counter reaches a value and the queue is idle."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if daemon.stats()[counter] >= value and daemon.wait_idle(timeout=timeout):
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _texts(vector_store):
+    """Return the stripped texts of every chunk of a vector store."""
+    return {
+        vector_store.docstore.search(doc_id).page_content.strip()
+        for doc_id in vector_store.index_to_docstore_id.values()
+    }
+
+
+def test_ingests_existing_and_new_files(make_daemon, text_pdf, tmp_path):
+    """Test that files present at startup and added later are ingested."""
+    _write(tmp_path / "inbox" / "lease.pdf", text_pdf(PAGES[:1]))
+    daemon = make_daemon()
+    daemon.start()
+    assert daemon.wait_idle(timeout=10)
+
+    _write(tmp_path / "inbox" / "rent.pdf", text_pdf(PAGES[1:]))
+    assert _wait_for(daemon, "ingested", 2)
+    daemon.stop()
+
+    assert daemon.stats()["ingested"] == 2
+    reloaded = load_vector_store(str(tmp_path / "index"), daemon.processor.embeddings)
+    assert _texts(reloaded) == set(PAGES)
+
+
+def test_restart_skips_unchanged_and_removes_deleted(make_daemon, text_pdf, tmp_path):
+    """Test that a restart only re-indexes files that changed while down."""
+    _write(tmp_path / "inbox" / "lease.pdf", text_pdf(PAGES[:1]))
+    _write(tmp_path / "inbox" / "rent.pdf", text_pdf(PAGES[1:]))
+    first = make_daemon()
+    first.start()
+    assert first.wait_idle(timeout=10)
+    first.stop()
+
+    os.remove(tmp_path / "inbox" / "rent.pdf")
+    second = make_daemon()
+    second.start()
+    assert second.wait_idle(timeout=10)
+    assert _wait_for(second, "removed", 1)
+    _write(tmp_path / "inbox" / "lease.pdf", text_pdf(PAGES[:1]))
+    assert _wait_for(second, "unchanged", 2)
+    second.stop()
+
+    assert second.stats()["ingested"] == 0
+    reloaded = load_vector_store(str(tmp_path / "index"), second.processor.embeddings)
+    assert _texts(reloaded) == {PAGES[0]}
+
+
+def test_deleted_file_is_removed_from_index(make_daemon, text_pdf, tmp_path):
+    """Test that deleting a watched file drops its chunks."""
+    _write(tmp_path / "inbox" / "lease.pdf", text_pdf(PAGES[:1]))
+    daemon = make_daemon(use_inotify=True)
+    daemon.start()
+    assert daemon.wait_idle(timeout=10)
+
+    daemon.notify(str(tmp_path / "inbox" / "gone.pdf"))
+    os.remove(tmp_path / "inbox" / "lease.pdf")
+    assert _wait_for(daemon, "removed", 1)
+    daemon.stop()
+
+    assert daemon.stats()["removed"] == 1
+    assert daemon.stats()["failed"] == 0
+    assert daemon.vector_store.index.ntotal == 0
+
+
+def test_revisions_without_index_are_reingested(make_daemon, text_pdf, tmp_path):
+    """Test that revisions recorded after the last flush are not trusted."""
+    _write(tmp_path / "inbox" / "lease.pdf", text_pdf(PAGES[:1]))
+    first = make_daemon()
+    first.start()
+    assert first.wait_idle(timeout=10)
+    first._stop.set()
+
+    # Simulate a crash before the index was written
+    for name in os.listdir(tmp_path / "index"):
+        if name != REVISIONS_FILE:
+            path = tmp_path / "index" / name
+            if os.path.isfile(path):
+                os.remove(path)
+
+    second = make_daemon()
+    second.start()
+    assert second.wait_idle(timeout=10)
+    second.stop()
+
+    assert second.stats()["ingested"] == 1
+    assert _texts(second.vector_store) == {PAGES[0]}
+
+
+def test_flush_runs_without_holding_the_queue(make_daemon, text_pdf, tmp_path):
+    """Test that events can be queued while the index is being saved."""
+    _write(tmp_path / "inbox" / "lease.pdf", text_pdf(PAGES[:1]))
+    daemon = make_daemon()
+    queue_free = []
+
+    def probe():
+        acquired = daemon._cond.acquire(timeout=1)
+        if acquired:
+            daemon._cond.release()
+        queue_free.append(acquired)
+
+    def save(vector_store, path):
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        save_vector_store(vector_store, path)
+
+    with mock.patch("jurisai.core.ingest_daemon.save_vector_store", save):
+        daemon.start()
+        assert _wait_for(daemon, "ingested", 1)
+        deadline = time.monotonic() + 10
+        while not queue_free and time.monotonic() < deadline:
+            time.sleep(0.02)
+        daemon.stop()
+
+    assert queue_free and all(queue_free)
+
+
+def test_same_named_files_in_different_folders(make_daemon, text_pdf, tmp_path):
+    """Test that PDFs sharing a file name are indexed as separate documents."""
+    for folder, page in zip(("north", "south"), PAGES):
+        os.makedirs(tmp_path / "inbox" / folder)
+        _write(tmp_path / "inbox" / folder / "lease.pdf", text_pdf([page]))
+    daemon = make_daemon()
+    daemon.start()
+    assert _wait_for(daemon, "ingested", 2)
+    daemon.stop()
+
+    assert daemon.stats()["failed"] == 0
+    reloaded = load_vector_store(str(tmp_path / "index"), daemon.processor.embeddings)
+    sources = {
+        reloaded.docstore.search(doc_id).page_content.strip(): (
+            reloaded.docstore.search(doc_id).metadata["source"]
+        )
+        for doc_id in reloaded.index_to_docstore_id.values()
+    }
+    assert sources == {
+        PAGES[0]: str(tmp_path / "inbox" / "north" / "lease.pdf"),
+        PAGES[1]: str(tmp_path / "inbox" / "south" / "lease.pdf"),
+    }
@@ -0,0 +1,266 @@
+"""Tests for the background jobs module.
+
+This module contains unit tests for the shared ingest job executor and for
+incremental ingests into a session corpus.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import threading
+
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from jurisai.core.jobs import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JobExecutor,
+    ingest_document,
+)
+from jurisai.core.memory import MemoryManager
+from jurisai.models.corpus import DocumentCorpus
+from jurisai.models.document_processor import DocumentProcessor
+from jurisai.models.vector_index import index_dtype
+
+PAGES = [
+    "This lease is made between the landlord and the tenant.",
+    "Rent is due on the first day of each month.",
+    "The tenant shall maintain insurance.",
+]
+
+
+def _wait(job, timeout=10.0):
+    """Wait until a job has finished."""
+    job._future.exception(timeout=timeout)
+    assert job.done
+
+
+@pytest.fixture
+def executor():
+    """Return an executor with a single worker."""
+    executor = JobExecutor(max_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def processor():
+    """Return a processor with deterministic embeddings."""
+    processor = DocumentProcessor(
+        ocr=False, embeddings=DeterministicFakeEmbedding(size=16)
+    )
+    yield processor
+    processor.cleanup()
+
+
+def test_job_reports_progress_and_result(executor):
+    """Test that a finished job keeps its progress and result."""
+
+    def work(job):
+        for page in range(3):
+            job.check()
+            job.report("load", page + 1, 3)
+        return "index"
+
+    job = executor.submit("session", "lease.pdf", work)
+    _wait(job)
+
+    snapshot = job.snapshot()
+    assert job.state == JOB_DONE
+    assert job.result == "index"
+    assert snapshot["stage"] == "load"
+    assert snapshot["stages"] == {"load": {"done": 3, "total": 3}}
+    assert executor.stats()[JOB_DONE] == 1
+
+
+def test_running_job_is_cancelled_at_its_next_check(executor):
+    """Test cancellation of a running job."""
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.check()
+            job.report("embed", 0, 1)
+
+    job = executor.submit("session", "lease.pdf", work)
+    assert started.wait(5)
+    assert executor.cancel("session", "lease.pdf") == 1
+    _wait(job)
+
+    assert job.state == JOB_CANCELLED
+
+
+def test_queued_job_is_cancelled_before_it_runs(executor):
+    """Test that a job waiting for a worker never runs once cancelled."""
+    release = threading.Event()
+    ran = []
+    blocker = executor.submit("other", "big.pdf", lambda job: release.wait(5))
+    job = executor.submit("session", "lease.pdf", lambda job: ran.append(job))
+
+    job.cancel()
+    release.set()
+    _wait(blocker)
+
+    assert job.state == JOB_CANCELLED
+    assert not ran
+
+
+def test_failed_job_records_its_error(executor):
+    """Test that an exception fails the job without stopping the worker."""
+
+    def work(job):
+        raise ValueError("No document chunks to index")
+
+    failed = executor.submit("session", "empty.pdf", work)
+    _wait(failed)
+    succeeded = executor.submit("session", "lease.pdf", lambda job: 1)
+    _wait(succeeded)
+
+    assert failed.state == JOB_FAILED
+    assert failed.error == "No document chunks to index"
+    assert succeeded.state == JOB_DONE
+
+
+def test_ingest_publishes_partial_index(executor, processor, text_pdf, tmp_path):
+    """Test that each embedded batch is searchable before the ingest ends."""
+    corpus = DocumentCorpus(processor.embeddings)
+    memory_manager = MemoryManager(
+        budget_bytes=1024**3, spill_dir=str(tmp_path / "spill")
+    )
+    published = []
+
+    def work(job):
+        report = job.report
+
+        def record(stage, done, total):
+            # Chunks already in the corpus when the next stage starts
+            if "lease.pdf" in corpus.names():
+                published.append(len(corpus.similarity_search("rent", k=10)))
+            report(stage, done, total)
+
+        job.report = record
+        return ingest_document(
+            job,
+            text_pdf(PAGES),
+            processor,
+            corpus,
+            memory_manager=memory_manager,
+            pages_per_batch=1,
+        )
+
+    job = executor.submit("session", "lease.pdf", work)
+    _wait(job)
+
+    assert job.state == JOB_DONE, job.error
+    assert published and published == sorted(published)
+    assert published[0] < published[-1]
+    assert set(job.snapshot()["stages"]) == {"load", "split", "embed"}
+    assert job.result.session_id == "session"
+    assert corpus.store("lease.pdf") is job.result.get()
+    assert memory_manager.usage()["indexes_resident"] == 1
+    corpus.close()
+    memory_manager.close()
+
+
+def test_cancelled_ingest_leaves_the_corpus(executor, processor, text_pdf):
+    """Test that a cancelled ingest removes its partial index."""
+    corpus = DocumentCorpus(processor.embeddings)
+
+    def work(job):
+        report = job.report
+
+        def cancel_after_first_batch(stage, done, total):
+            report(stage, done, total)
+            if stage == "split" and "lease.pdf" in corpus.names():
+                job.cancel()
+
+        job.report = cancel_after_first_batch
+        return ingest_document(
+            job, text_pdf(PAGES), processor, corpus, pages_per_batch=1
+        )
+
+    job = executor.submit("session", "lease.pdf", work)
+    _wait(job)
+
+    assert job.state == JOB_CANCELLED
+    assert corpus.names() == []
+    corpus.close()
+
+
+def test_failed_reupload_keeps_the_previous_version(
+    executor, processor, text_pdf, tmp_path
+):
+    """Test that a re-upload replaces a document only once it is complete."""
+    corpus = DocumentCorpus(processor.embeddings)
+    memory_manager = MemoryManager(
+        budget_bytes=1024**3, spill_dir=str(tmp_path / "spill")
+    )
+
+    def ingest(pages, cancel=False):
+        def work(job):
+            report = job.report
+
+            def record(stage, done, total):
+                report(stage, done, total)
+                # The previous version answers while the new one is indexed
+                assert corpus.store("lease.pdf") is previous.get()
+                if cancel and stage == "embed":
+                    job.cancel()
+
+            job.report = record
+            return ingest_document(
+                job,
+                text_pdf(pages),
+                processor,
+                corpus,
+                memory_manager=memory_manager,
+                pages_per_batch=1,
+            )
+
+        job = executor.submit("session", "lease.pdf", work)
+        _wait(job)
+        return job
+
+    first = executor.submit(
+        "session",
+        "lease.pdf",
+        lambda job: ingest_document(
+            job, text_pdf(PAGES), processor, corpus, memory_manager=memory_manager
+        ),
+    )
+    _wait(first)
+    previous = first.result
+
+    cancelled = ingest(PAGES[:1], cancel=True)
+    assert cancelled.state == JOB_CANCELLED
+    assert corpus.store("lease.pdf") is previous.get()
+    assert memory_manager.usage()["indexes_resident"] == 1
+
+    replaced = ingest(PAGES[:1])
+    assert replaced.state == JOB_DONE, replaced.error
+    assert corpus.store("lease.pdf") is replaced.result.get()
+    assert not previous.resident
+    assert memory_manager.usage()["indexes_resident"] == 1
+    corpus.close()
+    memory_manager.close()
+
+
+def test_ingest_uses_its_own_vector_type(executor, processor, text_pdf):
+    """Test that a job's vector type does not change the shared processor."""
+    corpus = DocumentCorpus(processor.embeddings)
+
+    job = executor.submit(
+        "session",
+        "lease.pdf",
+        lambda job: ingest_document(
+            job, text_pdf(PAGES), processor, corpus, vector_dtype="float16"
+        ),
+    )
+    _wait(job)
+
+    assert job.state == JOB_DONE, job.error
+    assert index_dtype(job.result.index) == "float16"
+    assert processor.vector_dtype == "float32"
+    corpus.close()
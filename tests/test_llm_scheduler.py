@@ -0,0 +1,136 @@
+"""Tests for the LLM scheduler module.
+
+This module contains unit tests for request scheduling in front of the LLM.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import threading
+
+import pytest
+from langchain_community.llms import FakeListLLM
+
+from jurisai.models.llm_scheduler import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    LLMScheduler,
+    ScheduledLLM,
+)
+
+
+def _blocking_call(gate, result):
+    """Return a callable that waits on a gate before returning a result."""
+    def call():
+        gate.wait(timeout=5)
+        return result
+    return call
+
+
+def test_identical_prompts_are_coalesced():
+    """Test that identical in-flight prompts share one generation."""
+    scheduler = LLMScheduler(max_in_flight=1)
+    gate = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        gate.wait(timeout=5)
+        return "answer"
+
+    first = scheduler.submit("model", "prompt", generate, session_id="a")
+    second = scheduler.submit("model", "prompt", generate, session_id="b")
+    gate.set()
+
+    assert first is second
+    assert first.result(timeout=5) == "answer"
+    assert len(calls) == 1
+    assert scheduler.stats()["model"]["coalesced"] == 1
+    scheduler.shutdown()
+
+
+def test_in_flight_limit_and_priority():
+    """Test that the in-flight cap holds and higher priority runs first."""
+    scheduler = LLMScheduler(max_in_flight=1)
+    gate = threading.Event()
+    order = []
+
+    def record(name):
+        def call():
+            order.append(name)
+            return name
+        return call
+
+    blocker = scheduler.submit("model", "blocker", _blocking_call(gate, "done"))
+    low = scheduler.submit("model", "low", record("low"), priority=PRIORITY_LOW)
+    high = scheduler.submit("model", "high", record("high"), priority=PRIORITY_HIGH)
+
+    stats = scheduler.stats()["model"]
+    assert stats["in_flight"] == 1
+    assert stats["queue_depth"] == 2
+
+    gate.set()
+    for future in (blocker, low, high):
+        future.result(timeout=5)
+
+    assert order == ["high", "low"]
+    scheduler.shutdown()
+
+
+def test_fair_queuing_across_sessions():
+    """Test that a flooding session does not starve another session."""
+    scheduler = LLMScheduler(max_in_flight=1)
+    gate = threading.Event()
+    order = []
+
+    def record(name):
+        def call():
+            order.append(name)
+            return name
+        return call
+
+    blocker = scheduler.submit("model", "blocker", _blocking_call(gate, "done"))
+    futures = [
+        scheduler.submit("model", f"a{i}", record(f"a{i}"), session_id="a")
+        for i in range(3)
+    ]
+    futures.append(scheduler.submit("model", "b0", record("b0"), session_id="b"))
+
+    gate.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order.index("b0") < order.index("a2")
+    scheduler.shutdown()
+
+
+def test_errors_propagate_to_caller():
+    """Test that generation errors reach the caller and free the slot."""
+    scheduler = LLMScheduler(max_in_flight=1)
+
+    def fail():
+        raise ValueError("model unavailable")
+
+    with pytest.raises(ValueError):
+        scheduler.run("model", "prompt", fail)
+
+    assert scheduler.run("model", "other", lambda: "ok") == "ok"
+    stats = scheduler.stats()["model"]
+    assert stats["failed"] == 1
+    assert stats["completed"] == 1
+    assert stats["in_flight"] == 0
+    scheduler.shutdown()
+
+
+def test_scheduled_llm_invokes_wrapped_model():
+    """Test that ScheduledLLM generates through the scheduler."""
+    scheduler = LLMScheduler(max_in_flight=2)
+    llm = ScheduledLLM(
+        llm=FakeListLLM(responses=["scheduled answer"]),
+        scheduler=scheduler,
+        session_id="session",
+    )
+
+    assert llm.invoke("What is the term?") == "scheduled answer"
+    assert scheduler.stats()["fake-list"]["completed"] == 1
+    scheduler.shutdown()
@@ -0,0 +1,195 @@
+"""Tests for the map-reduce answering module.
+
+This module contains unit tests for concurrent map-reduce answering with
+early termination.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import pytest
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.llms import LLM
+from langchain_core.retrievers import BaseRetriever
+
+from jurisai.models.map_reduce import MapReduceAnswerer, parse_partial
+from jurisai.models.metadata_index import FilteredFAISS
+from jurisai.models.rag_chain import RAGChain
+
+
+class StubRetriever(BaseRetriever):
+    """Retriever returning a fixed list of chunks."""
+
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query: str, **kwargs: Any) -> List[Document]:
+        return self.documents
+
+
+class ScriptedLLM(LLM):
+    """LLM answering map prompts by the first chunk label it sees."""
+
+    answers: Dict[str, str]
+    delay_s: float = 0.0
+    prompts: List[str] = []
+    state: Dict[str, int] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _call(
+        self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> str:
+        lock = self.state.setdefault("lock", threading.Lock())
+        with lock:
+            self.prompts.append(prompt)
+            self.state["active"] = self.state.get("active", 0) + 1
+            self.state["peak"] = max(self.state.get("peak", 0), self.state["active"])
+        time.sleep(self.delay_s)
+        with lock:
+            self.state["active"] -= 1
+
+        if prompt.lstrip().startswith("1. Combine"):
+            return "Combined answer."
+        for label, answer in self.answers.items():
+            if f"[{label}]" in prompt:
+                if answer == "ERROR":
+                    raise RuntimeError("model unavailable")
+                return answer
+        return "NOT FOUND"
+
+
+def _documents(count: int) -> List[Document]:
+    """Return chunks labelled lease.pdf p.1 ... p.<count>."""
+    return [
+        Document(page_content=f"Clause {i}.", metadata={"source": "lease.pdf", "page": i})
+        for i in range(count)
+    ]
+
+
+def test_parse_partial():
+    """Test extracting answers and confidence from map outputs."""
+    assert parse_partial("Rent is $2,000.\nCONFIDENCE: 90") == ("Rent is $2,000.", 0.9)
+    assert parse_partial("NOT FOUND\nCONFIDENCE: 0") == ("", 0.0)
+    assert parse_partial("Rent is monthly.") == ("Rent is monthly.", 0.5)
+
+
+def test_map_reduce_combines_partials_with_bounded_concurrency():
+    """Test that groups are mapped concurrently and reduced once."""
+    llm = ScriptedLLM(
+        answers={
+            "lease.pdf p.1": "Rent is $2,000. CONFIDENCE: 80",
+            "lease.pdf p.7": "Late fee is 5%. CONFIDENCE: 75",
+        },
+        delay_s=0.02,
+        prompts=[],
+        state={},
+    )
+    answerer = MapReduceAnswerer(
+        llm,
+        StubRetriever(documents=_documents(12)),
+        group_size=3,
+        max_concurrency=2,
+        min_confident=0,
+    )
+
+    result = answerer.answer("What must the tenant pay?")
+
+    assert result.answer == "Combined answer."
+    assert result.groups_total == result.groups_answered == 4
+    assert not result.early_stopped
+    assert llm.state["peak"] <= 2
+    # Only the two answered groups are reduced, most confident first
+    reduce_prompt = llm.prompts[-1]
+    assert reduce_prompt.index("Rent is $2,000.") < reduce_prompt.index("Late fee")
+    assert set(result.timings) == {"retrieve_s", "map_s", "reduce_s", "total_s"}
+
+
+def test_map_reduce_stops_early_when_confident():
+    """Test that remaining groups are skipped once enough partials are confident."""
+    llm = ScriptedLLM(
+        answers={
+            "lease.pdf p.1": "Rent is $2,000. CONFIDENCE: 95",
+            "lease.pdf p.4": "Rent is paid monthly. CONFIDENCE: 90",
+        },
+        delay_s=0.05,
+        prompts=[],
+        state={},
+    )
+    answerer = MapReduceAnswerer(
+        llm,
+        StubRetriever(documents=_documents(30)),
+        group_size=3,
+        max_concurrency=2,
+        min_confident=2,
+    )
+
+    result = answerer.answer("How much is the rent?")
+
+    assert result.early_stopped
+    assert result.groups_answered < result.groups_total == 10
+    assert result.answer == "Combined answer."
+
+
+def test_map_reduce_without_evidence():
+    """Test that no reduce call is made when no group answers."""
+    llm = ScriptedLLM(answers={}, prompts=[], state={})
+    answerer = MapReduceAnswerer(llm, StubRetriever(documents=_documents(6)))
+
+    result = answerer.answer("Who is the guarantor?")
+
+    assert result.answer == "I don't know."
+    assert len(llm.prompts) == 2
+
+
+def test_map_reduce_skips_failed_groups():
+    """Test that a failed map call does not lose the other partial answers."""
+    llm = ScriptedLLM(
+        answers={
+            "lease.pdf p.1": "ERROR",
+            "lease.pdf p.4": "Rent is due monthly. CONFIDENCE: 90",
+        },
+        prompts=[],
+        state={},
+    )
+    answerer = MapReduceAnswerer(
+        llm, StubRetriever(documents=_documents(6)), min_confident=0
+    )
+
+    result = answerer.answer("When is rent due?")
+
+    assert result.answer == "Rent is due monthly."
+    assert result.groups_failed == 1
+    assert result.groups_answered == 1
+
+
+def test_map_reduce_fails_when_every_group_fails():
+    """Test that an error is raised when no group could be answered."""
+    llm = ScriptedLLM(
+        answers={"lease.pdf p.1": "ERROR", "lease.pdf p.4": "ERROR"},
+        prompts=[],
+        state={},
+    )
+    answerer = MapReduceAnswerer(llm, StubRetriever(documents=_documents(6)))
+
+    with pytest.raises(RuntimeError, match="All 2 map groups failed"):
+        answerer.answer("When is rent due?")
+
+
+def test_rag_chain_creates_map_reduce_answerer():
+    """Test that RAGChain wires its LLM and retriever into the answerer."""
+    embeddings = DeterministicFakeEmbedding(size=16)
+    vector_store = FilteredFAISS.from_documents(_documents(6), embeddings)
+    rag_chain = RAGChain()
+    rag_chain.llm = ScriptedLLM(answers={}, prompts=[], state={})
+
+    answerer = rag_chain.create_map_reduce(vector_store, k=6, group_size=2)
+    result = answerer.answer("Anything?")
+
+    assert answerer.llm is rag_chain.llm
+    assert result.groups_total == 3
@@ -0,0 +1,154 @@
+"""Tests for the memory module.
+
+This module contains unit tests for ingest admission control and eviction
+of idle session indexes.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import os
+import threading
+import time
+
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from jurisai.core.memory import MemoryBudgetExceeded, MemoryManager
+from jurisai.models.metadata_index import FilteredFAISS
+
+MB = 1024 * 1024
+
+
+def _store(texts):
+    """Return a small vector store over the given texts."""
+    return FilteredFAISS.from_texts(texts, DeterministicFakeEmbedding(size=16))
+
+
+def _manager(tmp_path, rss_mb=100, budget_mb=200, idle_seconds=0.0):
+    """Return a manager with a fixed RSS."""
+    return MemoryManager(
+        budget_bytes=budget_mb * MB,
+        spill_dir=str(tmp_path / "spill"),
+        idle_seconds=idle_seconds,
+        rss=lambda: rss_mb * MB,
+    )
+
+
+def test_admit_queues_until_memory_is_released(tmp_path):
+    """Test that a job over the budget waits for the running job."""
+    manager = _manager(tmp_path)
+    admitted = threading.Event()
+
+    def second_job():
+        with manager.admit(60 * MB):
+            admitted.set()
+
+    with manager.admit(60 * MB):
+        thread = threading.Thread(target=second_job)
+        thread.start()
+        time.sleep(0.1)
+        assert not admitted.is_set()
+        assert manager.usage()["ingests_queued"] == 1
+        assert manager.usage()["ingests_running"] == 1
+
+    thread.join(timeout=5)
+    assert admitted.is_set()
+    assert manager.usage()["ingests_running"] == 0
+
+
+def test_admit_times_out(tmp_path):
+    """Test that a queued job gives up after its timeout."""
+    manager = _manager(tmp_path)
+
+    with manager.admit(60 * MB):
+        with pytest.raises(MemoryBudgetExceeded):
+            with manager.admit(60 * MB, timeout=0.1):
+                pass
+
+    assert manager.usage()["ingests_queued"] == 0
+
+
+def test_lone_oversized_job_is_admitted(tmp_path):
+    """Test that a job larger than the budget runs when nothing else does."""
+    manager = _manager(tmp_path)
+
+    with manager.admit(500 * MB, timeout=0.1):
+        assert manager.usage()["reserved_bytes"] == 500 * MB
+
+
+def test_evict_idle_evicts_least_recently_used(tmp_path):
+    """Test that idle indexes of other sessions are evicted oldest first."""
+    manager = _manager(tmp_path, rss_mb=190)
+    embeddings = DeterministicFakeEmbedding(size=16)
+    old = manager.register_index("old", _store(["a", "b"]), embeddings)
+    new = manager.register_index("new", _store(["c", "d"]), embeddings)
+    mine = manager.register_index("mine", _store(["e", "f"]), embeddings)
+    old.last_used -= 10
+    mine.last_used -= 20
+
+    released = manager.evict_idle(20 * MB, exclude="mine")
+
+    assert released > 0
+    assert not old.resident
+    assert mine.resident
+    # The RSS is fixed, so the newer index is evicted too
+    assert not new.resident
+    assert manager.usage()["evictions"] == 2
+    assert manager.usage()["indexes_evicted"] == 2
+
+
+def test_recent_indexes_are_not_evicted(tmp_path):
+    """Test that indexes used within idle_seconds stay loaded."""
+    manager = _manager(tmp_path, rss_mb=300, idle_seconds=60)
+    handle = manager.register_index(
+        "s", _store(["a"]), DeterministicFakeEmbedding(size=16)
+    )
+
+    assert manager.enforce() == 0
+    assert handle.resident
+
+
+def test_evicted_index_is_reloaded(tmp_path):
+    """Test that an evicted index answers searches after reloading."""
+    manager = _manager(tmp_path)
+    embeddings = DeterministicFakeEmbedding(size=16)
+    texts = ["rent is due monthly", "the deposit is refundable", "pets allowed"]
+    handle = manager.register_index("s", _store(texts), embeddings)
+    expected = [d.page_content for d in handle.get().similarity_search("deposit")]
+
+    handle.evict()
+    assert not handle.resident
+
+    results = [d.page_content for d in handle.get().similarity_search("deposit")]
+    assert handle.resident
+    assert results == expected
+
+
+def test_release_deletes_spill_files(tmp_path):
+    """Test that releasing a session removes its evicted index."""
+    manager = _manager(tmp_path)
+    handle = manager.register_index(
+        "s", _store(["a"]), DeterministicFakeEmbedding(size=16)
+    )
+    handle.evict()
+
+    manager.release("s")
+
+    assert not os.path.exists(handle.spill_path)
+    assert manager.usage()["indexes_evicted"] == 0
+
+
+def test_session_indexes_are_named(tmp_path):
+    """Test that a session can hold one index per document."""
+    manager = _manager(tmp_path)
+    embeddings = DeterministicFakeEmbedding(size=16)
+    lease = manager.register_index("s", _store(["a"]), embeddings, name="lease.pdf")
+    nda = manager.register_index("s", _store(["b"]), embeddings, name="nda.pdf")
+    other = manager.register_index("t", _store(["c"]), embeddings, name="lease.pdf")
+
+    assert lease.spill_path != nda.spill_path != other.spill_path
+    manager.release("s", "lease.pdf")
+    assert manager.usage()["indexes_resident"] == 2
+
+    manager.release("s")
+    assert manager.usage()["indexes_resident"] == 1
@@ -0,0 +1,157 @@
+"""Tests for the metadata index module.
+
+This module contains unit tests for column metadata filters and pre-filtered
+FAISS search.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from jurisai.models.metadata_index import (
+    FilteredFAISS,
+    MetadataIndex,
+    annotate_documents,
+)
+
+TEXTS = [f"Clause {i} of agreement {i % 3}." for i in range(30)]
+METADATAS = [
+    {
+        "source": f"agreement-{i % 3}.pdf",
+        "page": i // 3,
+        "section": "Section 1 Definitions" if i < 15 else "Section 2 Payment",
+    }
+    for i in range(30)
+]
+
+
+@pytest.fixture
+def embeddings():
+    """Return deterministic fake embeddings."""
+    return DeterministicFakeEmbedding(size=16)
+
+
+def _rows(index, filter):
+    """Return the rows selected by a filter."""
+    bits = np.unpackbits(index.select(filter), bitorder="little")[: len(index)]
+    return np.flatnonzero(bits).tolist()
+
+
+def test_select_combines_categorical_and_numeric_conditions():
+    """Test that conditions on different fields are combined with AND."""
+    index = MetadataIndex()
+    index.add(METADATAS)
+
+    rows = _rows(index, {"source": "agreement-1.pdf", "page": (2, 4)})
+    expected = [
+        i for i, m in enumerate(METADATAS)
+        if m["source"] == "agreement-1.pdf" and 2 <= m["page"] <= 4
+    ]
+
+    assert rows == expected
+    assert _rows(index, {"page": {"$gte": 9}}) == [27, 28, 29]
+    assert index.count({"section": ["Section 2 Payment"]}) == 15
+    assert index.count({"source": "missing.pdf"}) == 0
+
+
+def test_remove_shifts_rows_like_faiss():
+    """Test that removing rows keeps later rows aligned."""
+    index = MetadataIndex()
+    index.add(METADATAS)
+    index.remove([0, 4, 5])
+
+    remaining = [m for i, m in enumerate(METADATAS) if i not in (0, 4, 5)]
+    expected = [
+        i for i, m in enumerate(remaining) if m["source"] == "agreement-2.pdf"
+    ]
+
+    assert len(index) == 27
+    assert _rows(index, {"source": "agreement-2.pdf"}) == expected
+
+
+def test_large_index_adds_and_removes_in_bulk():
+    """Test many rows added in batches and removed at once."""
+    index = MetadataIndex()
+    for start in range(0, 200000, 50000):
+        index.add(
+            {"source": f"doc-{i % 100}.pdf", "page": i}
+            for i in range(start, start + 50000)
+        )
+    index.remove(range(0, 200000, 2))
+
+    assert len(index) == 100000
+    assert index.count({"source": "doc-1.pdf"}) == 2000
+    assert index.count({"source": "doc-2.pdf"}) == 0
+    assert "doc-2.pdf" not in index.values("source")
+    assert _rows(index, {"page": (5, 9)}) == [2, 3, 4]
+
+
+def test_can_filter_rejects_unindexed_fields():
+    """Test that unknown fields and operators are left to post-filtering."""
+    index = MetadataIndex()
+
+    assert index.can_filter({"page": {"$lt": 3}, "source": ["a.pdf"]})
+    assert not index.can_filter({"author": "someone"})
+    assert not index.can_filter({"page": {"$ne": 3}})
+    assert not index.can_filter({})
+
+
+def test_prefiltered_search_matches_post_filter(embeddings):
+    """Test that bitmap pre-filtering returns the exact filtered neighbours."""
+    store = FilteredFAISS.from_texts(TEXTS, embeddings, metadatas=METADATAS)
+    reference = FAISS.from_texts(TEXTS, embeddings, metadatas=METADATAS)
+    query = embeddings.embed_query("Clause 4 of agreement 1.")
+    filter = {"source": "agreement-1.pdf", "page": {"$gte": 1, "$lte": 6}}
+
+    found = store.similarity_search_with_score_by_vector(query, k=4, filter=filter)
+    expected = reference.similarity_search_with_score_by_vector(
+        query, k=4, filter=filter, fetch_k=len(TEXTS)
+    )
+
+    assert [doc.page_content for doc, _ in found] == [
+        doc.page_content for doc, _ in expected
+    ]
+    assert all(doc.metadata["source"] == "agreement-1.pdf" for doc, _ in found)
+
+
+def test_delete_keeps_metadata_aligned(embeddings):
+    """Test that filters stay correct after chunks are deleted."""
+    ids = [str(i) for i in range(len(TEXTS))]
+    store = FilteredFAISS.from_texts(TEXTS, embeddings, metadatas=METADATAS, ids=ids)
+    store.delete(["0", "3", "6"])
+
+    query = embeddings.embed_query("Clause 9 of agreement 0.")
+    found = store.similarity_search_by_vector(
+        query, k=30, filter={"source": "agreement-0.pdf"}
+    )
+
+    assert len(store.metadata_index) == store.index.ntotal == 27
+    assert len(found) == 7
+    assert all(doc.metadata["source"] == "agreement-0.pdf" for doc in found)
+
+
+def test_annotate_documents_carries_sections_forward():
+    """Test that ingest metadata captures sections, dates and document type."""
+    documents = [
+        Document(
+            page_content="LEASE AGREEMENT\nDated March 3, 2021\nARTICLE I Premises",
+            metadata={"page": 0},
+        ),
+        Document(page_content="The tenant shall keep the premises.", metadata={"page": 1}),
+        Document(page_content="ARTICLE II Rent\nRent is due monthly.", metadata={"page": 2}),
+    ]
+
+    annotate_documents(documents, "lease.pdf")
+
+    assert [doc.metadata["section"] for doc in documents] == [
+        "ARTICLE I Premises",
+        "ARTICLE I Premises",
+        "ARTICLE II Rent",
+    ]
+    assert all(doc.metadata["document_type"] == "agreement" for doc in documents)
+    assert all(doc.metadata["year"] == 2021 for doc in documents)
+    assert documents[0].metadata["source"] == "lease.pdf"
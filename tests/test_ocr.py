@@ -0,0 +1,108 @@
+"""Tests for the OCR fallback module.
+
+This module contains unit tests for recognizing scanned PDF pages.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pdfplumber
+import pytest
+from langchain.schema import Document
+from PIL import Image, ImageDraw
+
+from jurisai.models.ocr import OCRFallback, page_fingerprint, shutdown_ocr_pools
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    """Write a two-page PDF made only of images."""
+    images = []
+    for text in ("Exhibit A scanned", "Exhibit B scanned"):
+        image = Image.new("RGB", (400, 200), "white")
+        ImageDraw.Draw(image).text((20, 80), text, fill="black")
+        images.append(image)
+    path = tmp_path / "scanned.pdf"
+    images[0].save(path, save_all=True, append_images=images[1:])
+    return str(path)
+
+
+def _pages(count):
+    """Return empty page documents as the PDF loader yields for scans."""
+    return [Document(page_content="", metadata={"page": i}) for i in range(count)]
+
+
+def test_page_fingerprint_is_stable_and_distinct(scanned_pdf):
+    """Test that fingerprints identify page content."""
+    with pdfplumber.open(scanned_pdf) as pdf:
+        first = [page_fingerprint(page) for page in pdf.pages]
+    with pdfplumber.open(scanned_pdf) as pdf:
+        second = [page_fingerprint(page) for page in pdf.pages]
+
+    assert first == second
+    assert first[0] != first[1]
+
+
+@mock.patch("jurisai.models.ocr.ocr_available", return_value=True)
+def test_textless_pages_are_recognized_and_cached(mock_available, scanned_pdf, tmp_path):
+    """Test that scanned pages get OCR text and repeat runs hit the cache."""
+    ocr = OCRFallback(cache_dir=str(tmp_path / "cache"))
+    text_page = Document(
+        page_content="This page has a text layer already.", metadata={"page": 1}
+    )
+
+    with mock.patch(
+        "jurisai.models.ocr._ocr_page", side_effect=lambda path, n, dpi, lang: f"page {n}"
+    ) as mock_ocr:
+        documents = ocr.apply(scanned_pdf, [_pages(1)[0], text_page])
+
+    assert documents[0].page_content == "page 0"
+    assert documents[0].metadata["ocr"] is True
+    assert "ocr" not in documents[1].metadata
+    assert mock_ocr.call_count == 1
+
+    with mock.patch("jurisai.models.ocr._ocr_page", return_value="page 1") as mock_ocr:
+        documents = ocr.apply(scanned_pdf, _pages(2))
+        assert mock_ocr.call_count == 1
+        assert mock_ocr.call_args[0][1] == 1
+
+    assert [doc.page_content for doc in documents] == ["page 0", "page 1"]
+
+
+@mock.patch("jurisai.models.ocr.ocr_available", return_value=False)
+def test_pages_unchanged_without_ocr_engine(mock_available, scanned_pdf, tmp_path):
+    """Test that documents pass through when Tesseract is missing."""
+    ocr = OCRFallback(cache_dir=str(tmp_path / "cache"))
+
+    documents = ocr.apply(scanned_pdf, _pages(2))
+
+    assert [doc.page_content for doc in documents] == ["", ""]
+
+
+@mock.patch("jurisai.models.ocr.ProcessPoolExecutor")
+def test_recognize_uses_worker_pool_for_several_pages(mock_pool, scanned_pdf, tmp_path):
+    """Test that several uncached pages are recognized in one long-lived pool."""
+    mock_pool.return_value = ThreadPoolExecutor(max_workers=2)
+
+    with mock.patch(
+        "jurisai.models.ocr._ocr_page", side_effect=lambda path, n, dpi, lang: f"page {n}"
+    ):
+        texts = OCRFallback(
+            cache_dir=str(tmp_path / "cache"), max_workers=2
+        ).recognize(scanned_pdf, [0, 1])
+        # Another fallback with an empty cache reuses the running pool
+        OCRFallback(cache_dir=str(tmp_path / "other"), max_workers=2).recognize(
+            scanned_pdf, [0, 1]
+        )
+    shutdown_ocr_pools()
+
+    assert texts == {0: "page 0", 1: "page 1"}
+    mock_pool.assert_called_once()
+    assert mock_pool.call_args.kwargs["max_workers"] == 2
+    assert mock_pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+    # Cache entries are complete files, without leftover temp files
+    assert sorted(
+        path.read_text() for path in (tmp_path / "cache").iterdir()
+    ) == ["page 0", "page 1"]
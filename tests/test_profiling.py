@@ -0,0 +1,92 @@
+"""Tests for the profiling module.
+
+This module contains unit tests for profiling runs and the profile command.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import os
+from unittest import mock
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from jurisai.cli.commands import STUB_LLM_ANSWER, main, parse_args
+from jurisai.utils.profiling import format_report, profile_call
+
+
+def busy_work():
+    """Spend some CPU time and keep an allocation alive."""
+    total = sum(i * i for i in range(50_000))
+    return total, [bytearray(1024) for _ in range(200)]
+
+
+def test_profile_call_writes_collapsed_stacks(tmp_path):
+    """Test the output files and report of a profiled call."""
+    (total, kept), report = profile_call(
+        "busy", busy_work, str(tmp_path), top_n=5
+    )
+
+    assert total == sum(i * i for i in range(50_000))
+    assert set(report.files) == {"cpu", "alloc", "pstats"}
+    assert all(os.path.exists(path) for path in report.files.values())
+
+    cpu_lines = open(report.files["cpu"]).read().splitlines()
+    assert report.samples > 0
+    stack, count = cpu_lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("test_profiling.py:busy_work" in line for line in cpu_lines)
+
+    alloc = open(report.files["alloc"]).read()
+    assert "test_profiling.py" in alloc
+    assert report.peak_bytes >= 200 * 1024
+
+    assert len(report.hotspots) == 5
+    assert any("genexpr" in row["function"] for row in report.hotspots)
+    assert report.allocations[0]["size_bytes"] >= report.allocations[-1]["size_bytes"]
+    assert "Top 5 hotspots" in format_report(report)
+
+
+def test_parse_profile_args():
+    """Test the profile subcommands."""
+    args = parse_args(["profile", "ingest", "lease.pdf"])
+    assert (args.command, args.profile_command, args.file) == (
+        "profile",
+        "ingest",
+        "lease.pdf",
+    )
+
+    args = parse_args(
+        ["profile", "--top", "5", "ask", "lease.pdf", "When is rent due?", "--stub-llm"]
+    )
+    assert args.question == "When is rent due?"
+    assert args.stub_llm is True
+    assert args.top == 5
+
+
+def test_profile_ask_with_stub_llm(tmp_path, text_pdf, capsys):
+    """Test profiling a question end to end without Ollama."""
+    pdf_path = tmp_path / "lease.pdf"
+    pdf_path.write_bytes(text_pdf(["Rent is due on the first day of each month."]))
+    output_dir = tmp_path / "profiles"
+
+    with mock.patch(
+        "src.jurisai.models.document_processor.HuggingFaceEmbeddings",
+        return_value=DeterministicFakeEmbedding(size=16),
+    ), mock.patch("jurisai.cli.commands.configure_logging"):
+        exit_code = main(
+            [
+                "profile",
+                "--output-dir",
+                str(output_dir),
+                "ask",
+                str(pdf_path),
+                "When is rent due?",
+                "--stub-llm",
+            ]
+        )
+
+    assert exit_code == 0
+    out = capsys.readouterr().out
+    assert STUB_LLM_ANSWER in out
+    assert "hotspots by self time" in out
+    assert (output_dir / "ask.cpu.collapsed").exists()
@@ -0,0 +1,116 @@
+"""Tests for the retriever module.
+
+This module contains unit tests for cached, micro-batched query encoding.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import threading
+from typing import List
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.llms import FakeListLLM
+from langchain_community.vectorstores import FAISS
+
+from jurisai.models.rag_chain import RAGChain
+from jurisai.models.retriever import CachedQueryRetriever, QueryEncoder
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that record every batch passed to the encoder."""
+
+    batches: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.batches.append([text])
+        return super().embed_query(text)
+
+
+class PrefixedEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that prefix queries, like e5 or bge models."""
+
+    def embed_query(self, text: str) -> List[float]:
+        return super().embed_query(f"query: {text}")
+
+
+def test_repeated_queries_hit_cache():
+    """Test that a repeated query is encoded only once."""
+    embeddings = CountingEmbeddings(size=8, batches=[])
+    encoder = QueryEncoder(embeddings, batch_window_ms=0)
+
+    first = encoder.encode("termination clause")
+    second = encoder.encode("termination clause")
+
+    assert first == second
+    assert embeddings.batches == [["termination clause"]]
+    assert encoder.stats()["hits"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    """Test that the cache is bounded."""
+    embeddings = CountingEmbeddings(size=8, batches=[])
+    encoder = QueryEncoder(embeddings, cache_size=2, batch_window_ms=0)
+
+    for query in ("a", "b", "c"):
+        encoder.encode(query)
+    encoder.encode("a")
+
+    assert encoder.stats()["cached"] == 2
+    assert len(embeddings.batches) == 4
+
+
+def test_concurrent_queries_are_batched():
+    """Test that concurrent cache misses share one encoder call."""
+    embeddings = CountingEmbeddings(size=8, batches=[])
+    encoder = QueryEncoder(
+        embeddings,
+        batch_window_ms=200,
+        max_batch_size=4,
+        batch_encode=embeddings.embed_documents,
+    )
+    results = {}
+
+    def ask(query):
+        results[query] = encoder.encode(query)
+
+    threads = [threading.Thread(target=ask, args=(f"q{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(results) == 4
+    assert len(embeddings.batches) == 1
+    assert sorted(embeddings.batches[0]) == ["q0", "q1", "q2", "q3"]
+
+
+def test_queries_are_encoded_like_faiss_queries():
+    """Test that the default encoder matches embed_query for asymmetric models."""
+    embeddings = PrefixedEmbeddings(size=8)
+    encoder = QueryEncoder(embeddings, batch_window_ms=0)
+
+    vector = encoder.encode("termination clause")
+
+    assert vector == embeddings.embed_query("termination clause")
+    assert vector != embeddings.embed_documents(["termination clause"])[0]
+
+
+def test_create_chain_uses_cached_retriever():
+    """Test that RAGChain answers through the cached retriever."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+    vector_store = FAISS.from_texts(
+        ["The term is two years.", "Either party may terminate."],
+        embeddings,
+        metadatas=[{"source": "a.pdf"}, {"source": "a.pdf"}],
+    )
+    rag_chain = RAGChain()
+    rag_chain.llm = FakeListLLM(responses=["Two years."])
+
+    qa_chain = rag_chain.create_chain(vector_store, k=1)
+
+    assert type(qa_chain.retriever).__name__ == CachedQueryRetriever.__name__
+    assert rag_chain.answer_question(qa_chain, "What is the term?") == "Two years."
@@ -0,0 +1,177 @@
+"""Tests for the document revisions module.
+
+This module contains unit tests for revision-aware, incremental indexing.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import os
+import threading
+
+from jurisai.models.document_processor import DocumentProcessor
+from jurisai.models.revisions import (
+    DocumentRevision,
+    RevisionTracker,
+    plan_revision,
+)
+
+PAGES = [
+    "The lease term is five years.",
+    "Rent is due on the first day of each month.",
+    "The tenant shall maintain insurance.",
+]
+
+
+def test_plan_revision_groups_pages():
+    """Test that pages are classified by their fingerprints."""
+    previous = DocumentRevision("lease", 1, ["a", "b", "c", "d"])
+
+    plan = plan_revision(previous, ["a", "x", "b", "d"])
+
+    assert plan.unchanged_pages == [0, 3]
+    assert plan.moved_pages == {2: 1}
+    assert plan.changed_pages == [1]
+    assert plan.removed_pages == [2]
+
+
+def test_plan_revision_without_previous_version():
+    """Test that every page is new for an unknown document."""
+    plan = plan_revision(None, ["a", "b"])
+
+    assert plan.changed_pages == [0, 1]
+
+
+def test_tracker_persists_revisions(tmp_path):
+    """Test that revisions survive a tracker restart."""
+    path = str(tmp_path / "revisions.json")
+    tracker = RevisionTracker(path)
+    tracker.set(DocumentRevision("lease", 2, ["a"], {0: []}))
+
+    reloaded = RevisionTracker(path).get("lease")
+
+    assert reloaded.version == 2
+    assert reloaded.page_chunks == {0: []}
+
+
+def test_tracker_saves_concurrent_revisions(tmp_path):
+    """Test that revisions set from several threads are all saved."""
+    path = str(tmp_path / "revisions.json")
+    tracker = RevisionTracker(path)
+    errors = []
+
+    def record(worker):
+        try:
+            for i in range(100):
+                tracker.set(DocumentRevision(f"doc-{worker}-{i}", 1, ["a"]))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=record, args=(w,)) for w in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(RevisionTracker(path).document_ids()) == 200
+
+
+def test_process_revision_patches_vector_store(fake_embeddings, text_pdf, tmp_path):
+    """Test that a new version only re-embeds changed pages."""
+    processor = DocumentProcessor(ocr=False)
+
+    vector_store, first = processor.process_revision(
+        text_pdf(PAGES), "lease", filename="lease.pdf"
+    )
+    assert first.version == 1
+    assert first.changed_pages == [0, 1, 2]
+
+    revised = [PAGES[0], "Rent is due on the fifth day of each month.", PAGES[2]]
+    vector_store, second = processor.process_revision(
+        text_pdf(revised), "lease", vector_store, filename="lease.pdf"
+    )
+    processor.cleanup()
+
+    assert second.version == 2
+    assert second.unchanged_pages == [0, 2]
+    assert second.changed_pages == [1]
+    assert second.removed_chunks == second.added_chunks == 1
+    assert second.embedded_chunks == 1
+
+    texts = {doc.page_content.strip() for doc in vector_store.docstore._dict.values()}
+    assert texts == set(revised)
+
+
+def test_moved_pages_reuse_stored_vectors(fake_embeddings, text_pdf):
+    """Test that reordered pages are re-added without embedding."""
+    processor = DocumentProcessor(ocr=False)
+    vector_store, _ = processor.process_revision(text_pdf(PAGES), "lease")
+
+    reordered = [PAGES[1], PAGES[0], PAGES[2]]
+    vector_store, diff = processor.process_revision(
+        text_pdf(reordered), "lease", vector_store
+    )
+    processor.cleanup()
+
+    assert diff.moved_pages == [0, 1]
+    assert diff.embedded_chunks == 0
+    assert diff.reused_chunks == 2
+
+    pages = {
+        doc.page_content.strip(): doc.metadata["page"]
+        for doc in vector_store.docstore._dict.values()
+    }
+    assert pages == {PAGES[1]: 0, PAGES[0]: 1, PAGES[2]: 2}
+
+
+def test_moved_pages_leave_stored_documents_untouched(fake_embeddings, text_pdf):
+    """Test that re-added chunks are copies of the stored documents."""
+    processor = DocumentProcessor(ocr=False)
+    vector_store, _ = processor.process_revision(text_pdf(PAGES), "lease")
+    stored = dict(vector_store.docstore._dict)
+
+    reordered = [PAGES[1], PAGES[0], PAGES[2]]
+    processor.process_revision(text_pdf(reordered), "lease", vector_store)
+    processor.cleanup()
+
+    pages = {doc.page_content.strip(): doc.metadata["page"] for doc in stored.values()}
+    assert pages == {PAGES[0]: 0, PAGES[1]: 1, PAGES[2]: 2}
+
+
+def test_first_revision_replaces_chunks_of_process_pdf(fake_embeddings, text_pdf):
+    """Test that a store without a revision record is not duplicated."""
+    processor = DocumentProcessor(ocr=False)
+    vector_store = processor.process_pdf(text_pdf(PAGES), "lease.pdf")
+    vector_store.add_texts(["Unrelated chunk."], [{"source": "other.pdf"}])
+
+    revised = [PAGES[0], "Rent is due on the fifth day of each month.", PAGES[2]]
+    vector_store, diff = processor.process_revision(
+        text_pdf(revised), "lease", vector_store, filename="lease.pdf"
+    )
+    processor.cleanup()
+
+    assert diff.version == 1
+    assert diff.removed_chunks == 3
+    assert diff.embedded_chunks == 1
+    assert diff.reused_chunks == 2
+    texts = sorted(
+        doc.page_content.strip() for doc in vector_store.docstore._dict.values()
+    )
+    assert texts == sorted(revised + ["Unrelated chunk."])
+
+
+def test_revisions_leave_no_temp_files(fake_embeddings, text_pdf):
+    """Test that each processed PDF gets its own temp file, removed after use."""
+    processor = DocumentProcessor(ocr=False)
+    vector_store, _ = processor.process_revision(
+        text_pdf(PAGES[:1]), "/inbox/north/lease.pdf", filename="/inbox/north/lease.pdf"
+    )
+    processor.process_revision(
+        text_pdf(PAGES[1:]),
+        "/inbox/south/lease.pdf",
+        vector_store,
+        filename="/inbox/south/lease.pdf",
+    )
+
+    assert os.listdir(processor.temp_dir) == []
+    processor.cleanup()
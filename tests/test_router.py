@@ -0,0 +1,142 @@
+"""Tests for the model routing module.
+
+This module contains unit tests for routing questions to models by
+complexity and predicted latency.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import threading
+
+from langchain_community.llms import FakeListLLM
+
+from jurisai.models import rag_chain as rag_chain_module
+from jurisai.models.llm_scheduler import LLMScheduler
+from jurisai.models.router import (
+    ModelRouter,
+    RoutedLLM,
+    extract_question,
+    question_complexity,
+)
+
+MODELS = ["small", "large"]
+
+
+def test_question_complexity_separates_lookups_from_analysis():
+    """Test the classifier on typical legal questions."""
+    lookups = [
+        "When is rent due?",
+        "Who are the parties?",
+        "How much is the security deposit?",
+    ]
+    analytical = [
+        "Why would the indemnification clause be unenforceable?",
+        "Compare the termination rights of the landlord and the tenant.",
+        "What are the risks for the buyer if closing is delayed?",
+    ]
+
+    assert all(question_complexity(q) < 0.5 for q in lookups)
+    assert all(question_complexity(q) >= 0.5 for q in analytical)
+
+
+def test_extract_question_from_prompt():
+    """Test that routing looks at the question, not the retrieved context."""
+    prompt = "Context: why compare risks\n\nQuestion: When is rent due?\n\nAnswer:"
+
+    assert extract_question(prompt) == "When is rent due?"
+    assert extract_question("Summarize this excerpt.\n\nText") == (
+        "Summarize this excerpt."
+    )
+
+
+def test_route_by_complexity():
+    """Test that lookups go to the smallest and analysis to the largest model."""
+    router = ModelRouter(MODELS, slo_s=5)
+
+    assert router.route("When is rent due?") == "small"
+    assert router.route("Explain why the non-compete clause is unenforceable.") == (
+        "large"
+    )
+    assert router.stats()["models"]["small"]["routed"] == 1
+
+
+def test_route_falls_back_when_slo_would_be_missed():
+    """Test that a slow or backed-up model is passed over."""
+    scheduler = LLMScheduler(max_in_flight=1)
+    router = ModelRouter(MODELS, slo_s=5, scheduler=scheduler)
+    router.record("small", 1.0, 1.0)
+    router.record("large", 3.0, 3.0)
+    question = "Explain why the non-compete clause is unenforceable."
+
+    assert router.route(question) == "large"
+
+    # Two requests queued on the large model push it past the SLO
+    gate = threading.Event()
+    futures = [
+        scheduler.submit("large", f"p{i}", lambda: gate.wait(5) and "x")
+        for i in range(2)
+    ]
+    assert router.predicted_latency("large") == 9.0
+    assert router.route(question) == "small"
+    assert router.stats()["fallbacks"] == 0
+
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    scheduler.shutdown()
+
+
+def test_route_picks_fastest_when_no_model_meets_slo():
+    """Test the fallback when every model is predicted to miss the SLO."""
+    router = ModelRouter(MODELS, slo_s=1)
+    router.record("small", 3.0, 3.0)
+    router.record("large", 2.0, 2.0)
+
+    assert router.route("When is rent due?") == "large"
+    assert router.stats()["fallbacks"] == 1
+
+
+def test_routed_llm_records_latency():
+    """Test that RoutedLLM calls the routed model and records its latency."""
+    scheduler = LLMScheduler(max_in_flight=1)
+    router = ModelRouter(MODELS, slo_s=5, scheduler=scheduler)
+    llm = RoutedLLM(
+        router=router,
+        llms={
+            "small": FakeListLLM(responses=["small answer"]),
+            "large": FakeListLLM(responses=["large answer"]),
+        },
+    )
+
+    assert llm.invoke("Context: ...\nQuestion: Who signed?\nAnswer:") == "small answer"
+    stats = router.stats()
+    assert len(router._latency["small"]) == 1
+    assert stats["p95_s"] >= stats["models"]["small"]["service_p95_s"]
+    assert scheduler.stats()["small"]["completed"] == 1
+    scheduler.shutdown()
+
+
+def test_rag_chain_uses_router():
+    """Test that RAGChain builds a routed LLM over the router's models."""
+    # RAGChain resolves the router classes through the src package
+    rag_chain = rag_chain_module.RAGChain(
+        router=rag_chain_module.ModelRouter(MODELS)
+    )
+
+    assert isinstance(rag_chain.llm, rag_chain_module.RoutedLLM)
+    assert set(rag_chain.llm.llms) == set(MODELS)
+    assert rag_chain.llm.llms["large"].model == "large"
+
+
+def test_rag_chain_temperature_applies_in_place():
+    """Test that a new temperature reaches every routed model."""
+    rag_chain = rag_chain_module.RAGChain(
+        router=rag_chain_module.ModelRouter(MODELS), temperature=0.1
+    )
+    llms = dict(rag_chain.llm.llms)
+
+    rag_chain.temperature = 0.7
+
+    assert rag_chain.temperature == 0.7
+    assert rag_chain.llm.llms == llms
+    assert all(llm.temperature == 0.7 for llm in llms.values())
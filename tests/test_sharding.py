@@ -0,0 +1,129 @@
+"""Tests for the sharded vector store module.
+
+This module contains unit tests for partitioned, scatter-gather search.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import pytest
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from jurisai.models.document_processor import DocumentProcessor
+from jurisai.models.sharding import ShardedVectorStore
+
+TEXTS = [f"Clause {i} of agreement {i % 4}." for i in range(24)]
+METADATAS = [{"source": f"agreement-{i % 4}.pdf", "page": i} for i in range(24)]
+
+
+@pytest.fixture
+def embeddings():
+    """Return deterministic fake embeddings."""
+    return DeterministicFakeEmbedding(size=16)
+
+
+def _contents(results):
+    """Return the page contents of (document, score) results."""
+    return [doc.page_content for doc, _ in results]
+
+
+def test_sharded_search_matches_single_index(embeddings):
+    """Test that merged shard results equal a single index search."""
+    single = FAISS.from_texts(TEXTS, embeddings, metadatas=METADATAS)
+    sharded = ShardedVectorStore.from_texts(
+        TEXTS, embeddings, metadatas=METADATAS, num_shards=3, partition="hash"
+    )
+    query = embeddings.embed_query("Clause 7 of agreement 3.")
+
+    expected = single.similarity_search_with_score_by_vector(query, k=5)
+    found = sharded.similarity_search_with_score_by_vector(query, k=5)
+    sharded.close()
+
+    assert _contents(found) == _contents(expected)
+    assert sum(sharded.shard_sizes()) == len(TEXTS)
+
+
+def test_document_partition_keeps_documents_together(embeddings):
+    """Test that every chunk of a source lands in the same shard."""
+    sharded = ShardedVectorStore.from_texts(
+        TEXTS, embeddings, metadatas=METADATAS, num_shards=3
+    )
+
+    shards_by_source = {}
+    for number, shard in enumerate(sharded.shards):
+        for doc_id in shard.index_to_docstore_id.values():
+            source = shard.docstore.search(doc_id).metadata["source"]
+            shards_by_source.setdefault(source, set()).add(number)
+
+    assert len(shards_by_source) == 4
+    assert all(len(numbers) == 1 for numbers in shards_by_source.values())
+
+
+def test_process_workers_return_same_results(embeddings, tmp_path):
+    """Test that searching in worker processes matches thread search."""
+    threaded = ShardedVectorStore.from_texts(
+        TEXTS, embeddings, metadatas=METADATAS, num_shards=2, partition="hash"
+    )
+    processes = ShardedVectorStore(
+        embeddings,
+        threaded.shards,
+        partition="hash",
+        executor="process",
+        shard_dir=str(tmp_path),
+    )
+    query = embeddings.embed_query("Clause 3 of agreement 3.")
+
+    expected = threaded.similarity_search_with_score_by_vector(query, k=4)
+    found = processes.similarity_search_with_score_by_vector(query, k=4)
+    threshold = (expected[1][1] + expected[2][1]) / 2
+    close = processes.similarity_search_with_score_by_vector(
+        query, k=4, score_threshold=threshold
+    )
+    processes.close()
+    threaded.close()
+
+    assert _contents(found) == _contents(expected)
+    assert _contents(close) == _contents(expected[:2])
+
+
+def test_rebalance_and_delete(embeddings):
+    """Test that rebalancing keeps every chunk and deletes reach all shards."""
+    sharded = ShardedVectorStore.from_texts(
+        TEXTS,
+        embeddings,
+        metadatas=METADATAS,
+        ids=[str(i) for i in range(24)],
+        num_shards=2,
+    )
+    query = embeddings.embed_query(TEXTS[5])
+    before = _contents(sharded.similarity_search_with_score_by_vector(query, k=3))
+
+    sharded.rebalance(num_shards=4, partition="hash")
+    after = _contents(sharded.similarity_search_with_score_by_vector(query, k=3))
+
+    assert len(sharded.shards) == 4
+    assert after == before
+
+    sharded.delete(["5"])
+    assert sharded.ntotal == len(TEXTS) - 1
+    with pytest.raises(ValueError):
+        sharded.delete(["5"])
+    # Unknown ids leave every other id in place
+    with pytest.raises(ValueError):
+        sharded.delete(["6", "7", "missing"])
+    assert sharded.ntotal == len(TEXTS) - 1
+    sharded.close()
+
+
+def test_processor_creates_sharded_store(fake_embeddings):
+    """Test that DocumentProcessor builds sharded stores."""
+    processor = DocumentProcessor(ocr=False)
+    chunks = [Document(page_content=t, metadata=m) for t, m in zip(TEXTS, METADATAS)]
+
+    sharded = processor.create_sharded_vector_store(chunks, num_shards=2)
+    processor.cleanup()
+
+    assert sharded.ntotal == len(TEXTS)
+    assert sharded.similarity_search(TEXTS[0], k=1)[0].page_content == TEXTS[0]
+    sharded.close()
@@ -0,0 +1,202 @@
+"""Tests for the summary index module.
+
+This module contains unit tests for building, caching and routing to
+hierarchical document summaries.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+import hashlib
+from typing import Any, List, Optional
+from unittest import mock
+
+from langchain.schema import Document
+from langchain_core.language_models.llms import LLM
+
+from jurisai.models import rag_chain as rag_chain_module
+from jurisai.models.rag_chain import RAGChain
+from jurisai.models.summary_index import (
+    DocumentSummary,
+    SectionSummary,
+    SummaryBuilder,
+    SummaryIndex,
+    summary_level,
+)
+
+
+class StubLLM(LLM):
+    """Deterministic LLM returning a short digest of the prompt."""
+
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _call(
+        self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> str:
+        self.prompts.append(prompt)
+        return f"summary-{hashlib.sha256(prompt.encode()).hexdigest()[:8]}"
+
+
+def _chunks():
+    """Return chunks of a lease with two sections and an untitled exhibit."""
+    lease = [
+        ("Section 1 Premises", 0, "The landlord leases the premises to the tenant."),
+        ("Section 2 Rent", 1, "Rent of $2,000 is due on the first of each month."),
+        ("Section 2 Rent", 1, "Late payments incur a fee of 5 percent."),
+        ("Section 2 Rent", 2, "Rent increases by 3 percent each year."),
+    ]
+    documents = [
+        Document(
+            page_content=text,
+            metadata={"source": "lease.pdf", "section": section, "page": page},
+        )
+        for section, page, text in lease
+    ]
+    documents.append(
+        Document(
+            page_content="Inventory of furniture.",
+            metadata={"source": "exhibit.pdf", "page": 0},
+        )
+    )
+    return documents
+
+
+def test_summary_level_routes_broad_questions():
+    """Test that only whole-document questions use the summary index."""
+    assert summary_level("Summarize this agreement") == "document"
+    assert summary_level("What is this contract about?") == "document"
+    assert summary_level("List all obligations of the tenant") == "section"
+    assert summary_level("When is rent due?") is None
+
+
+def test_build_rolls_chunks_up_to_documents(tmp_path):
+    """Test the shape of the summary tree and the number of LLM calls."""
+    llm = StubLLM(prompts=[])
+    builder = SummaryBuilder(llm, cache_dir=str(tmp_path), max_workers=3)
+
+    index = builder.build(_chunks())
+
+    lease = index.documents["lease.pdf"]
+    assert [s.title for s in lease.sections] == ["Section 1 Premises", "Section 2 Rent"]
+    assert lease.sections[1].pages == [1, 2]
+    assert len(lease.sections[1].chunk_summaries) == 3
+    assert index.documents["exhibit.pdf"].sections[0].title == "Pages 1-1"
+    # 5 chunks, 1 multi-chunk section and 1 multi-section document
+    assert builder.stats == {"generated": 7, "cached": 0}
+    # Single-child levels reuse the child summary
+    exhibit = index.documents["exhibit.pdf"]
+    assert exhibit.summary == exhibit.sections[0].summary
+
+
+def test_rebuild_uses_content_hash_cache(tmp_path):
+    """Test that unchanged content is not summarized again."""
+    first = SummaryBuilder(StubLLM(prompts=[]), cache_dir=str(tmp_path))
+    expected = first.build(_chunks())
+
+    llm = StubLLM(prompts=[])
+    second = SummaryBuilder(llm, cache_dir=str(tmp_path))
+    index = second.build(_chunks())
+
+    assert llm.prompts == []
+    assert second.stats == {"generated": 0, "cached": 7}
+    assert index.to_dict() == expected.to_dict()
+
+
+def test_large_sections_roll_up_in_rounds(tmp_path):
+    """Test that summaries are combined at most fan_in at a time."""
+    documents = [
+        Document(page_content=f"Clause {i}.", metadata={"source": "a.pdf", "page": i})
+        for i in range(5)
+    ]
+    llm = StubLLM(prompts=[])
+    builder = SummaryBuilder(llm, cache_dir=None, fan_in=2)
+
+    index = builder.build(documents)
+
+    # Untitled chunks are grouped fan_in at a time: 3 sections, 1 document
+    sections = index.documents["a.pdf"].sections
+    assert [s.title for s in sections] == ["Pages 1-2", "Pages 3-4", "Pages 5-5"]
+    combined = [p for p in llm.prompts if p.startswith("Combine")]
+    assert all(p.count("summary-") <= 2 for p in combined)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    """Test persisting the summary index."""
+    index = SummaryBuilder(StubLLM(prompts=[]), cache_dir=None).build(_chunks())
+    path = str(tmp_path / "summaries.json")
+
+    index.save(path)
+
+    assert SummaryIndex.load(path).to_dict() == index.to_dict()
+
+
+def test_context_is_capped_and_shared_between_documents():
+    """Test that the summary context stays within its character budget."""
+    index = SummaryIndex(
+        {
+            "long.pdf": DocumentSummary(
+                source="long.pdf",
+                summary="Long agreement.",
+                sections=[
+                    SectionSummary(title=f"Section {i}", pages=[i], summary="x" * 200)
+                    for i in range(50)
+                ],
+            ),
+            "short.pdf": DocumentSummary(
+                source="short.pdf",
+                summary="Short exhibit.",
+                sections=[SectionSummary(title="Exhibit", pages=[0], summary="y" * 50)],
+            ),
+        }
+    )
+
+    context = index.context("section", max_chars=1500)
+
+    assert len(context) <= 1500
+    assert "short.pdf, Exhibit" in context
+    assert "long.pdf, Section 0 " in context
+    assert "long.pdf, Section 49 " not in context
+    assert len(index.context("section")) > 10000
+    assert index.context("document", max_chars=1500).count("source:") == 2
+
+
+def test_rag_chain_answers_broad_questions_from_summaries(tmp_path):
+    """Test that RAGChain skips retrieval for whole-document questions."""
+    index = SummaryBuilder(StubLLM(prompts=[]), cache_dir=None).build(_chunks())
+    rag_chain = RAGChain()
+    rag_chain.llm = StubLLM(prompts=[])
+    qa_chain = mock.MagicMock(return_value={"result": "Monthly."})
+
+    answer = rag_chain.answer_question(
+        qa_chain, "Summarize the lease", summary_index=index
+    )
+    assert answer.startswith("summary-")
+    assert index.documents["lease.pdf"].summary in rag_chain.llm.prompts[0]
+    qa_chain.assert_not_called()
+
+    answer = rag_chain.answer_question(
+        qa_chain, "When is rent due?", summary_index=index
+    )
+    assert answer == "Monthly."
+    qa_chain.assert_called_once_with("When is rent due?")
+
+
+def test_summaries_use_the_plain_model_under_routing():
+    """Test that summaries bypass routing and conversation contexts."""
+    # The chain checks for the classes of its own module
+    scheduler = rag_chain_module.LLMScheduler(max_in_flight=1)
+    rag_chain = RAGChain(
+        model_name="small",
+        router=rag_chain_module.ModelRouter(["small", "large"], scheduler=scheduler),
+        context_cache=rag_chain_module.ConversationContextCache(),
+    )
+
+    builder = SummaryBuilder(rag_chain.summary_llm(), cache_dir=None)
+
+    assert builder.llm.scheduler is scheduler
+    assert type(builder.llm.llm).__name__ == "Ollama"
+    assert builder._model_key() == "small"
+    scheduler.shutdown()
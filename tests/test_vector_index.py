@@ -0,0 +1,152 @@
+"""Tests for the vector index module.
+
+This module contains unit tests for quantized vector storage.
+
+Author: a13xh (a13x.h.cc@gmail.com)
+"""
+
+from unittest import mock
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from jurisai.models.document_processor import DocumentProcessor
+from jurisai.models.metadata_index import FilteredFAISS
+from jurisai.models.vector_index import (
+    clipped_fraction,
+    create_faiss_index,
+    fit_quantizer,
+    index_dtype,
+    index_footprint,
+    index_memory_bytes,
+    measure_recall,
+)
+
+
+def _vectors(count=200, dimension=16):
+    """Return reproducible random vectors."""
+    return np.random.default_rng(0).normal(size=(count, dimension)).astype(np.float32)
+
+
+@pytest.mark.parametrize(
+    "dtype, bytes_per_vector", [("float32", 64), ("float16", 32), ("int8", 16)]
+)
+def test_index_memory_by_dtype(dtype, bytes_per_vector):
+    """Test that quantized indexes store smaller vectors."""
+    vectors = _vectors()
+    index = create_faiss_index(16, dtype, vectors)
+    index.add(vectors)
+
+    assert index_dtype(index) == dtype
+    assert index_memory_bytes(index) == bytes_per_vector * len(vectors)
+
+
+def test_quantized_recall_is_close_to_exact():
+    """Test that quantization keeps most exact neighbours."""
+    vectors = _vectors()
+    reference = create_faiss_index(16, "float32")
+    reference.add(vectors)
+    candidate = create_faiss_index(16, "int8", vectors)
+    candidate.add(vectors)
+
+    assert measure_recall(reference, reference, vectors[:20], k=5) == 1.0
+    assert measure_recall(reference, candidate, vectors[:20], k=5) > 0.8
+
+
+def test_out_of_range_vectors_retrain_the_int8_index():
+    """Test that vectors outside the trained range retrain the quantizer."""
+    vectors = _vectors()
+    index = create_faiss_index(16, "int8", vectors[:100] * 0.1)
+    index.add(vectors[:100] * 0.1)
+
+    assert clipped_fraction(index, vectors[:100] * 0.1) == 0.0
+    assert clipped_fraction(index, vectors[100:]) > 0.5
+
+    retrained = fit_quantizer(index, vectors[100:])
+    retrained.add(vectors[100:])
+
+    assert retrained is not index
+    assert retrained.ntotal == 200
+    assert clipped_fraction(retrained, vectors[100:]) == 0.0
+    np.testing.assert_allclose(
+        retrained.reconstruct(150), vectors[150], atol=0.05
+    )
+    assert fit_quantizer(retrained, vectors[100:]) is retrained
+
+
+def test_vector_store_retrains_before_adding_out_of_range_vectors():
+    """Test that later additions to an int8 store are not clipped."""
+    vectors = _vectors()
+    store = FilteredFAISS(
+        embedding_function=DeterministicFakeEmbedding(size=16),
+        index=create_faiss_index(16, "int8", vectors[:10] * 0.1),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    store.add_embeddings(
+        [(f"small {i}", vector.tolist()) for i, vector in enumerate(vectors[:10] * 0.1)]
+    )
+    store.add_embeddings(
+        [(f"large {i}", vector.tolist()) for i, vector in enumerate(vectors[10:20])]
+    )
+
+    assert store.index.ntotal == 20
+    assert clipped_fraction(store.index, vectors[10:20]) == 0.0
+    match = store.similarity_search_by_vector(vectors[15].tolist(), k=1)[0]
+    assert match.page_content == "large 5"
+
+
+def test_unknown_dtype_is_rejected():
+    """Test that an unsupported storage type raises an error."""
+    with pytest.raises(ValueError):
+        create_faiss_index(16, "int4")
+
+
+@mock.patch("jurisai.models.document_processor.HuggingFaceEmbeddings")
+def test_create_vector_store_uses_configured_dtype(mock_embeddings):
+    """Test that DocumentProcessor builds a quantized vector store."""
+    mock_embeddings.return_value = DeterministicFakeEmbedding(size=16)
+    processor = DocumentProcessor(vector_dtype="float16")
+    chunks = [
+        Document(page_content=f"Clause {i} of the agreement.", metadata={"page": i})
+        for i in range(5)
+    ]
+
+    vector_store = processor.create_vector_store(chunks)
+    footprint = index_footprint(vector_store)
+    processor.cleanup()
+
+    assert footprint["vectors"] == 5
+    assert footprint["dtype"] == "float16"
+    assert footprint["vector_bytes"] == 5 * 32
+    assert footprint["docstore_bytes"] > 0
+    match = vector_store.similarity_search("Clause 3 of the agreement.", k=1)[0]
+    assert match.metadata == {"page": 3}
+
+
+def test_incremental_int8_ingest_trains_on_the_whole_document(text_pdf):
+    """Test that the int8 quantizer is trained on pages from every batch."""
+    embeddings = DeterministicFakeEmbedding(size=16)
+    processor = DocumentProcessor(ocr=False, embeddings=embeddings, vector_dtype="int8")
+    pages = [f"Clause {i} sets the rent of unit {i}." for i in range(6)]
+    with mock.patch.object(
+        processor, "_empty_vector_store", wraps=processor._empty_vector_store
+    ) as empty_vector_store:
+        progress = list(
+            processor.iter_process_pdf(text_pdf(pages), "lease.pdf", pages_per_batch=2)
+        )
+    processor.cleanup()
+
+    vector_store = progress[-1].vector_store
+    assert vector_store.index.ntotal == 6
+    assert index_dtype(vector_store.index) == "int8"
+    # Pages 1 and 4 are sampled, not the first batch of pages 1 and 2
+    training_vectors = empty_vector_store.call_args.args[0]
+    texts = sorted(
+        doc.page_content for doc in vector_store.docstore._dict.values()
+    )
+    expected = embeddings.embed_documents([texts[0], texts[3]])
+    np.testing.assert_allclose(training_vectors, expected, rtol=1e-6)